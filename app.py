@@ -1,49 +1,123 @@
-from flask import Flask, render_template, request, jsonify
-import pandas as pd
+from flask import Blueprint, Flask, Response, render_template, request, jsonify, stream_with_context
 import json
 from pathlib import Path
-from rdkit import Chem
-from rdkit.Chem import AllChem
-from rdkit.Chem import DataStructs
-from rdkit.Chem import rdFingerprintGenerator
 import os
-import requests
-import feedparser
-from groq import Groq
+import time
+from urllib.parse import quote
 from dotenv import load_dotenv
 load_dotenv()
-from pyvis.network import Network
-import networkx as nx
+from subsystems import Subsystem, warm_up
+from payloads import Payload, dumps, extend_object, send_payload
+import metrics
+from metrics import span, timed_iter
+from limits import RouteLimiter
 
-# Helper to get unique drug names from KG
-kg_csv_path = 'data/pharmasage_kg_triples_cleaned.csv'
-def get_kg_drug_names():
+drug_csv_path = os.getenv('PHARMASAGE_DRUG_CSV', 'data/cleaned_clinical_drugs_dataset.csv')
+
+kg_csv_path = os.getenv('PHARMASAGE_KG_CSV', 'data/pharmasage_kg_triples_cleaned.csv')
+
+def load_knowledge_graph():
+    """Load the KG triples once into the integer-encoded graph engine"""
+    from kg_engine import KnowledgeGraph
     try:
-        df = pd.read_csv(kg_csv_path, usecols=['head'])
-        return sorted(df['head'].dropna().unique().tolist())
+        return KnowledgeGraph.from_csv(kg_csv_path)
     except Exception as e:
-        print(f"Error loading KG drug names: {e}")
-        return []
+        print(f"Error loading KG: {e}")
+        return KnowledgeGraph.empty()
 
-app = Flask(__name__)
+# Helper to get unique drug names from KG
+def get_kg_drug_names():
+    return knowledge_graph.get().drug_names()
+
+bp = Blueprint('pharmasage', __name__)
 
 # Load the CSV data
 def load_drug_data():
-    """Load and cache the drug dataset"""
+    """Load the deduplicated drug catalog, memory-mapped from its columnar copy when available"""
+    import pandas as pd
+    from catalog import load_catalog
     try:
-        df = pd.read_csv('data/cleaned_clinical_drugs_dataset.csv')
-        # Remove duplicates based on drug_name and SMILES
-        df = df.drop_duplicates(subset=['drug_name', 'SMILES'], keep='first')
+        df = load_catalog(drug_csv_path)
+        print(f"Loaded {len(df)} drugs from {df.attrs['source']} in {df.attrs['load_seconds'] * 1000:.0f} ms")
         return df
     except Exception as e:
         print(f"Error loading data: {e}")
         return pd.DataFrame()
 
-# Load data on startup
-drug_data = load_drug_data()
+def load_fingerprints(df):
+    """Load the cached fingerprint matrix for the dataset, fingerprinting it only if the CSV changed"""
+    from fingerprints import FingerprintStore
+    if df.empty:
+        return FingerprintStore.from_smiles([])
+    return FingerprintStore.load_or_build(drug_csv_path, df['SMILES'].tolist())
+
+class Chemistry:
+    """The drug catalog plus the fingerprint, lookup and search indexes built over it"""
+
+    def __init__(self):
+        from derived import derived_columns
+        from drug_index import DrugIndex
+        from filters import CatalogFilter
+        from neighbours import NeighbourTable
+        from search_index import SearchIndex
+        from similarity import load_similarity_search
+        drug_data = load_drug_data()
+        self.drug_data = drug_data
+        self.fingerprint_store = load_fingerprints(drug_data)
+        # Exact Tanimoto, or a FAISS binary index with exact re-ranking (SIMILARITY_MODE)
+        self.similarity = load_similarity_search(drug_csv_path, self.fingerprint_store)
+        # Top-k neighbours of every catalog row, so catalog queries skip the similarity search
+        self.neighbour_table = None if drug_data.empty else NeighbourTable.load_or_build(drug_csv_path, self.fingerprint_store)
+        # Solubility class, rule-of-five/Veber counts, QED and canonical SMILES, aligned with drug_data rows
+        self.derived = derived_columns(drug_csv_path, drug_data)
+        self.catalog_filter = CatalogFilter(drug_data, self.derived)
+        self.drug_index = DrugIndex(drug_data, canonical=self.derived['canonical_smiles'].tolist())
+        self.name_search = SearchIndex([] if drug_data.empty else drug_data['drug_name'].tolist())
+        self.smiles_search = SearchIndex([] if drug_data.empty else drug_data['SMILES'].tolist(), lowercase=False, fuzzy=False)
+        # Read endpoints serve these bytes as-is: one record per catalog row, plus the dropdown list
+        records = [] if drug_data.empty else drug_data.to_dict('records')
+        self.drug_payloads = [Payload.of(drug_record(drug, solubility), compress=False)
+                              for drug, solubility in zip(records, self.derived['solubility'])]
+        self.drug_list = Payload.of([] if drug_data.empty else sorted(drug_data['drug_name'].dropna().unique().tolist()))
+
+def load_conformer_cache():
+    from conformers import ConformerCache
+    return ConformerCache()
+
+def load_insights_service():
+    from insights import InsightsService
+    return InsightsService()
+
+def load_kg_retriever():
+    from kg_retrieval import KGRetriever
+    return KGRetriever()
+
+def load_substructure_index():
+    from substructure import SubstructureIndex
+    drug_data = chemistry.get().drug_data
+    return SubstructureIndex.load_or_build(drug_csv_path, [] if drug_data.empty else drug_data['SMILES'].tolist())
+
+def load_screener():
+    from screening import Screener
+    chem = chemistry.get()
+    return Screener(chem.fingerprint_store, chem.drug_data, chem.derived['canonical_smiles'].tolist())
+
+# Heavy subsystems initialize on first use (or in warm_up), not at import time
+chemistry = Subsystem('chemistry', Chemistry)
+conformer_cache = Subsystem('conformers', load_conformer_cache)
+insights_service = Subsystem('insights', load_insights_service)
+knowledge_graph = Subsystem('kg', load_knowledge_graph)
+kg_retriever = Subsystem('retriever', load_kg_retriever)
+substructure_index = Subsystem('substructure', load_substructure_index)
+screener = Subsystem('screening', load_screener)
+SUBSYSTEMS = {s.name: s for s in (chemistry, conformer_cache, insights_service, knowledge_graph, kg_retriever,
+                                  substructure_index, screener)}
+MAX_MOLBLOCK_BATCH = 50
+CHATBOT_TOP_K = 5
 
 def assess_solubility(logP, logD, psa):
     # Example logic: good solubility if logP < 3, logD < 3, psa > 75
+    import pandas as pd
     try:
         if pd.isna(logP) or pd.isna(logD) or pd.isna(psa):
             return 'Unknown'
@@ -56,38 +130,11 @@ def assess_solubility(logP, logD, psa):
     except Exception:
         return 'Unknown'
 
-@app.route('/')
-def index():
-    """Main page with tabs for visualizer and comparator"""
-    return render_template('index.html')
-
-@app.route('/api/drugs')
-def get_drugs():
-    """API endpoint to get all drug names for dropdowns"""
-    if drug_data.empty:
-        return jsonify({'error': 'Drug data not loaded.'}), 500
-    
-    # Get unique drug names
-    drug_names = drug_data['drug_name'].dropna().unique().tolist()
-    return jsonify(sorted(drug_names))
-
-@app.route('/api/drug/<drug_name>')
-def get_drug_info(drug_name):
-    """API endpoint to get drug information by name or SMILES"""
-    if drug_data.empty:
-        return jsonify({'error': 'Drug data not loaded.'}), 500
-
-    drug_info = drug_data[drug_data['drug_name'].str.lower() == drug_name.lower()]
-    if drug_info.empty:
-        # Try searching by SMILES
-        drug_info = drug_data[drug_data['SMILES'] == drug_name]
-
-    if drug_info.empty:
-        return jsonify({'error': f'Drug "{drug_name}" not found.'}), 404
-
-    drug = drug_info.iloc[0]
-    solubility = assess_solubility(drug['logP'], drug['logD'], drug['psa'])
-    return jsonify({
+def drug_record(drug, solubility=None):
+    """All catalog fields for one drug row, plus the derived solubility class"""
+    if solubility is None:
+        solubility = assess_solubility(drug['logP'], drug['logD'], drug['psa'])
+    return {
         'drug_id': drug['drug_id'],
         'drug_name': drug['drug_name'],
         'SMILES': drug['SMILES'],
@@ -106,66 +153,172 @@ def get_drug_info(drug_name):
         'efo_term': drug['efo_term'],
         'mesh_heading': drug['mesh_heading'],
         'toxicity_alert': drug['toxicity_alert']
-    })
+    }
+
+def resolve_drug(chem, query):
+    """Row position for a drug name or SMILES: exact lookup first, then the best name/SMILES search match"""
+    pos = chem.drug_index.find(query)
+    if pos is None:
+        pos = chem.name_search.best(query)
+    if pos is None:
+        pos = chem.smiles_search.best(query)
+    return pos
 
-@app.route('/api/search_drug')
+@bp.route('/')
+def index():
+    """Main page with tabs for visualizer and comparator"""
+    return render_template('index.html')
+
+@bp.route('/visualize_kg')
+def visualize_kg():
+    """Knowledge graph explorer; the graph itself is fetched from /api/kg/<drug>"""
+    return render_template('visualize_kg.html', drug_names=get_kg_drug_names(),
+                           selected_drug=request.args.get('drug', ''))
+
+@bp.route('/api/kg/<path:drug>')
+def get_kg_subgraph(drug):
+    """k-hop knowledge graph neighbourhood of a drug (or any node) as nodes/edges JSON"""
+    if not len(knowledge_graph.get()):
+        return jsonify({'error': 'Knowledge graph not loaded.'}), 500
+    try:
+        hops = min(max(int(request.args.get('hops', 1)), 1), 3)
+        limit = min(max(int(request.args.get('limit', 15)), 1), 500)
+    except ValueError:
+        return jsonify({'error': 'hops and limit must be integers.'}), 400
+    direction = request.args.get('direction', 'both')
+    if direction not in ('out', 'in', 'both'):
+        return jsonify({'error': 'direction must be one of out, in, both.'}), 400
+    relations = [r for r in request.args.get('relations', '').split(',') if r]
+    subgraph = knowledge_graph.get().neighbourhood(drug, hops=hops, max_nodes=limit, relations=relations or None,
+                                             direction=direction)
+    if subgraph is None:
+        return jsonify({'error': f'"{drug}" not found in the knowledge graph.'}), 404
+    return jsonify(subgraph)
+
+@bp.route('/api/drugs')
+def get_drugs():
+    """API endpoint to get all drug names for dropdowns"""
+    chem = chemistry.get()
+    if chem.drug_data.empty:
+        return jsonify({'error': 'Drug data not loaded.'}), 500
+    return send_payload(chem.drug_list)
+
+@bp.route('/api/drug/<drug_name>')
+def get_drug_info(drug_name):
+    """API endpoint to get drug information by name or SMILES"""
+    chem = chemistry.get()
+    if chem.drug_data.empty:
+        return jsonify({'error': 'Drug data not loaded.'}), 500
+
+    # Name first, then SMILES
+    pos = chem.drug_index.find(drug_name)
+    if pos is None:
+        return jsonify({'error': f'Drug "{drug_name}" not found.'}), 404
+
+    return send_payload(chem.drug_payloads[pos])
+
+@bp.route('/api/search_drug')
 def search_drug():
     """API endpoint to search for drug by name or SMILES"""
+    chem = chemistry.get()
     query = request.args.get('query', '').strip()
 
-    if not query or drug_data.empty:
+    if not query or chem.drug_data.empty:
         return jsonify({'error': 'No query or data not loaded.'}), 400
 
-    # Search by drug name (case insensitive)
-    drug_info = drug_data[drug_data['drug_name'].str.lower().str.contains(query.lower(), na=False)]
-    # If no match by name, try SMILES
-    if drug_info.empty:
-        drug_info = drug_data[drug_data['SMILES'].str.contains(query, na=False)]
-
-    if drug_info.empty:
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 100)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers.'}), 400
+
+    # Search by drug name (case insensitive), ranked exact > prefix > infix
+    total, hits = chem.name_search.search(query, limit=limit, offset=offset, fuzzy=False)
+    # If no match by name, try SMILES, then fall back to fuzzy name matches
+    if not total:
+        total, hits = chem.smiles_search.search(query, limit=limit, offset=offset)
+    if not total:
+        total, hits = chem.name_search.search(query, limit=limit, offset=offset, fuzzy=True)
+
+    if not total:
         return jsonify({'error': f'No drug found for query: {query}'}), 404
 
-    drug = drug_info.iloc[0]
-    solubility = assess_solubility(drug['logP'], drug['logD'], drug['psa'])
-    return jsonify({
-        'drug_id': drug['drug_id'],
-        'drug_name': drug['drug_name'],
-        'SMILES': drug['SMILES'],
-        'logD': drug['logD'],
-        'logP': drug['logP'],
-        'psa': drug['psa'],
-        'solubility': solubility,
-        'drug_likeness': drug['drug_likeness'],
-        'max_phase': drug['max_phase'],
-        'IC50': drug['IC50'],
-        'pIC50': drug['pIC50'],
-        'target': drug['target'],
-        'organism': drug['organism'],
-        'target_type': drug['target_type'],
-        'mechanism_of_action': drug['mechanism_of_action'],
-        'efo_term': drug['efo_term'],
-        'mesh_heading': drug['mesh_heading'],
-        'toxicity_alert': drug['toxicity_alert']
-    })
+    # Splice match/score into each drug's pre-serialized record instead of rebuilding it
+    results = [extend_object(chem.drug_payloads[pos].body, {'match': match, 'score': score}) for pos, match, score in hits]
+    head = dumps({'query': query, 'total': total, 'limit': limit, 'offset': offset})
+    return send_payload(Payload(head[:-1] + b',"results":[' + b','.join(results) + b']}', compress=False))
+
+@bp.route('/api/filter')
+def filter_drugs():
+    """Drugs matching every ?where= condition (e.g. psa>75, max_phase>=3, solubility==Good), optionally sorted, paginated"""
+    from filters import FilterError
+    chem = chemistry.get()
+    if chem.drug_data.empty:
+        return jsonify({'error': 'Drug data not loaded.'}), 500
+    conditions = request.args.getlist('where')
+    sort = request.args.get('sort') or None
+    order = request.args.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': 'order must be asc or desc.'}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers.'}), 400
 
-@app.route('/api/compare_drugs')
+    try:
+        total, positions = chem.catalog_filter.query(conditions, sort=sort, descending=order == 'desc',
+                                                     limit=limit, offset=offset)
+    except FilterError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Each drug's stored record, extended with its structure-derived properties
+    derived = chem.derived.iloc[positions].drop(columns='solubility').to_dict('records')
+    results = [extend_object(chem.drug_payloads[pos].body, fields) for pos, fields in zip(positions, derived)]
+    head = dumps({'where': conditions, 'sort': sort, 'order': order, 'total': total, 'limit': limit, 'offset': offset})
+    return send_payload(Payload(head[:-1] + b',"results":[' + b','.join(results) + b']}', compress=False))
+
+@bp.route('/api/substructure')
+def substructure_search():
+    """Drugs containing a SMARTS (default) or SMILES substructure, paginated, within a per-query time budget"""
+    from substructure import SUBSTRUCTURE_MAX_BUDGET, SUBSTRUCTURE_TIME_BUDGET
+    chem = chemistry.get()
+    query = request.args.get('query', '').strip()
+    query_format = request.args.get('format', 'smarts')
+    if not query or chem.drug_data.empty:
+        return jsonify({'error': 'No query or data not loaded.'}), 400
+    if query_format not in ('smarts', 'smiles'):
+        return jsonify({'error': 'format must be smarts or smiles.'}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        offset = max(int(request.args.get('offset', 0)), 0)
+        budget = min(max(float(request.args.get('budget', SUBSTRUCTURE_TIME_BUDGET)), 0.1), SUBSTRUCTURE_MAX_BUDGET)
+    except ValueError:
+        return jsonify({'error': 'limit, offset and budget must be numbers.'}), 400
+
+    try:
+        found = substructure_index.get().search(query, query_format, limit=limit, offset=offset, budget=budget)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    positions = found.pop('positions')
+    head = dumps({'query': query, 'format': query_format, 'limit': limit, 'offset': offset, **found})
+    results = b','.join(chem.drug_payloads[pos].body for pos in positions)
+    return Response(head[:-1] + b',"results":[' + results + b']}', mimetype='application/json')
+
+@bp.route('/api/compare_drugs')
 def compare_drugs():
     """API endpoint to robustly compare two drugs by name or SMILES, returning all available info and a summary."""
+    import pandas as pd
+    chem = chemistry.get()
     drug1_query = request.args.get('drug1', '').strip()
     drug2_query = request.args.get('drug2', '').strip()
 
-    if not drug1_query or not drug2_query or drug_data.empty:
+    if not drug1_query or not drug2_query or chem.drug_data.empty:
         return jsonify({'error': 'Both drug names or SMILES are required.'}), 400
 
     def find_drug(query):
-        info = drug_data[drug_data['drug_name'].str.lower() == query.lower()]
-        if info.empty:
-            info = drug_data[drug_data['SMILES'] == query]
-        if info.empty:
-            info = drug_data[drug_data['drug_name'].str.lower().str.contains(query.lower(), na=False)]
-        if info.empty:
-            info = drug_data[drug_data['SMILES'].str.contains(query, na=False)]
-        return info.iloc[0] if not info.empty else None
+        pos = resolve_drug(chem, query)
+        return chem.drug_data.iloc[pos] if pos is not None else None
 
     drug1 = find_drug(drug1_query)
     drug2 = find_drug(drug2_query)
@@ -218,10 +371,10 @@ def generate_comparison_summary(drug1, drug2):
         return summary_points
     # If one is missing
     if not drug1:
-        summary_points.append(f"Unfortunately, no information was found for the first molecule. However, here's what we know about {drug2.get('drug_name', 'the second molecule')}: {', '.join([f'{k.replace('_', ' ').title()}: {v}' for k, v in drug2.items() if k != 'drug_name'])}.")
+        summary_points.append(f"Unfortunately, no information was found for the first molecule. However, here's what we know about {drug2.get('drug_name', 'the second molecule')}: {', '.join([k.replace('_', ' ').title() + ': ' + str(v) for k, v in drug2.items() if k != 'drug_name'])}.")
         return summary_points
     if not drug2:
-        summary_points.append(f"Unfortunately, no information was found for the second molecule. However, here's what we know about {drug1.get('drug_name', 'the first molecule')}: {', '.join([f'{k.replace('_', ' ').title()}: {v}' for k, v in drug1.items() if k != 'drug_name'])}.")
+        summary_points.append(f"Unfortunately, no information was found for the second molecule. However, here's what we know about {drug1.get('drug_name', 'the first molecule')}: {', '.join([k.replace('_', ' ').title() + ': ' + str(v) for k, v in drug1.items() if k != 'drug_name'])}.")
         return summary_points
     drug1_name = drug1.get('drug_name', 'Molecule 1')
     drug2_name = drug2.get('drug_name', 'Molecule 2')
@@ -293,7 +446,39 @@ def generate_comparison_summary(drug1, drug2):
         summary_points.append(f"{drug2_name} has reached clinical phase {phase2}, but the development status of {drug1_name} is unknown.")
     return summary_points
 
-@app.route('/api/molblock', methods=['POST'])
+@bp.route('/api/compare_panel', methods=['POST'])
+def compare_panel():
+    """Compare a panel of drugs by name or SMILES: property matrix, pairwise Tanimoto similarity and per-property rankings."""
+    from panel import MAX_PANEL_SIZE, compare_panel as build_panel
+    chem = chemistry.get()
+    data = request.get_json(force=True)
+    queries = data.get('drugs', [])
+    if not isinstance(queries, list) or not queries:
+        return jsonify({'error': 'Provide a non-empty list of drug names or SMILES.'}), 400
+    if len(queries) > MAX_PANEL_SIZE:
+        return jsonify({'error': f'At most {MAX_PANEL_SIZE} drugs per panel.'}), 400
+    if chem.drug_data.empty:
+        return jsonify({'error': 'Drug data not loaded.'}), 500
+
+    # Resolve every query up front; queries naming the same row share one panel entry
+    positions, matched, unresolved = [], [], []
+    for query in (str(q).strip() for q in queries):
+        pos = resolve_drug(chem, query) if query else None
+        if pos is None:
+            unresolved.append(query)
+        elif pos not in positions:
+            positions.append(pos)
+            matched.append(query)
+    if not positions:
+        return jsonify({'error': 'None of the drugs were found.', 'unresolved': unresolved}), 404
+
+    result = build_panel(chem.drug_data, chem.fingerprint_store, positions)
+    for drug, query in zip(result['drugs'], matched):
+        drug['query'] = query
+    result['unresolved'] = unresolved
+    return Response(dumps(result), mimetype='application/json')
+
+@bp.route('/api/molblock', methods=['POST'])
 def get_molblock():
     """Given a SMILES string, return MOL block or error."""
     data = request.get_json()
@@ -301,19 +486,34 @@ def get_molblock():
     if not smiles:
         return jsonify({'error': 'No SMILES provided.'}), 400
     try:
-        mol = Chem.MolFromSmiles(smiles)
-        if mol is None:
+        # Conformers are cached by canonical SMILES; only misses run ETKDG embedding
+        mol_block = conformer_cache.get().get(smiles)
+        if mol_block is None:
             return jsonify({'error': 'Invalid SMILES.'}), 400
-        mol = Chem.AddHs(mol)
-        AllChem.EmbedMolecule(mol, randomSeed=0xf00d)
-        mol_block = Chem.MolToMolBlock(mol)
         return jsonify({'molblock': mol_block})
     except Exception as e:
         return jsonify({'error': f'RDKit error: {str(e)}'}), 500
 
-@app.route('/api/predict_target', methods=['POST'])
+@bp.route('/api/molblocks', methods=['POST'])
+def get_molblocks():
+    """Given a list of SMILES strings, return a MOL block or error for each, in request order."""
+    data = request.get_json(force=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object with a "smiles" list.'}), 400
+    smiles_list = data.get('smiles', [])
+    if not isinstance(smiles_list, list) or not smiles_list:
+        return jsonify({'error': 'Provide a non-empty list of SMILES.'}), 400
+    if len(smiles_list) > MAX_MOLBLOCK_BATCH:
+        return jsonify({'error': f'At most {MAX_MOLBLOCK_BATCH} SMILES per request.'}), 400
+    # Cache misses are embedded in parallel on the conformer process pool
+    results = conformer_cache.get().get_many([str(smiles).strip() for smiles in smiles_list])
+    return jsonify({'molblocks': results})
+
+@bp.route('/api/predict_target', methods=['POST'])
 def predict_target():
     """API endpoint to predict biological targets and similar molecules for a given SMILES or drug name."""
+    from rdkit import Chem
+    chem = chemistry.get()
     data = request.get_json(force=True)
     smiles = data.get('smiles', '').strip()
     drug_name = data.get('drug_name', '').strip()
@@ -323,112 +523,112 @@ def predict_target():
 
     # Try to resolve drug_name to SMILES if only drug_name is given
     query_smiles = smiles
+    catalog_pos = None
     if not query_smiles and drug_name:
-        match = drug_data[drug_data['drug_name'].str.lower() == drug_name.lower()]
-        if not match.empty:
-            query_smiles = match.iloc[0]['SMILES']
-        else:
-            # Try partial match
-            match = drug_data[drug_data['drug_name'].str.lower().str.contains(drug_name.lower(), na=False)]
-            if not match.empty:
-                query_smiles = match.iloc[0]['SMILES']
+        with span('predict_target.resolve'):
+            pos = chem.drug_index.find_name(drug_name)
+            if pos is None:
+                # Try partial match
+                pos = chem.name_search.best(drug_name)
+            if pos is not None:
+                query_smiles = chem.drug_data.iloc[pos]['SMILES']
+                catalog_pos = pos
     if not query_smiles:
         return jsonify({'error': 'Could not resolve SMILES for input.'}), 400
-
-    # Use MorganGenerator for fingerprinting (RDKit >=2023.03)
-    try:
-        query_mol = Chem.MolFromSmiles(query_smiles)
-        if query_mol is None:
-            return jsonify({'error': 'Invalid SMILES.'}),
-        morgan_gen = rdFingerprintGenerator.GetMorganGenerator(radius=2, fpSize=2048)
-        query_fp = morgan_gen.GetFingerprint(query_mol)
-    except Exception as e:
-        print(f"[TargetPredictor] Error processing query SMILES: {e}")
-        return jsonify({'error': f'Error processing SMILES: {e}'}), 400
+    if catalog_pos is None:
+        catalog_pos = chem.drug_index.by_smiles.get(query_smiles)
+
+    if (chem.neighbour_table is not None and catalog_pos is not None
+            and chem.fingerprint_store.valid[catalog_pos]):
+        # A catalog molecule: its ranking is a read from the precomputed neighbour table
+        ranked = chem.neighbour_table.ranked(catalog_pos, chem.fingerprint_store, chem.similarity)
+    else:
+        # Fingerprint the query with the same Morgan parameters as the precomputed store
+        try:
+            with span('predict_target.parse'):
+                query_mol = Chem.MolFromSmiles(query_smiles)
+            if query_mol is None:
+                return jsonify({'error': 'Invalid SMILES.'}), 400
+            with span('predict_target.fingerprint'):
+                query_fp = chem.fingerprint_store.fingerprint_mol(query_mol)
+        except Exception as e:
+            print(f"[TargetPredictor] Error processing query SMILES: {e}")
+            return jsonify({'error': f'Error processing SMILES: {e}'}), 400
+        ranked = chem.similarity.ranked(query_fp)
 
     # Find the query molecule's info for property comparison
     query_info = None
-    if query_smiles:
-        qmatch = drug_data[drug_data['SMILES'] == query_smiles]
-        if not qmatch.empty:
-            query_info = qmatch.iloc[0]
-
-    # Compute similarity to all drugs in dataset
-    similarities = []
-    for pos, (idx, row) in enumerate(drug_data.iterrows()):
-        db_smiles = row['SMILES']
-        db_name = row['drug_name']
-        try:
-            db_mol = Chem.MolFromSmiles(db_smiles)
-            if db_mol is None:
-                continue
-            db_fp = morgan_gen.GetFingerprint(db_mol)
-            sim = DataStructs.TanimotoSimilarity(query_fp, db_fp)
-            similarities.append((sim, pos, row))
-        except Exception as e:
-            print(f"[TargetPredictor] Error processing row {idx} ({db_name}): {e}")
-            continue
-    similarities.sort(reverse=True)
+    with span('predict_target.query_lookup'):
+        query_pos = chem.drug_index.find_smiles(query_smiles)
+    if query_pos is not None:
+        query_info = chem.drug_data.iloc[query_pos]
+
+    # Rank the catalog by Tanimoto similarity (table read, vectorized exact pass, or ANN candidates re-ranked exactly)
     top_n = 5
     similar_drugs = []
     seen = set()
-    for sim, pos, row in similarities:
-        if row['SMILES'] == query_smiles:
-            continue  # skip exact match
-        if row['drug_name'] in seen:
-            continue
-        seen.add(row['drug_name'])
-        # Determine shared property and justification
-        shared_property = ''
-        justification = f"{sim*100:.1f}% structural similarity"
-        if query_info is not None:
-            if row.get('mechanism_of_action', '') and query_info.get('mechanism_of_action', '') and row['mechanism_of_action'] == query_info['mechanism_of_action']:
-                shared_property = 'same mechanism of action'
-                justification += f"; same mechanism: {row['mechanism_of_action']}"
-            elif row.get('target', '') and query_info.get('target', '') and row['target'] == query_info['target']:
-                shared_property = 'shared target'
-                justification += f"; shared target: {row['target']}"
-            else:
-                shared_property = 'high structural similarity'
-        else:
-            if row.get('mechanism_of_action', ''):
-                shared_property = 'mechanism known'
-            elif row.get('target', ''):
-                shared_property = 'target known'
+    # The neighbours span includes the drug_data row lookups; rank is the similarity search alone
+    with span('predict_target.neighbours'):
+        for pos, sim in timed_iter('predict_target.rank', ranked):
+            row = chem.drug_data.iloc[pos]
+            if row['SMILES'] == query_smiles:
+                continue  # skip exact match
+            if row['drug_name'] in seen:
+                continue
+            seen.add(row['drug_name'])
+            # Determine shared property and justification
+            shared_property = ''
+            justification = f"{sim*100:.1f}% structural similarity"
+            if query_info is not None:
+                if row.get('mechanism_of_action', '') and query_info.get('mechanism_of_action', '') and row['mechanism_of_action'] == query_info['mechanism_of_action']:
+                    shared_property = 'same mechanism of action'
+                    justification += f"; same mechanism: {row['mechanism_of_action']}"
+                elif row.get('target', '') and query_info.get('target', '') and row['target'] == query_info['target']:
+                    shared_property = 'shared target'
+                    justification += f"; shared target: {row['target']}"
+                else:
+                    shared_property = 'high structural similarity'
             else:
-                shared_property = 'high structural similarity'
-        similar_drugs.append({
-            'drug_name': row.get('drug_name', ''),
-            'drug_id': row.get('drug_id', ''),
-            'SMILES': row.get('SMILES', ''),
-            'target': row.get('target', ''),
-            'mechanism_of_action': row.get('mechanism_of_action', ''),
-            'similarity': float(sim),
-            'shared_property': shared_property,
-            'justification': justification
-        })
-        if len(similar_drugs) >= top_n:
-            break
+                if row.get('mechanism_of_action', ''):
+                    shared_property = 'mechanism known'
+                elif row.get('target', ''):
+                    shared_property = 'target known'
+                else:
+                    shared_property = 'high structural similarity'
+            similar_drugs.append({
+                'drug_name': row.get('drug_name', ''),
+                'drug_id': row.get('drug_id', ''),
+                'SMILES': row.get('SMILES', ''),
+                'target': row.get('target', ''),
+                'mechanism_of_action': row.get('mechanism_of_action', ''),
+                'similarity': float(sim),
+                'shared_property': shared_property,
+                'justification': justification
+            })
+            if len(similar_drugs) >= top_n:
+                break
 
     # Aggregate predicted targets from top similar drugs
-    target_scores = {}
-    for d in similar_drugs:
-        tgt = d.get('target', '')
-        ttype = ''
-        org = ''
-        mech = d.get('mechanism_of_action', '')
-        # Find the row in the dataset for this drug to get type/org
-        match = drug_data[drug_data['drug_name'] == d['drug_name']]
-        if not match.empty:
-            ttype = match.iloc[0].get('target_type', '')
-            org = match.iloc[0].get('organism', '')
-        if not tgt or tgt == 'N/A':
-            continue
-        key = (tgt, ttype, org, mech)
-        if key not in target_scores:
-            target_scores[key] = {'count': 0, 'max_sim': 0.0}
-        target_scores[key]['count'] += 1
-        target_scores[key]['max_sim'] = max(target_scores[key]['max_sim'], d['similarity'])
+    with span('predict_target.aggregate'):
+        target_scores = {}
+        for d in similar_drugs:
+            tgt = d.get('target', '')
+            ttype = ''
+            org = ''
+            mech = d.get('mechanism_of_action', '')
+            # Find the row in the dataset for this drug to get type/org
+            pos = chem.drug_index.find_exact_name(d['drug_name'])
+            if pos is not None:
+                row = chem.drug_data.iloc[pos]
+                ttype = row.get('target_type', '')
+                org = row.get('organism', '')
+            if not tgt or tgt == 'N/A':
+                continue
+            key = (tgt, ttype, org, mech)
+            if key not in target_scores:
+                target_scores[key] = {'count': 0, 'max_sim': 0.0}
+            target_scores[key]['count'] += 1
+            target_scores[key]['max_sim'] = max(target_scores[key]['max_sim'], d['similarity'])
     predicted_targets = []
     for (tgt, ttype, org, mech), score in sorted(target_scores.items(), key=lambda x: (x[1]['count'], x[1]['max_sim']), reverse=True):
         predicted_targets.append({
@@ -439,9 +639,8 @@ def predict_target():
             'confidence': score['max_sim']
         })
     if not predicted_targets:
-        match = drug_data[drug_data['SMILES'] == query_smiles]
-        if not match.empty:
-            row = match.iloc[0]
+        if query_pos is not None:
+            row = chem.drug_data.iloc[query_pos]
             predicted_targets.append({
                 'target': row.get('target', ''),
                 'target_type': row.get('target_type', ''),
@@ -454,7 +653,39 @@ def predict_target():
         'similar_drugs': similar_drugs
     })
 
-@app.route('/api/insights', methods=['POST'])
+@bp.route('/api/screen', methods=['POST'])
+def screen_library():
+    """Predict targets for an uploaded SMILES/CSV/SDF library, streamed as NDJSON (default) or CSV block by block"""
+    from itertools import islice
+    from screening import SCREEN_MAX_QUERIES, iter_csv, iter_ndjson, read_queries
+    output = request.args.get('format', 'ndjson')
+    if output not in ('ndjson', 'csv'):
+        return jsonify({'error': 'format must be ndjson or csv.'}), 400
+    upload = request.files.get('file')
+    if upload is not None:
+        data, filename = upload.read(), upload.filename or ''
+    else:
+        # Raw body: SMILES lines unless ?input=sdf|csv says otherwise
+        data, filename = request.get_data(), f"body.{request.args.get('input', 'smi')}"
+    if not data.strip():
+        return jsonify({'error': 'Upload a SMILES, CSV or SDF file.'}), 400
+    if chemistry.get().drug_data.empty:
+        return jsonify({'error': 'Drug data not loaded.'}), 500
+    # Read every query up front, so a bad header or an oversized library is a 400 rather than a broken stream
+    try:
+        queries = list(islice(read_queries(data, filename), SCREEN_MAX_QUERIES + 1))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if len(queries) > SCREEN_MAX_QUERIES:
+        return jsonify({'error': f'At most {SCREEN_MAX_QUERIES} queries per screen.'}), 400
+    if not queries:
+        return jsonify({'error': 'No queries found in the upload.'}), 400
+    blocks = screener.get().screen(queries)
+    chunks = iter_csv(blocks) if output == 'csv' else iter_ndjson(blocks)
+    return Response(stream_with_context(chunks), mimetype='text/csv' if output == 'csv' else 'application/x-ndjson',
+                    headers={'X-Accel-Buffering': 'no'})
+
+@bp.route('/api/insights', methods=['POST'])
 def internet_rag_summary_api():
     import sys
     data = request.get_json()
@@ -464,93 +695,48 @@ def internet_rag_summary_api():
         print("[INSIGHTS] No drug name provided", file=sys.stderr)
         return jsonify({'error': 'No drug name provided.'}), 400
 
-    SERPER_API_KEY = os.getenv('SERPER_API_KEY')
-    GROQ_API_KEY = os.getenv('GROQ_API_KEY')
-    print(f"[INSIGHTS] SERPER_API_KEY loaded: {bool(SERPER_API_KEY)}, GROQ_API_KEY loaded: {bool(GROQ_API_KEY)}", file=sys.stderr)
-    if not SERPER_API_KEY or not GROQ_API_KEY:
-        print(f"[INSIGHTS] API keys missing. SERPER: {SERPER_API_KEY}, GROQ: {GROQ_API_KEY}", file=sys.stderr)
+    missing_keys = insights_service.get().missing_keys()
+    print(f"[INSIGHTS] SERPER_API_KEY loaded: {'SERPER_API_KEY' not in missing_keys}, GROQ_API_KEY loaded: {'GROQ_API_KEY' not in missing_keys}", file=sys.stderr)
+    if missing_keys:
+        print(f"[INSIGHTS] API keys missing: {', '.join(missing_keys)}", file=sys.stderr)
         return jsonify({'error': 'API keys not set in environment.'}), 500
 
-    def fetch_serper_articles(drug_name):
-        query = f"{drug_name} drug mechanism of action OR clinical trial site:ncbi.nlm.nih.gov OR site:pubmed.ncbi.nlm.nih.gov"
-        headers = {"X-API-KEY": SERPER_API_KEY, "Content-Type": "application/json"}
-        payload = {"q": query}
-        try:
-            resp = requests.post("https://google.serper.dev/search", headers=headers, json=payload, timeout=15)
-            if resp.status_code != 200:
-                return [], []
-            results = resp.json().get('organic', [])
-            articles = []
-            texts = []
-            for r in results:
-                title = r.get("title", "")
-                snippet = r.get("snippet", "")
-                link = r.get("link", "")
-                if snippet and link:
-                    articles.append({"title": title, "snippet": snippet, "link": link, "source": "PubMed/Serper"})
-                    texts.append(snippet)
-            return texts, articles
-        except Exception as e:
-            return [], []
-
-    def fetch_arxiv_articles(drug_name):
-        url = f"http://export.arxiv.org/api/query?search_query=all:{drug_name}&start=0&max_results=5"
-        try:
-            feed = feedparser.parse(requests.get(url, timeout=15).text)
-            articles = []
-            texts = []
-            for entry in feed.entries:
-                title = entry.get("title", "")
-                summary = entry.get("summary", "")
-                link = entry.get("link", "")
-                if summary and link:
-                    articles.append({"title": title, "snippet": summary, "link": link, "source": "arXiv"})
-                    texts.append(summary)
-            return texts, articles
-        except Exception as e:
-            return [], []
-
-    def run_groq_summary(drug_name, texts):
-        try:
-            client = Groq(api_key=GROQ_API_KEY)
-        except TypeError as e:
-            return f"❌ Groq client error: {str(e)}"
-        except Exception as e:
-            return f"❌ Groq client error: {str(e)}"
-        combined_text = "\n".join([f"{i+1}. {txt}" for i, txt in enumerate(texts)])
-        prompt = f"""
-You are a biomedical research assistant. Given the following texts about the molecule **{drug_name}**, generate a detailed and well-formatted scientific summary in paragraph form. Cover:
-
-1. Therapeutic applications and clinical use  
-2. Mechanism of action and biological targets  
-3. Pharmacokinetics and dosing information  
-4. Recent research findings or clinical trials  
-5. Known safety profile or regulatory status
-
-### Research Snippets:
-{combined_text}
-
-Write a clear, professional summary suitable for a drug discovery platform.
-"""
-        try:
-            response = client.chat.completions.create(
-                model="llama3-70b-8192",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            return f"❌ Error generating summary with Groq: {str(e)}"
-
-    serper_texts, serper_articles = fetch_serper_articles(drug_name)
-    arxiv_texts, arxiv_articles = fetch_arxiv_articles(drug_name)
-    all_texts = serper_texts + arxiv_texts
-    all_articles = serper_articles + arxiv_articles
+    # Serper and arXiv are fetched concurrently; article lists are cached per drug name
+    all_texts, all_articles = insights_service.get().fetch_articles(drug_name)
     if not all_texts:
         return jsonify({'summary': '❌ No relevant articles found.', 'articles': []})
-    summary = run_groq_summary(drug_name, all_texts)
+    summary = insights_service.get().summarize(drug_name, all_texts)
     return jsonify({'summary': summary, 'articles': all_articles})
 
+@bp.route('/api/insights/stream')
+def internet_rag_summary_stream():
+    """Server-Sent Events version of /api/insights: articles first, then summary text as it is generated."""
+    import sys
+    from insights import sse_event
+    drug_name = request.args.get('drug_name', '').strip()
+    print(f"[INSIGHTS] Streaming requested for drug: {drug_name}", file=sys.stderr)
+
+    def generate():
+        if not drug_name:
+            yield sse_event('failure', {'error': 'No drug name provided.'})
+            return
+        missing_keys = insights_service.get().missing_keys()
+        if missing_keys:
+            print(f"[INSIGHTS] API keys missing: {', '.join(missing_keys)}", file=sys.stderr)
+            yield sse_event('failure', {'error': 'API keys not set in environment.'})
+            return
+        all_texts, all_articles = insights_service.get().fetch_articles(drug_name)
+        yield sse_event('articles', {'articles': all_articles})
+        if not all_texts:
+            yield sse_event('summary', {'text': '❌ No relevant articles found.'})
+        else:
+            for text in insights_service.get().summarize_stream(drug_name, all_texts):
+                yield sse_event('summary', {'text': text})
+        yield sse_event('done', {})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # ===== DRUG COPILOT PIPELINE (DISABLED: Chatbot/model code excluded as per requirements) =====
 # from transformers import AutoTokenizer, AutoModelForCausalLM
 # from peft import PeftModel, PeftConfig
@@ -560,19 +746,7 @@ Write a clear, professional summary suitable for a drug discovery platform.
 # base_model = AutoModelForCausalLM.from_pretrained(peft_config.base_model_name_or_path)
 # tokenizer = AutoTokenizer.from_pretrained(peft_config.base_model_name_or_path)
 # model = PeftModel.from_pretrained(base_model, adapter_path)
-# # 2. Load FAISS RAG Index for KG Context
-# from sentence_transformers import SentenceTransformer
-# import faiss, pickle
-# embedder = SentenceTransformer("all-MiniLM-L6-v2")
-# faiss_index_path = os.getenv("KG_FAISS_INDEX", "kg_faiss_index.faiss")
-# faiss_meta_path = os.getenv("KG_FAISS_META", "kg_faiss_metadata.pkl")
-# index = faiss.read_index(faiss_index_path)
-# with open(faiss_meta_path, "rb") as f:
-#     metadata = pickle.load(f)
-# def retrieve_triples(query, top_k=5):
-#     query_vec = embedder.encode([query])
-#     scores, indices = index.search(query_vec, top_k)
-#     return [metadata[i] for i in indices[0]]
+# # 2. KG context retrieval now lives in kg_retrieval.KGRetriever (see /api/chatbot)
 # def format_prompt_with_context(triples, user_query):
 #     context = "\n".join(triples)
 #     return (
@@ -596,26 +770,28 @@ Write a clear, professional summary suitable for a drug discovery platform.
 #     gemini_response = gemini_model.generate_content(gemini_prompt)
 #     return gemini_response.text.strip()
 # ===== END DRUG COPILOT PIPELINE (DISABLED) =====
-@app.route('/api/chatbot', methods=['POST'])
+@bp.route('/api/chatbot', methods=['POST'])
 def chatbot_gemini():
-    """Chatbot endpoint using Gemini API. Returns a concise one-line answer, as if KG context is added."""
+    """Chatbot endpoint. Answers from the knowledge-graph facts nearest to the question."""
     import sys
     print("[CHATBOT] /api/chatbot called", file=sys.stderr)
     data = request.get_json(force=True)
-    print(f"[CHATBOT] Request data: {data}", file=sys.stderr)
     user_query = data.get('question', '').strip()
-    kg_context = data.get('kg_context', '').strip()  # Optional
+    print(f"[CHATBOT] Question of {len(user_query)} characters", file=sys.stderr)
     if not user_query:
         print("[CHATBOT] No question provided", file=sys.stderr)
         return jsonify({'error': 'No question provided.'}), 400
-    # For now, always return the efavirenz hardcoded answer for any question
-    answer = (
-        "Efavirenz is used to treat HIV-1 infection.\n\n"
-        "Mechanism:\nIt is a non-nucleoside reverse transcriptase inhibitor (NNRTI) that binds directly to reverse transcriptase, causing allosteric inhibition. This prevents viral RNA from being converted to DNA, thereby blocking viral replication.\n\n"
-        "🧬 No activity against HIV-2. Often used in combination therapy (e.g., with tenofovir/emtricitabine)."
-    )
-    print(f"[CHATBOT] Always returning hardcoded answer: {answer}", file=sys.stderr)
-    return jsonify({'answer': answer})
+    if not kg_retriever.get().available():
+        return jsonify({'error': 'Knowledge graph index not available.'}), 503
+    try:
+        context = kg_retriever.get().search(user_query, k=CHATBOT_TOP_K)
+    except Exception as e:
+        print(f"[CHATBOT] Retrieval failed: {e}", file=sys.stderr)
+        return jsonify({'error': f'Knowledge graph retrieval failed: {str(e)}'}), 500
+    if not context:
+        return jsonify({'answer': 'No related facts found in the knowledge graph.', 'context': []})
+    answer = "From the knowledge graph:\n" + "\n".join(f"• {hit['text']}" for hit in context)
+    return jsonify({'answer': answer, 'context': context})
 
 def format_gemini_prompt(user_query, kg_context=None):
     # Compose a prompt for Gemini to answer in one sharp line, using KG context if provided
@@ -625,6 +801,72 @@ def format_gemini_prompt(user_query, kg_context=None):
     base += f"\n\nQuestion: {user_query}\nAnswer (one line):"
     return base
 
+def cache_requests():
+    """((cache, result), count) for the caches of every subsystem that has been initialized"""
+    caches = []
+    if conformer_cache.loaded:
+        caches.append(('conformers', conformer_cache.get()))
+    if insights_service.loaded:
+        caches += [('articles', insights_service.get().article_cache), ('summaries', insights_service.get().summary_cache)]
+    for name, cache in caches:
+        yield (name, 'hit'), cache.hits
+        yield (name, 'miss'), cache.misses
+
+metrics.register(metrics.CollectedCounter('pharmasage_cache_requests_total', 'Cache lookups by cache and result.',
+                                          ('cache', 'result'), cache_requests))
+
+# Per-route-group concurrency slots for this worker (limits.ROUTE_LIMITS); excess requests get 429
+route_limiter = RouteLimiter()
+
+metrics.register(metrics.CollectedCounter('pharmasage_rejected_requests_total',
+                                          'Requests answered 429 because their route group had no free slot.',
+                                          ('group',), route_limiter.rejected_samples))
+
+@bp.route('/metrics')
+def prometheus_metrics():
+    """Request/span latency histograms and cache counters for this worker, in Prometheus text format"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+def create_app(warm=None):
+    """Application factory. Subsystems initialize on first use; those named in warm ('all' or a
+    comma-separated list of chemistry, conformers, insights, kg, retriever, substructure, screening) are built up front."""
+    app = Flask(__name__)
+    app.register_blueprint(bp)
+    app.extensions['pharmasage_subsystems'] = SUBSYSTEMS
+    metrics.init_app(app)
+    route_limiter.init_app(app)
+    if warm:
+        for name, seconds in warm_up(SUBSYSTEMS, warm).items():
+            print(f"Warmed up {name} in {seconds * 1000:.0f} ms")
+        if chemistry.loaded:
+            prime(app)
+    return app
+
+def prime(app):
+    """Send a few representative chemistry requests through the app so RDKit, pandas and the indexes
+    are paged in and their lazy state is built before real traffic; their timings are then discarded"""
+    chem = chemistry.get()
+    if chem.drug_data.empty:
+        return
+    drug = chem.drug_data.iloc[0]
+    client = app.test_client()
+    start = time.perf_counter()
+    for method, path, body in (
+        ('GET', '/api/drugs', None),
+        ('GET', f"/api/drug/{quote(str(drug['drug_name']), safe='')}", None),
+        ('GET', f"/api/search_drug?query={quote(str(drug['drug_name'])[:3])}", None),
+        ('GET', '/api/filter?limit=5', None),
+        ('POST', '/api/predict_target', {'smiles': drug['SMILES']}),
+    ):
+        with client.open(path, method=method, json=body) as response:
+            if response.status_code >= 500:
+                print(f"Priming {path} failed with {response.status_code}")
+    metrics.reset()
+    print(f"Primed request paths in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+app = create_app(os.getenv('PHARMASAGE_WARM_UP'))
+
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Development server; production runs under gunicorn (gunicorn -c gunicorn.conf.py app:app)
+    app.run(debug=os.getenv('FLASK_DEBUG') == '1', host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""Recall@k vs latency of the approximate similarity backends against exact Tanimoto search.
+
+Usage:
+    python benchmarks/bench_ann.py [--rows 100000] [--queries 200] [--k 10] [--csv data/cleaned_clinical_drugs_dataset.csv]
+
+Fingerprints a synthetic fragment library (or the SMILES of --csv), then runs the
+same query molecules through exact search and each FAISS binary configuration.
+Recall counts an approximate hit as correct when its Tanimoto is at least the
+exact k-th best score, so ties at the boundary are not penalized.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import similarity  # noqa: E402
+from bench_substructure import synthetic_smiles  # noqa: E402
+from fingerprints import FingerprintStore  # noqa: E402
+from similarity import BinaryANNSearch, ExactSearch  # noqa: E402
+
+
+def top_scores(searcher, query_bits, k):
+    hits = []
+    for _, score in searcher.ranked(query_bits):
+        hits.append(score)
+        if len(hits) == k:
+            break
+    return hits
+
+
+def run(searcher, queries, k):
+    """(per-query latencies in ms, top-k score lists)."""
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(top_scores(searcher, query, k))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--csv', help='use the SMILES column of this catalog instead of a synthetic library')
+    args = parser.parse_args()
+
+    if args.csv:
+        smiles = pd.read_csv(args.csv, usecols=['SMILES'])['SMILES'].dropna().tolist()
+    else:
+        smiles = synthetic_smiles(args.rows)
+    start = time.perf_counter()
+    store = FingerprintStore.from_smiles(smiles)
+    print(f"{len(store)} fingerprints in {time.perf_counter() - start:.1f} s")
+    rng = np.random.default_rng(1)
+    # Queries are perturbed library members: drop ~10% of each one's bits so exact matches are rare
+    picks = np.asarray(store.bits[rng.choice(np.flatnonzero(store.valid), args.queries)])
+    queries = picks & np.packbits(rng.random((args.queries, store.fp_size)) > 0.1, axis=1)
+
+    exact_ms, exact = run(ExactSearch(store), queries, args.k)
+    print(f"\n{'backend':<34} {'build s':>8} {'mean ms':>8} {'p95 ms':>8} {'recall@' + str(args.k):>10}")
+    print(f"{'exact':<34} {'-':>8} {exact_ms.mean():8.2f} {np.percentile(exact_ms, 95):8.2f} {1:10.3f}")
+
+    configs = [('hnsw', 'efSearch', ef, candidates) for ef in (64, 128, 256) for candidates in (64, 256)]
+    configs += [('ivf', 'nprobe', nprobe, candidates) for nprobe in (4, 16, 64) for candidates in (64, 256)]
+    built = {}
+    for mode, knob, value, candidates in configs:
+        if mode not in built:
+            start = time.perf_counter()
+            built[mode] = (BinaryANNSearch.build(store, mode), time.perf_counter() - start)
+        searcher, build_seconds = built[mode]
+        searcher.candidates = candidates
+        if mode == 'hnsw':
+            similarity.ANN_HNSW_EF_SEARCH = value
+        else:
+            similarity.ANN_IVF_NPROBE = value
+        similarity.configure(searcher.index)
+        ann_ms, approx = run(searcher, queries, args.k)
+        recall = np.mean([np.mean(np.array(got) >= want[-1] - 1e-12) for got, want in zip(approx, exact)])
+        label = f"{mode} {knob}={value} candidates={candidates}"
+        print(f"{label:<34} {build_seconds:8.1f} {ann_ms.mean():8.2f} {np.percentile(ann_ms, 95):8.2f} {recall:10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Throughput benchmark: kg.ipynb iterrows loops vs vectorized, chunked kg_facts generation.
+
+Usage:
+    python benchmarks/bench_kg_facts.py [--rows 1000000] [--legacy-rows 20000] [--format csv]
+
+Writes a synthetic catalog with the real column layout to a temporary directory,
+times the notebook loops on a sample (they are too slow for the full set), checks
+that both produce identical triples and facts, then streams the full catalog.
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from kg_facts import NL_TEMPLATES, RELATION_MAP, build_triples, iter_triples, render_sentences, write_kg_files  # noqa: E402
+
+
+def synthetic_catalog(n, seed=0):
+    """n catalog rows with realistic cardinalities and ~10% missing values per column."""
+    rng = np.random.default_rng(seed)
+
+    def pick(prefix, cardinality):
+        return np.char.add(prefix, rng.integers(0, cardinality, n).astype(str)).astype(object)
+
+    df = pd.DataFrame({
+        'drug_name': pick('DRUG', n // 4 + 1),
+        'logD': rng.normal(2, 1.5, n).round(2),
+        'logP': rng.normal(3, 1.5, n).round(2),
+        'psa': rng.uniform(20, 140, n).round(2),
+        'drug_likeness': rng.uniform(0, 1, n).round(2),
+        'max_phase': rng.integers(0, 5, n).astype(float),
+        'IC50': rng.lognormal(4, 2, n).round(1),
+        'pIC50': rng.uniform(4, 10, n),
+        'target': pick('Target protein ', 3000),
+        'organism': pick('Organism ', 20),
+        'target_type': pick('TYPE ', 8),
+        'mechanism_of_action': pick('Mechanism ', 2000),
+        'efo_term': pick('disease ', 1500),
+        'mesh_heading': pick('Mesh heading ', 800),
+        'toxicity_alert': pick('alert ', 30),
+    })
+    for col in df.columns[1:]:
+        df.loc[rng.random(n) < 0.1, col] = np.nan
+    return df
+
+
+def write_catalog(path, rows, chunksize):
+    """Write the synthetic catalog in chunks so generating it does not dominate peak memory."""
+    for i, start in enumerate(range(0, rows, chunksize)):
+        chunk = synthetic_catalog(min(chunksize, rows - start), seed=i)
+        chunk.to_csv(path, mode='a' if i else 'w', header=not i, index=False)
+
+
+def legacy_triples(df):
+    """kg.ipynb cell 5."""
+    triples = []
+    for _, row in df.iterrows():
+        drug = row['drug_name'].strip()
+        for col, relation in RELATION_MAP.items():
+            value = row[col]
+            if pd.notna(value):
+                triples.append((drug, relation, str(value).strip()))
+    return pd.DataFrame(triples, columns=["head", "relation", "tail"])
+
+
+def legacy_sentences(triples_df):
+    """kg.ipynb cell 6."""
+    sentences = []
+    for _, row in triples_df.iterrows():
+        drug, relation, tail = row['head'], row['relation'], row['tail']
+        if relation in NL_TEMPLATES:
+            sentences.append(NL_TEMPLATES[relation].format(drug, tail))
+    return sentences
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--legacy-rows', type=int, default=20_000)
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'catalog.csv')
+        sample_path = os.path.join(tmp, 'sample.csv')
+        gen_time, _ = timed(lambda: write_catalog(csv_path, args.rows, args.chunksize))
+        print(f"Synthetic catalog: {args.rows} rows ({gen_time:.1f} s to generate)")
+
+        synthetic_catalog(args.legacy_rows).to_csv(sample_path, index=False)
+        sample = pd.read_csv(sample_path)
+        legacy_time, legacy = timed(lambda: (lambda t: (t, legacy_sentences(t)))(legacy_triples(sample)))
+        vector_time, vectorized = timed(lambda: (lambda t: (t, render_sentences(t).tolist()))(
+            pd.concat(iter_triples(sample_path), ignore_index=True)))
+        same = legacy[0].equals(vectorized[0]) and legacy[1] == vectorized[1]
+        print(f"iterrows loops  : {args.legacy_rows / legacy_time:12,.0f} rows/s ({args.legacy_rows} rows)")
+        print(f"vectorized      : {args.legacy_rows / vector_time:12,.0f} rows/s ({args.legacy_rows} rows)")
+        print(f"speedup         : {legacy_time / vector_time:12.1f}x, identical output: {same}")
+
+        build_time, _ = timed(lambda: render_sentences(build_triples(sample)))
+        print(f"in-memory build : {args.legacy_rows / build_time:12,.0f} rows/s (no CSV parsing)")
+
+        stream_time, (n_triples, n_facts) = timed(lambda: write_kg_files(
+            csv_path, os.path.join(tmp, f'triples.{args.format}'), os.path.join(tmp, f'facts.{args.format}'),
+            args.chunksize))
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(f"streamed {args.format:<7}: {args.rows / stream_time:12,.0f} rows/s "
+              f"({n_triples:,} triples, {n_facts:,} facts in {stream_time:.1f} s)")
+        print(f"peak RSS        : {peak_rss / 1024:12.0f} MB (chunksize {args.chunksize})")
+
+
+if __name__ == '__main__':
+    main()
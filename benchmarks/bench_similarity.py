@@ -0,0 +1,82 @@
+"""Micro-benchmark: per-request RDKit loop vs the precomputed FingerprintStore.
+
+Usage:
+    python benchmarks/bench_similarity.py [--csv data/cleaned_clinical_drugs_dataset.csv] [--queries 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+from rdkit import Chem, RDLogger
+from rdkit.Chem import DataStructs
+from rdkit.Chem import rdFingerprintGenerator
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fingerprints import FP_RADIUS, FP_SIZE, FingerprintStore  # noqa: E402
+
+RDLogger.DisableLog('rdApp.*')
+
+
+def legacy_search(smiles_list, query_smiles, k=5):
+    """The original predict_target loop: parse and fingerprint every row on every call."""
+    morgan_gen = rdFingerprintGenerator.GetMorganGenerator(radius=FP_RADIUS, fpSize=FP_SIZE)
+    query_fp = morgan_gen.GetFingerprint(Chem.MolFromSmiles(query_smiles))
+    similarities = []
+    for pos, smiles in enumerate(smiles_list):
+        mol = Chem.MolFromSmiles(smiles) if isinstance(smiles, str) else None
+        if mol is None:
+            continue
+        similarities.append((DataStructs.TanimotoSimilarity(query_fp, morgan_gen.GetFingerprint(mol)), pos))
+    similarities.sort(reverse=True)
+    return [pos for _, pos in similarities[:k]]
+
+
+def store_search(store, query_smiles, k=5):
+    scores = store.tanimoto(store.fingerprint(query_smiles))
+    ranked = store.ranked(scores)
+    return [next(ranked) for _ in range(min(k, int(store.valid.sum())))]
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', default='data/cleaned_clinical_drugs_dataset.csv')
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv).drop_duplicates(subset=['drug_name', 'SMILES'], keep='first')
+    smiles_list = df['SMILES'].tolist()
+    queries = [s for s in smiles_list if isinstance(s, str) and Chem.MolFromSmiles(s) is not None][:args.queries]
+    print(f"Catalog: {len(smiles_list)} rows, {len(queries)} queries")
+
+    build_time, store = timed(lambda: FingerprintStore.from_smiles(smiles_list), 1)
+    print(f"FingerprintStore build (one-off): {build_time * 1000:.1f} ms")
+
+    legacy_total = 0.0
+    store_total = 0.0
+    mismatches = 0
+    for query in queries:
+        legacy_time, legacy_top = timed(lambda: legacy_search(smiles_list, query), args.repeat)
+        store_time, store_top = timed(lambda: store_search(store, query), args.repeat)
+        legacy_total += legacy_time
+        store_total += store_time
+        mismatches += legacy_top != store_top
+
+    n = max(len(queries), 1)
+    print(f"legacy loop     : {legacy_total / n * 1000:9.3f} ms/query")
+    print(f"fingerprint store: {store_total / n * 1000:9.3f} ms/query")
+    print(f"speedup         : {legacy_total / max(store_total, 1e-12):9.1f}x")
+    print(f"top-5 mismatches: {mismatches}/{len(queries)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Import-time budget check for app.py, based on ``python -X importtime``.
+
+Usage:
+    python benchmarks/importtime_report.py [--budget-ms 400] [--top 15]
+
+Imports the app in a fresh interpreter, prints the slowest top-level imports,
+and exits non-zero if importing the app exceeds the budget or pulls in any of
+the heavy dependencies that should only load on first use.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Must stay out of `import app`; subsystems import them when first used
+DEFERRED_MODULES = ['pandas', 'numpy', 'rdkit', 'pyarrow', 'groq', 'feedparser', 'requests', 'faiss',
+                    'sentence_transformers', 'torch']
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us, depth)] from -X importtime output, in import order."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--budget-ms', type=float, default=400)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    env.pop('PHARMASAGE_WARM_UP', None)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {args.module}'],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    rows = parse_importtime(proc.stderr)
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        sys.exit(f"import {args.module} failed")
+
+    total_us = next(cumulative for name, _, cumulative, depth in rows if name == args.module and depth == 0)
+    print(f"import {args.module}: {total_us / 1000:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    top_level = [row for row in rows if row[3] <= 1]
+    for name, self_us, cumulative_us, _ in sorted(top_level, key=lambda row: -row[2])[:args.top]:
+        print(f"{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {name}")
+
+    imported = {name.split('.')[0] for name, _, _, _ in rows}
+    eager = [name for name in DEFERRED_MODULES if name in imported]
+    failures = []
+    if eager:
+        failures.append(f"heavy modules imported eagerly: {', '.join(eager)}")
+    if total_us / 1000 > args.budget_ms:
+        failures.append(f"import time {total_us / 1000:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
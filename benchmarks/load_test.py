@@ -0,0 +1,341 @@
+"""Per-endpoint latency, throughput and peak RSS of the API on a synthetic catalog, compared with a baseline.
+
+Usage:
+    python benchmarks/load_test.py [--rows 1000] [--mode inprocess|http] [--concurrency 8] [--duration 10]
+                                   [--endpoints predict_target,search_drug] [--baseline FILE] [--save-baseline FILE]
+
+The catalog comes from synthetic_catalog.py (generated on first use) or --csv.
+Serper, arXiv and Groq are replaced by stub_upstreams.py, and the conformer
+and summary caches start empty in a temporary directory, so runs are repeatable.
+
+    inprocess  Flask test client in this process: handler cost without HTTP (micro-benchmark)
+    http       the app in a threaded server subprocess, driven by --concurrency client threads
+
+Each endpoint gets --warmup seconds of unmeasured traffic, then --duration
+seconds of closed-loop requests. Peak RSS is the serving process's VmHWM,
+reset before each endpoint (Linux only). Insights is measured twice:
+insights_warm repeats 20 drug names, so it mostly hits the summary cache;
+insights_cold asks about a new name every time, so it always goes upstream.
+
+With --baseline, an endpoint whose p95 rose or whose throughput fell by more
+than --tolerance is reported as a regression, and the exit status is 1. Results
+depend on the run settings (rows, mode, concurrency, duration, warmup, stub
+latency, seed). A baseline recorded with different settings is not compared,
+and the exit status is 2.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stderr, redirect_stdout
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+from bench_substructure import QUERIES, synthetic_smiles  # noqa: E402
+from stub_upstreams import start_stub_server, stub_environment  # noqa: E402
+from synthetic_catalog import ensure_catalog  # noqa: E402
+
+SERVER_CODE = ("import sys\n"
+               "from werkzeug.serving import run_simple\n"
+               "import app\n"
+               "run_simple('127.0.0.1', int(sys.argv[1]), app.app, threaded=True)\n")
+# Settings a baseline must share with the run it is compared with
+COMPARABLE_META = ('rows', 'mode', 'concurrency', 'duration', 'warmup', 'stub_latency', 'seed')
+FILTERS = ['where=psa%3E75&sort=qed&order=desc', 'where=max_phase%3E%3D3&where=logP%3C3',
+           'where=solubility%3D%3DGood&sort=psa', 'where=lipinski_violations%3D%3D0&where=qed%3E0.5&limit=50']
+
+
+class Pools:
+    """Request inputs drawn from the catalog: known names and SMILES, plus novel molecules."""
+
+    def __init__(self, csv_path, seed=0):
+        rng = np.random.default_rng(seed)
+        catalog = pd.read_csv(csv_path, usecols=['drug_name', 'SMILES']).dropna()
+        picks = catalog.iloc[rng.choice(len(catalog), min(500, len(catalog)), replace=False)]
+        self.names = picks['drug_name'].tolist()
+        self.smiles = picks['SMILES'].tolist()
+        self.novel = synthetic_smiles(200, seed=seed + 99)
+        # Small pools, so the conformer and article/summary caches see repeat traffic as in production
+        self.molblock = self.smiles[:30]
+        self.insights = self.names[:20]
+
+
+def _predict_target(rng, pools):
+    if rng.random() < 0.5:
+        return 'POST', '/api/predict_target', {'drug_name': pools.names[rng.integers(len(pools.names))]}
+    source = pools.smiles if rng.random() < 0.5 else pools.novel
+    return 'POST', '/api/predict_target', {'smiles': source[rng.integers(len(source))]}
+
+
+def _search_drug(rng, pools):
+    name = pools.names[rng.integers(len(pools.names))]
+    start = int(rng.integers(0, max(len(name) - 3, 1)))
+    return 'GET', f'/api/search_drug?query={quote(name[start:start + int(rng.integers(3, 8))])}', None
+
+
+# Names nobody has asked about, so every insights_cold request misses the article and summary caches
+_cold_names = itertools.count()
+
+
+def _insights_cold(rng, pools):
+    name = f'{pools.names[rng.integers(len(pools.names))]} cold-{next(_cold_names)}'
+    return 'POST', '/api/insights', {'drug_name': name}
+
+
+def _compare_drugs(rng, pools):
+    first, second = rng.choice(len(pools.names), 2, replace=False)
+    return 'GET', f'/api/compare_drugs?drug1={quote(pools.names[first])}&drug2={quote(pools.names[second])}', None
+
+
+SCENARIOS = {
+    'predict_target': _predict_target,
+    'search_drug': _search_drug,
+    'compare_drugs': _compare_drugs,
+    'molblock': lambda rng, pools: ('POST', '/api/molblock',
+                                    {'smiles': pools.molblock[rng.integers(len(pools.molblock))]}),
+    'drug': lambda rng, pools: ('GET', f'/api/drug/{quote(pools.names[rng.integers(len(pools.names))], safe="")}', None),
+    'filter': lambda rng, pools: ('GET', f'/api/filter?{FILTERS[rng.integers(len(FILTERS))]}', None),
+    'substructure': lambda rng, pools: ('GET', f'/api/substructure?query={quote(QUERIES[rng.integers(len(QUERIES))])}',
+                                        None),
+    'insights_warm': lambda rng, pools: ('POST', '/api/insights',
+                                         {'drug_name': pools.insights[rng.integers(len(pools.insights))]}),
+    'insights_cold': _insights_cold,
+}
+
+
+def reset_peak_rss(pid):
+    try:
+        with open(f'/proc/{pid}/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def inprocess_client():
+    import app
+    client = app.app.test_client()
+
+    def send(method, path, body):
+        response = client.open(path, method=method, json=body)
+        response.get_data()
+        return response.status_code
+    return send
+
+
+def http_client(base_url):
+    import requests
+    session = requests.Session()
+
+    def send(method, path, body):
+        response = session.request(method, base_url + path, json=body, timeout=120)
+        return response.status_code
+    return send
+
+
+def drive(make_client, scenario, pools, concurrency, duration, seed):
+    """Closed-loop traffic for duration seconds; returns (latencies in seconds, error count, elapsed)."""
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        rng = np.random.default_rng(seed + index)
+        send = make_client()
+        own, failed = [], 0
+        while time.perf_counter() < deadline:
+            method, path, body = scenario(rng, pools)
+            start = time.perf_counter()
+            try:
+                status = send(method, path, body)
+            except Exception:
+                status = None
+            own.append(time.perf_counter() - start)
+            if status is None or status >= 400:
+                failed += 1
+        latencies.extend(own)
+        errors.append(failed)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.array(latencies), sum(errors), time.perf_counter() - start
+
+
+def summarize(latencies, errors, elapsed, rss):
+    ms = latencies * 1000 if len(latencies) else np.zeros(1)
+    return {
+        'requests': int(len(latencies)),
+        'errors': int(errors),
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(float(np.percentile(ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(ms, 95)), 2),
+        'p99_ms': round(float(np.percentile(ms, 99)), 2),
+        'peak_rss_mb': round(rss, 1) if rss is not None else None,
+    }
+
+
+def start_server(env, port, timeout):
+    """Launch the app in a subprocess and wait until it serves /api/drugs; returns (process, base URL)."""
+    import requests
+    log = tempfile.NamedTemporaryFile('w+', prefix='pharmasage-bench-', suffix='.log', delete=False)
+    process = subprocess.Popen([sys.executable, '-c', SERVER_CODE, str(port)], cwd=ROOT, env=env,
+                               stdout=log, stderr=subprocess.STDOUT)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with status {process.returncode}; see {log.name}')
+        try:
+            if requests.get(f'{base_url}/api/drugs', timeout=5).status_code == 200:
+                return process, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.kill()
+    raise RuntimeError(f'Server did not start within {timeout} s; see {log.name}')
+
+
+def mismatched_settings(results, baseline):
+    """COMPARABLE_META settings where the baseline differs from this run, as messages."""
+    base_meta, meta = baseline.get('meta', {}), results['meta']
+    return [f"{key}: baseline {base_meta.get(key)}, this run {meta.get(key)}"
+            for key in COMPARABLE_META if base_meta.get(key) != meta.get(key)]
+
+
+def compare(results, baseline, tolerance):
+    """Print each endpoint against the baseline; returns the number of regressions."""
+    regressions = 0
+    print(f"\n{'endpoint':<16} {'p95 ms':>9} {'baseline':>9} {'change':>8} {'req/s':>9} {'baseline':>9} {'change':>8}")
+    for name, now in results['endpoints'].items():
+        base = baseline.get('endpoints', {}).get(name)
+        if base is None:
+            print(f"{name:<16} (not in baseline)")
+            continue
+        p95_change = now['p95_ms'] / base['p95_ms'] - 1 if base['p95_ms'] else 0.0
+        rps_change = now['throughput_rps'] / base['throughput_rps'] - 1 if base['throughput_rps'] else 0.0
+        regressed = p95_change > tolerance or rps_change < -tolerance
+        regressions += regressed
+        print(f"{name:<16} {now['p95_ms']:9.1f} {base['p95_ms']:9.1f} {p95_change:+8.0%} "
+              f"{now['throughput_rps']:9.1f} {base['throughput_rps']:9.1f} {rps_change:+8.0%}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000, help='synthetic catalog size (e.g. 1000, 100000, 1000000)')
+    parser.add_argument('--csv', help='benchmark this catalog instead of a synthetic one')
+    parser.add_argument('--mode', choices=['inprocess', 'http'], default='inprocess')
+    parser.add_argument('--endpoints', default=','.join(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, default=None, help='client threads (default 1 inprocess, 8 http)')
+    parser.add_argument('--duration', type=float, default=10.0, help='measured seconds per endpoint')
+    parser.add_argument('--warmup', type=float, default=2.0, help='unmeasured seconds per endpoint')
+    parser.add_argument('--stub-latency', type=float, default=0.2, help='Serper/arXiv/Groq stub delay in seconds')
+    parser.add_argument('--port', type=int, default=5077)
+    parser.add_argument('--startup-timeout', type=float, default=1800)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', help='compare with this saved result file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p95/throughput change vs the baseline')
+    parser.add_argument('--save-baseline', help='write this run\'s results here')
+    args = parser.parse_args()
+    concurrency = args.concurrency or (1 if args.mode == 'inprocess' else 8)
+    endpoints = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    unknown = [name for name in endpoints if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+
+    csv_path = os.path.abspath(args.csv or ensure_catalog(args.rows, os.path.join(ROOT, 'data', 'bench',
+                                                                                   f'synthetic_{args.rows}.csv')))
+    stub_server, stub_url = start_stub_server(latency=args.stub_latency)
+    scratch = tempfile.mkdtemp(prefix='pharmasage-bench-')
+    env = dict(os.environ, PHARMASAGE_DRUG_CSV=csv_path, PHARMASAGE_WARM_UP='chemistry',
+               CONFORMER_CACHE_PATH=os.path.join(scratch, 'conformers.sqlite'),
+               INSIGHTS_SUMMARY_CACHE_PATH=os.path.join(scratch, 'summary_cache.sqlite'), **stub_environment(stub_url))
+    pools = Pools(csv_path, seed=args.seed)
+
+    start = time.perf_counter()
+    if args.mode == 'http':
+        process, base_url = start_server(env, args.port, args.startup_timeout)
+        pid = process.pid
+        make_client = lambda: http_client(base_url)  # noqa: E731
+    else:
+        os.environ.update(env)
+        os.chdir(ROOT)
+        process, pid = None, os.getpid()
+        make_client = inprocess_client
+        make_client()
+    print(f"Catalog {csv_path}: ready in {time.perf_counter() - start:.1f} s ({args.mode}, {concurrency} clients)")
+
+    results = {'meta': {'rows': len(pd.read_csv(csv_path, usecols=['drug_name'])), 'mode': args.mode,
+                        'concurrency': concurrency, 'duration': args.duration, 'warmup': args.warmup,
+                        'stub_latency': args.stub_latency, 'seed': args.seed, 'python': platform.python_version(),
+                        'machine': platform.machine(), 'cpus': os.cpu_count()},
+               'endpoints': {}}
+    print(f"\n{'endpoint':<16} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'peak RSS MB':>11}")
+    # The in-process app's request logging goes to a file rather than between the result rows
+    app_log = open(os.path.join(scratch, 'app.log'), 'w')
+    try:
+        for name in endpoints:
+            scenario = SCENARIOS[name]
+            with redirect_stdout(app_log), redirect_stderr(app_log):
+                drive(make_client, scenario, pools, concurrency, args.warmup, args.seed + 1000)
+                reset_peak_rss(pid)
+                latencies, errors, elapsed = drive(make_client, scenario, pools, concurrency, args.duration, args.seed)
+            row = results['endpoints'][name] = summarize(latencies, errors, elapsed, peak_rss_mb(pid))
+            rss = f"{row['peak_rss_mb']:11.1f}" if row['peak_rss_mb'] is not None else f"{'-':>11}"
+            print(f"{name:<16} {row['requests']:8d} {row['errors']:6d} {row['throughput_rps']:8.1f} "
+                  f"{row['p50_ms']:8.1f} {row['p95_ms']:8.1f} {row['p99_ms']:8.1f} {rss}")
+    finally:
+        app_log.close()
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        stub_server.shutdown()
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        mismatched = mismatched_settings(results, baseline)
+        if mismatched:
+            print(f"\nNot comparable with {args.baseline}; rerun with its settings or save a new baseline:")
+            for message in mismatched:
+                print(f"  {message}")
+            sys.exit(2)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{regressions} endpoint(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Local stand-ins for Serper, arXiv and Groq so /api/insights can be benchmarked offline.
+
+Usage:
+    python benchmarks/stub_upstreams.py [--port 8765] [--latency 0.2]
+
+One threaded HTTP server answers all three APIs after a fixed delay:
+    POST /search                       Serper organic results
+    GET  /api/query                    arXiv Atom feed
+    POST /openai/v1/chat/completions   Groq chat completion (SSE chunks when "stream": true)
+Point the app at it with the environment printed on startup (stub_environment()).
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ARXIV_FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">{entries}</feed>"""
+ARXIV_ENTRY = """<entry><id>http://arxiv.org/abs/stub.{i}</id><title>Stub study {i} of {query}</title>
+<summary>Synthetic abstract {i} describing the mechanism, pharmacokinetics and trials of {query}.</summary>
+<link href="http://arxiv.org/abs/stub.{i}"/></entry>"""
+SUMMARY_WORDS = ('This stub summary covers therapeutic use, mechanism of action, pharmacokinetics, '
+                 'recent trials and the safety profile of the requested molecule.').split()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.2
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, content_type):
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        query = self.path.split('all%3A', 1)[-1].split('&', 1)[0] if 'all%3A' in self.path else 'the query'
+        entries = ''.join(ARXIV_ENTRY.format(i=i, query=query) for i in range(5))
+        self._send(ARXIV_FEED.format(entries=entries), 'application/atom+xml')
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        time.sleep(self.latency)
+        if self.path.startswith('/search'):
+            organic = [{'title': f'Stub PubMed result {i}', 'snippet': f"Snippet {i} for {body.get('q', '')[:40]}",
+                        'link': f'https://pubmed.ncbi.nlm.nih.gov/stub{i}'} for i in range(8)]
+            self._send(json.dumps({'organic': organic}), 'application/json')
+        elif body.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            for word in SUMMARY_WORDS:
+                chunk = {'id': 'stub', 'object': 'chat.completion.chunk', 'created': 0, 'model': body.get('model'),
+                         'choices': [{'index': 0, 'delta': {'content': word + ' '}, 'finish_reason': None}]}
+                self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+            self.wfile.write(b'data: [DONE]\n\n')
+            self.close_connection = True
+        else:
+            message = {'role': 'assistant', 'content': ' '.join(SUMMARY_WORDS)}
+            self._send(json.dumps({
+                'id': 'stub', 'object': 'chat.completion', 'created': 0, 'model': body.get('model'),
+                'choices': [{'index': 0, 'message': message, 'finish_reason': 'stop'}],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+            }), 'application/json')
+
+
+def start_stub_server(port=0, latency=0.2):
+    """Serve the stubs from a daemon thread; returns (server, base URL)."""
+    handler = type('Handler', (StubHandler,), {'latency': latency})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def stub_environment(base_url):
+    """Environment variables that route the insights service to the stubs."""
+    return {
+        'SERPER_URL': f'{base_url}/search',
+        'ARXIV_URL': f'{base_url}/api/query',
+        'GROQ_BASE_URL': base_url,
+        'SERPER_API_KEY': 'stub',
+        'GROQ_API_KEY': 'stub',
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds before each response')
+    args = parser.parse_args()
+    server, base_url = start_stub_server(args.port, args.latency)
+    for name, value in stub_environment(base_url).items():
+        print(f'export {name}={value}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
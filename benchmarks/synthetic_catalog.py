@@ -0,0 +1,105 @@
+"""Synthetic drug catalog with the clinical dataset's schema, at any size.
+
+Usage:
+    python benchmarks/synthetic_catalog.py --rows 100000 [--like data/cleaned_clinical_drugs_dataset.csv] [--out data/bench/synthetic_100000.csv]
+
+SMILES are random joins of medicinal-chemistry fragments (every one parses).
+With --like, text columns are sampled from that catalog's value frequencies,
+and numeric columns are resampled from its observed values, missing ones
+included. Otherwise built-in vocabularies with a skewed target distribution
+are used. The same --rows and --seed always give the same file.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_substructure import synthetic_smiles  # noqa: E402
+
+COLUMNS = ['drug_id', 'drug_name', 'SMILES', 'logD', 'logP', 'psa', 'drug_likeness', 'max_phase', 'IC50', 'pIC50',
+           'target', 'organism', 'target_type', 'mechanism_of_action', 'efo_term', 'mesh_heading', 'toxicity_alert']
+ORGANISMS = ['Homo sapiens', 'Homo sapiens', 'Homo sapiens', 'Mus musculus', 'Rattus norvegicus',
+             'Human immunodeficiency virus 1', 'Plasmodium falciparum']
+TARGET_TYPES = ['SINGLE PROTEIN', 'SINGLE PROTEIN', 'SINGLE PROTEIN', 'PROTEIN FAMILY', 'PROTEIN COMPLEX', 'ORGANISM']
+TOXICITY_ALERTS = ['', '', '', 'hepatotoxicity', 'QT prolongation', 'nephrotoxicity', 'cardiotoxicity']
+
+
+def default_path(rows):
+    return os.path.join('data', 'bench', f'synthetic_{rows}.csv')
+
+
+def _skewed(rng, values, n):
+    """n draws from values with Zipf-like weights, so a few labels dominate as in the real catalog."""
+    weights = 1.0 / np.arange(1, len(values) + 1)
+    return np.asarray(values, dtype=object)[rng.choice(len(values), n, p=weights / weights.sum())]
+
+
+def _resample(rng, series, n):
+    """n draws with the empirical distribution of series (NaNs kept at their observed rate)."""
+    values = series.to_numpy(dtype=object)
+    return values[rng.integers(0, len(values), n)] if len(values) else np.full(n, None, dtype=object)
+
+
+def synthetic_catalog(rows, like=None, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'drug_id': [f'CHEMBLSYN{i}' for i in range(rows)],
+        'drug_name': [f'SYNTH-{i:07d}' for i in range(rows)],
+        'SMILES': synthetic_smiles(rows, seed=seed),
+    })
+    if like is not None:
+        source = pd.read_csv(like)
+        for col in COLUMNS[3:]:
+            frame[col] = _resample(rng, source[col], rows) if col in source else None
+        return frame[COLUMNS]
+
+    targets = [f'Synthetic target {i}' for i in range(max(10, min(2000, rows // 50)))]
+    frame['logD'] = np.round(rng.normal(2.0, 1.5, rows), 2)
+    frame['logP'] = np.round(frame['logD'] + np.abs(rng.normal(0.5, 0.7, rows)), 2)
+    frame['psa'] = np.round(rng.gamma(4.0, 20.0, rows), 1)
+    frame['drug_likeness'] = np.where(rng.random(rows) < 0.2, np.nan, np.round(rng.random(rows), 2))
+    frame['max_phase'] = rng.choice([np.nan, 1.0, 2.0, 3.0, 4.0], rows, p=[0.1, 0.3, 0.3, 0.15, 0.15])
+    frame['IC50'] = np.round(10 ** rng.uniform(0, 4, rows), 1)
+    frame['pIC50'] = np.round(9 - np.log10(frame['IC50']), 2)
+    frame['target'] = _skewed(rng, targets, rows)
+    frame['organism'] = _skewed(rng, ORGANISMS, rows)
+    frame['target_type'] = _skewed(rng, TARGET_TYPES, rows)
+    # Mechanism follows the target, as it does for real drugs
+    frame['mechanism_of_action'] = [f'{t} inhibitor' for t in frame['target']]
+    frame['efo_term'] = _skewed(rng, [f'disease {i}' for i in range(200)], rows)
+    frame['mesh_heading'] = _skewed(rng, [f'Mesh heading {i}' for i in range(150)], rows)
+    frame['toxicity_alert'] = rng.choice(TOXICITY_ALERTS, rows)
+    return frame[COLUMNS]
+
+
+def ensure_catalog(rows, path=None, like=None, seed=0):
+    """Path of the synthetic catalog for these parameters, writing it first if it does not exist."""
+    path = path or default_path(rows)
+    if not os.path.exists(path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        synthetic_catalog(rows, like=like, seed=seed).to_csv(tmp, index=False)
+        os.replace(tmp, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--like', help='catalog whose text/numeric value distributions to sample')
+    parser.add_argument('--out', help='default: data/bench/synthetic_<rows>.csv')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    path = args.out or default_path(args.rows)
+    if os.path.exists(path):
+        os.remove(path)
+    print(ensure_catalog(args.rows, path, like=args.like, seed=args.seed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Typed, columnar copy of the drug catalog, memory-mapped at startup.
+
+The CSV is converted once (deduplicated on drug_name + SMILES, repetitive text
+columns as categoricals) into an uncompressed Feather file next to it, keyed by
+the CSV's SHA-256 like the fingerprint cache. Later startups map that file
+instead of parsing the CSV, so numeric columns are shared read-only pages across
+workers. Convert ahead of deploys with:
+    python catalog.py --convert [--csv data/cleaned_clinical_drugs_dataset.csv]
+"""
+import argparse
+import glob
+import os
+import time
+
+import pandas as pd
+
+from fingerprints import file_checksum
+
+CATALOG_VERSION = 1
+CATEGORICAL_COLUMNS = ['target', 'organism', 'target_type', 'mechanism_of_action', 'toxicity_alert', 'efo_term']
+
+
+def catalog_prefix(csv_path):
+    stem, _ = os.path.splitext(csv_path)
+    return f"{stem}.catalog-v{CATALOG_VERSION}"
+
+
+def read_csv_catalog(csv_path):
+    """The catalog straight from CSV, deduplicated on drug_name + SMILES as the app always did."""
+    df = pd.read_csv(csv_path)
+    return df.drop_duplicates(subset=['drug_name', 'SMILES'], keep='first').reset_index(drop=True)
+
+
+def write_feather(df, path):
+    """Write df as uncompressed Feather so it can be memory-mapped.
+
+    Float NaNs are stored as values rather than nulls, letting pandas view those
+    columns in place instead of copying them to fill in missing values.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if col in CATEGORICAL_COLUMNS:
+            columns[col] = pa.array(series.astype('category'))
+        elif series.dtype.kind == 'f':
+            columns[col] = pa.array(series.to_numpy(), from_pandas=False)
+        else:
+            columns[col] = pa.array(series, from_pandas=True)
+    tmp = f"{path}.tmp"
+    feather.write_feather(pa.table(columns), tmp, compression='uncompressed', chunksize=max(len(df), 1))
+    os.replace(tmp, path)
+
+
+def read_feather(path):
+    """Memory-map a Feather catalog; float columns stay views onto the mapped file."""
+    import pyarrow as pa
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def load_catalog(csv_path):
+    """Deduplicated catalog DataFrame, from the Feather cache when it matches the CSV.
+
+    ``df.attrs`` records where it came from ('feather' or 'csv') and how long the
+    load took in seconds.
+    """
+    start = time.perf_counter()
+    path = None
+    try:
+        if os.path.exists(csv_path):
+            path = f"{catalog_prefix(csv_path)}-{file_checksum(csv_path)[:16]}.feather"
+        else:
+            # Deployed without the CSV: use the newest converted catalog
+            candidates = sorted(glob.glob(f"{catalog_prefix(csv_path)}-*.feather"), key=os.path.getmtime)
+            path = candidates[-1] if candidates else None
+        df = None
+        if path and os.path.exists(path):
+            try:
+                df = read_feather(path)
+                source = 'feather'
+            except (OSError, ValueError) as e:
+                if not os.path.exists(csv_path):
+                    raise
+                print(f"Rebuilding unreadable catalog {path} ({e})")
+        if df is None:
+            df = read_csv_catalog(csv_path)
+            source = 'csv'
+            if path:
+                write_feather(df, path)
+    except ImportError as e:
+        print(f"Columnar catalog disabled ({e}); reading CSV")
+        df = read_csv_catalog(csv_path)
+        source = 'csv'
+    df.attrs['source'] = source
+    df.attrs['load_seconds'] = time.perf_counter() - start
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert the drug catalog CSV to a memory-mappable Feather file')
+    parser.add_argument('--convert', action='store_true', help='write the Feather catalog and compare load times')
+    parser.add_argument('--csv', default='data/cleaned_clinical_drugs_dataset.csv')
+    args = parser.parse_args()
+    if not args.convert:
+        parser.print_help()
+        return
+
+    path = f"{catalog_prefix(args.csv)}-{file_checksum(args.csv)[:16]}.feather"
+    start = time.perf_counter()
+    df = read_csv_catalog(args.csv)
+    csv_seconds = time.perf_counter() - start
+    csv_bytes = df.memory_usage(deep=True).sum()
+    write_feather(df, path)
+    start = time.perf_counter()
+    mapped = read_feather(path)
+    feather_seconds = time.perf_counter() - start
+    categorical = sum(mapped[col].dtype == 'category' for col in mapped.columns)
+    print(f"Wrote {len(df)} rows to {path}")
+    print(f"CSV load    : {csv_seconds * 1000:8.1f} ms, {csv_bytes / 2**20:7.1f} MB of pandas memory")
+    print(f"Feather load: {feather_seconds * 1000:8.1f} ms, {mapped.memory_usage(deep=True).sum() / 2**20:7.1f} MB "
+          f"({categorical} categorical columns, float columns mapped from disk)")
+
+
+if __name__ == '__main__':
+    main()
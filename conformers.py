@@ -0,0 +1,239 @@
+"""3D conformer cache for /api/molblock: in-memory LRU in front of a SQLite store.
+
+Pre-embed the whole catalog offline with:
+    python conformers.py --prebuild [--csv data/cleaned_clinical_drugs_dataset.csv]
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from rdkit import Chem
+from rdkit.Chem import AllChem
+
+from drug_index import canonical_smiles
+from metrics import span
+
+CONFORMER_CACHE_PATH = os.getenv('CONFORMER_CACHE_PATH', 'data/conformers.sqlite')
+CONFORMER_CACHE_SIZE = int(os.getenv('CONFORMER_CACHE_SIZE', '2048'))
+EMBED_SEED = 0xf00d
+# Caps ETKDG retries so one pathological molecule cannot spin indefinitely
+EMBED_MAX_ATTEMPTS = int(os.getenv('EMBED_MAX_ATTEMPTS', '50'))
+# Seconds each molecule may take from submission before batches report it as timed out. The embed
+# keeps running in its worker (there is no safe way to stop it) and is cached when it finishes.
+EMBED_TIMEOUT = float(os.getenv('EMBED_TIMEOUT', '10'))
+EMBED_WORKERS = int(os.getenv('EMBED_WORKERS', str(os.cpu_count() or 1)))
+
+_embed_pool = None
+_embed_pool_lock = threading.Lock()
+
+
+def embed_molblock(smiles, max_attempts=EMBED_MAX_ATTEMPTS):
+    """Embed a 3D conformer with ETKDG and return it as a MOL block; None if the SMILES is invalid."""
+    mol = Chem.MolFromSmiles(smiles)
+    if mol is None:
+        return None
+    mol = Chem.AddHs(mol)
+    AllChem.EmbedMolecule(mol, maxAttempts=max_attempts, randomSeed=EMBED_SEED)
+    return Chem.MolToMolBlock(mol)
+
+
+def embed_pool():
+    """Shared process pool for CPU-bound embedding, started on first use."""
+    global _embed_pool
+    with _embed_pool_lock:
+        if _embed_pool is None:
+            # spawn keeps workers free of the web server's threads and open SQLite handles
+            _embed_pool = ProcessPoolExecutor(max_workers=EMBED_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _embed_pool
+
+
+class ConformerCache:
+    """MOL blocks keyed by canonical SMILES, so every spelling of a molecule shares one entry."""
+
+    def __init__(self, path=CONFORMER_CACHE_PATH, max_entries=CONFORMER_CACHE_SIZE):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lru = OrderedDict()
+        # canonical key -> (future, deadline) for embeds running on the pool, shared by every request
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute('CREATE TABLE IF NOT EXISTS molblocks (smiles TEXT PRIMARY KEY, molblock TEXT NOT NULL)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key, molblock):
+        with self._lock:
+            self._lru[key] = molblock
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _load(self, key):
+        if not self.path:
+            return None
+        row = self._connect().execute('SELECT molblock FROM molblocks WHERE smiles = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _store(self, key, molblock):
+        if not self.path:
+            return
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO molblocks (smiles, molblock) VALUES (?, ?)', (key, molblock))
+
+    def lookup(self, smiles):
+        """Return (canonical key, cached MOL block or None) without embedding anything."""
+        key = canonical_smiles(smiles)
+        if key is None:
+            return None, None
+        with self._lock:
+            molblock = self._lru.get(key)
+            if molblock is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return key, molblock
+        molblock = self._load(key)
+        if molblock is not None:
+            self._remember(key, molblock)
+            with self._lock:
+                self.hits += 1
+        return key, molblock
+
+    def put(self, key, molblock):
+        """Record a freshly embedded MOL block in memory and on disk."""
+        self._remember(key, molblock)
+        self._store(key, molblock)
+
+    def get(self, smiles):
+        """MOL block for a SMILES, embedding and caching it on a miss; None if the SMILES is invalid."""
+        with span('conformers.lookup'):
+            key, molblock = self.lookup(smiles)
+        if key is None or molblock is not None:
+            return molblock
+        with self._lock:
+            self.misses += 1
+        with span('conformers.embed'):
+            molblock = embed_molblock(key)
+        if molblock is not None:
+            self.put(key, molblock)
+        return molblock
+
+    def _embed_async(self, key, timeout):
+        """(future, deadline) embedding key on the pool, joining an embed already running for it."""
+        with self._lock:
+            entry = self._inflight.get(key)
+            if entry is not None:
+                return entry
+            future = embed_pool().submit(embed_molblock, key)
+            entry = self._inflight[key] = (future, time.monotonic() + timeout)
+        # Registered outside the lock: it runs right here if the embed has already finished
+        future.add_done_callback(lambda done: self._embedded(key, done))
+        return entry
+
+    def _embedded(self, key, future):
+        """Cache a finished embed, including one whose requests already gave up on it."""
+        try:
+            molblock = None if future.cancelled() else future.result()
+            if molblock is not None:
+                self.put(key, molblock)
+        except Exception as e:
+            print(f"Embedding {key} failed: {e}")
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def get_many(self, smiles_list, timeout=EMBED_TIMEOUT):
+        """Results for a batch of SMILES, in order, embedding cache misses in parallel.
+
+        Each result is {'smiles', 'molblock'} or {'smiles', 'error'}. Every miss has its
+        own deadline, timeout seconds after its embed was submitted; one still running
+        then is reported as timed out. A miss that is already embedding for another
+        request waits on that embed instead of submitting it again.
+        """
+        results = {}
+        pending = {}
+        for smiles in dict.fromkeys(smiles_list):
+            key, molblock = self.lookup(smiles)
+            if key is None:
+                results[smiles] = {'error': 'Invalid SMILES.'}
+            elif molblock is not None:
+                results[smiles] = {'molblock': molblock}
+            else:
+                pending.setdefault(key, []).append(smiles)
+
+        if pending:
+            with self._lock:
+                self.misses += len(pending)
+            embeds = {key: self._embed_async(key, timeout) for key in pending}
+            with span('conformers.embed_batch'):
+                for key, (future, deadline) in embeds.items():
+                    try:
+                        molblock = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                    except FutureTimeout:
+                        molblock, error = None, 'Embedding timed out.'
+                    except Exception as e:
+                        molblock, error = None, f'RDKit error: {e}'
+                    else:
+                        error = 'Invalid SMILES.'
+                    for smiles in pending[key]:
+                        results[smiles] = {'molblock': molblock} if molblock is not None else {'error': error}
+
+        return [dict(smiles=smiles, **results[smiles]) for smiles in smiles_list]
+
+    def prebuild(self, smiles_list):
+        """Embed every SMILES not already on disk across the process pool; returns (embedded, skipped)."""
+        keys = []
+        skipped = 0
+        for smiles in dict.fromkeys(s for s in smiles_list if isinstance(s, str) and s):
+            key = canonical_smiles(smiles)
+            if key is None or self._load(key) is not None:
+                skipped += 1
+            else:
+                keys.append(key)
+        embedded = 0
+        for key, molblock in zip(keys, embed_pool().map(embed_molblock, keys, chunksize=16)):
+            if molblock is None:
+                skipped += 1
+                continue
+            self._store(key, molblock)
+            embedded += 1
+        return embedded, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the 3D conformer cache')
+    parser.add_argument('--prebuild', action='store_true', help='embed every molecule in the drug dataset')
+    parser.add_argument('--csv', default='data/cleaned_clinical_drugs_dataset.csv')
+    parser.add_argument('--cache', default=CONFORMER_CACHE_PATH)
+    args = parser.parse_args()
+    if not args.prebuild:
+        parser.print_help()
+        return
+
+    import pandas as pd
+    df = pd.read_csv(args.csv, usecols=['SMILES'])
+    cache = ConformerCache(args.cache)
+    embedded, skipped = cache.prebuild(df['SMILES'].tolist())
+    print(f"Embedded {embedded} conformers ({skipped} cached or invalid) into {args.cache}")
+
+
+if __name__ == '__main__':
+    main()
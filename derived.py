@@ -0,0 +1,168 @@
+"""Properties derived from catalog columns, computed over whole columns at once.
+
+Structure-based columns (canonical SMILES, rule-of-five and Veber counts, QED)
+need RDKit once per molecule, so they are cached next to the CSV keyed by its
+SHA-256, like the fingerprint cache. Solubility class is cheap and computed on
+every load from logP/logD/PSA. Build the cache ahead of deploys with:
+    python derived.py --prebuild [--csv data/cleaned_clinical_drugs_dataset.csv]
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from rdkit import Chem, rdBase
+from rdkit.Chem import QED, rdMolDescriptors
+
+from fingerprints import file_checksum
+
+SOLUBILITY_CLASSES = np.array(['Unknown', 'Good', 'Moderate', 'Poor'], dtype=object)
+# Bump when a column is added or computed differently
+DERIVED_VERSION = 1
+DERIVED_WORKERS = int(os.getenv('DERIVED_WORKERS', str(os.cpu_count() or 1)))
+DERIVED_BATCH = 2000
+MOL_COLUMNS = ['mol_weight', 'alogp', 'hbd', 'hba', 'tpsa', 'rotatable_bonds', 'lipinski_violations',
+               'veber_violations', 'qed']
+
+
+def as_float(values):
+    """values as a float64 array; anything non-numeric becomes NaN."""
+    values = pd.Series(values, copy=False)
+    if values.dtype.kind in 'fiub':
+        return values.to_numpy(dtype=np.float64)
+    return pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+
+
+def solubility_class(logP, logD, psa):
+    """Vectorized assess_solubility: 'Good', 'Moderate', 'Poor', or 'Unknown' when a value is missing."""
+    logP, logD, psa = as_float(logP), as_float(logD), as_float(psa)
+    codes = np.select(
+        [np.isnan(logP) | np.isnan(logD) | np.isnan(psa),
+         (logP < 3) & (logD < 3) & (psa > 75),
+         (logP < 5) & (logD < 5) & (psa > 50)],
+        [0, 1, 2], default=3)
+    return SOLUBILITY_CLASSES[codes]
+
+
+def _mol_property_rows(smiles_list):
+    """(canonical SMILES list, MOL_COLUMNS value matrix) for one batch of SMILES."""
+    canonical = [None] * len(smiles_list)
+    values = np.full((len(smiles_list), len(MOL_COLUMNS)), np.nan)
+    with rdBase.BlockLogs():
+        for pos, smiles in enumerate(smiles_list):
+            mol = Chem.MolFromSmiles(smiles) if isinstance(smiles, str) and smiles else None
+            if mol is None:
+                continue
+            canonical[pos] = Chem.MolToSmiles(mol)
+            # One descriptor pass feeds both the rule counts and QED
+            props = QED.properties(mol)
+            hbd = rdMolDescriptors.CalcNumLipinskiHBD(mol)
+            hba = rdMolDescriptors.CalcNumLipinskiHBA(mol)
+            lipinski = (props.MW > 500) + (props.ALOGP > 5) + (hbd > 5) + (hba > 10)
+            veber = (props.ROTB > 10) + (props.PSA > 140)
+            values[pos] = (props.MW, props.ALOGP, hbd, hba, props.PSA, props.ROTB, lipinski, veber,
+                           QED.qed(mol, qedProperties=props))
+    return canonical, values
+
+
+def mol_properties(smiles_list, workers=DERIVED_WORKERS):
+    """Canonical SMILES plus MOL_COLUMNS for every SMILES; unparseable rows get None / NaN.
+
+    Large catalogs are split into batches across a process pool.
+    """
+    if workers > 1 and len(smiles_list) >= 2 * DERIVED_BATCH:
+        batches = [smiles_list[i:i + DERIVED_BATCH] for i in range(0, len(smiles_list), DERIVED_BATCH)]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            parts = list(pool.map(_mol_property_rows, batches))
+        canonical = [smiles for part, _ in parts for smiles in part]
+        values = np.concatenate([part for _, part in parts])
+    else:
+        canonical, values = _mol_property_rows(smiles_list)
+    frame = pd.DataFrame(values, columns=MOL_COLUMNS)
+    frame.insert(0, 'canonical_smiles', pd.Series(canonical, dtype=object))
+    return frame
+
+
+def cache_prefix(csv_path):
+    stem, _ = os.path.splitext(csv_path)
+    return f"{stem}.derived-v{DERIVED_VERSION}"
+
+
+def _save(path, frame):
+    encoded = [s.encode('utf-8') if s is not None else b'' for s in frame['canonical_smiles']]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    tmp = f"{path[:-len('.npz')]}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, values=frame[MOL_COLUMNS].to_numpy(dtype=np.float64), offsets=offsets,
+             smiles=np.frombuffer(b''.join(encoded), dtype=np.uint8))
+    os.replace(tmp, path)
+
+
+def _load(path):
+    with np.load(path) as data:
+        values, offsets, blob = data['values'], data['offsets'].tolist(), data['smiles'].tobytes()
+    frame = pd.DataFrame(values, columns=MOL_COLUMNS)
+    canonical = [blob[start:end].decode('utf-8') or None for start, end in zip(offsets[:-1], offsets[1:])]
+    frame.insert(0, 'canonical_smiles', pd.Series(canonical, dtype=object))
+    return frame
+
+
+def load_or_build(csv_path, smiles_list):
+    """mol_properties(smiles_list), read from the cache for this CSV when it is current."""
+    prefix = cache_prefix(csv_path)
+    try:
+        path = f"{prefix}-{file_checksum(csv_path)[:16]}.npz"
+    except OSError as e:
+        print(f"Derived property cache disabled ({e}); computing in memory")
+        return mol_properties(smiles_list)
+    try:
+        frame = _load(path)
+        if len(frame) == len(smiles_list):
+            return frame
+    except (OSError, ValueError, KeyError):
+        pass
+
+    frame = mol_properties(smiles_list)
+    try:
+        _save(path, frame)
+        for stale in glob.glob(f"{glob.escape(prefix)}-*.npz"):
+            if stale != path:
+                os.remove(stale)
+    except OSError as e:
+        print(f"Could not write derived property cache: {e}")
+    return frame
+
+
+def derived_columns(csv_path, df):
+    """DataFrame aligned with df's positions: solubility class plus the cached structure-based columns."""
+    if df.empty:
+        frame = mol_properties([])
+    else:
+        frame = load_or_build(csv_path, df['SMILES'].tolist())
+    frame.insert(0, 'solubility', solubility_class(df['logP'], df['logD'], df['psa']) if not df.empty
+                 else pd.Series(dtype=object))
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the derived-property cache for the drug catalog')
+    parser.add_argument('--prebuild', action='store_true', help='compute structure-based columns for every row')
+    parser.add_argument('--csv', default='data/cleaned_clinical_drugs_dataset.csv')
+    args = parser.parse_args()
+    if not args.prebuild:
+        parser.print_help()
+        return
+    from catalog import load_catalog
+    df = load_catalog(args.csv)
+    start = time.perf_counter()
+    frame = load_or_build(args.csv, df['SMILES'].tolist())
+    print(f"Derived properties for {len(frame)} rows ({frame['canonical_smiles'].notna().sum()} parsed) "
+          f"in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
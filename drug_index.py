@@ -0,0 +1,80 @@
+"""Hash indexes over drug_data for O(1) exact name and SMILES lookups."""
+from rdkit import Chem, rdBase
+
+
+def canonical_smiles(smiles):
+    """RDKit canonical SMILES, or None if the string does not parse."""
+    if not isinstance(smiles, str) or not smiles:
+        return None
+    with rdBase.BlockLogs():
+        mol = Chem.MolFromSmiles(smiles)
+    if mol is None:
+        return None
+    return Chem.MolToSmiles(mol)
+
+
+class DrugIndex:
+    """Row-position lookups built once from the catalog DataFrame.
+
+    Every map points at the first row (in DataFrame order) carrying the key, which is
+    what the previous ``drug_data[...].iloc[0]`` scans returned.
+    """
+
+    def __init__(self, df, canonical=None):
+        self.by_name = {}
+        self.by_lower_name = {}
+        self.by_smiles = {}
+        self._smiles = [] if df.empty else df['SMILES'].tolist()
+        self._by_canonical_smiles = None
+        if df.empty:
+            return
+        for pos, name in enumerate(df['drug_name'].tolist()):
+            if isinstance(name, str):
+                self.by_name.setdefault(name, pos)
+                self.by_lower_name.setdefault(name.lower(), pos)
+        for pos, smiles in enumerate(self._smiles):
+            if isinstance(smiles, str):
+                self.by_smiles.setdefault(smiles, pos)
+        if canonical is not None:
+            # Canonical SMILES already computed for the catalog (derived.py); skip re-parsing every row
+            self._by_canonical_smiles = {}
+            for pos, smiles in enumerate(canonical):
+                if smiles is not None:
+                    self._by_canonical_smiles.setdefault(smiles, pos)
+
+    @property
+    def by_canonical_smiles(self):
+        """Canonical SMILES -> first row position, computed on first use."""
+        if self._by_canonical_smiles is None:
+            index = {}
+            for pos, smiles in enumerate(self._smiles):
+                canonical = canonical_smiles(smiles)
+                if canonical is not None:
+                    index.setdefault(canonical, pos)
+            self._by_canonical_smiles = index
+        return self._by_canonical_smiles
+
+    def find_exact_name(self, name):
+        """Position of the first row whose drug_name equals name exactly."""
+        return self.by_name.get(name)
+
+    def find_name(self, name):
+        """Position of the first row whose drug_name matches name case-insensitively."""
+        return self.by_lower_name.get(name.lower())
+
+    def find_smiles(self, smiles):
+        """Position of the first row with this SMILES, falling back to canonical SMILES."""
+        pos = self.by_smiles.get(smiles)
+        if pos is not None:
+            return pos
+        canonical = canonical_smiles(smiles)
+        if canonical is None:
+            return None
+        return self.by_canonical_smiles.get(canonical)
+
+    def find(self, query):
+        """Resolve a drug name (case-insensitive) or SMILES string to a row position."""
+        pos = self.find_name(query)
+        if pos is None:
+            pos = self.find_smiles(query)
+        return pos
@@ -0,0 +1,101 @@
+"""Range and equality filters over catalog and derived columns, answered with boolean masks.
+
+Conditions look like ``psa>75``, ``max_phase>=3`` or ``solubility==Good``. Every
+filterable column is held as a contiguous array, and sortable columns keep a
+precomputed argsort, so a query is a few vectorized comparisons plus one gather.
+"""
+import operator
+import re
+
+import numpy as np
+import pandas as pd
+
+from derived import as_float
+
+NUMERIC_FILTER_COLUMNS = ['logP', 'logD', 'psa', 'drug_likeness', 'max_phase', 'IC50', 'pIC50',
+                          'mol_weight', 'alogp', 'hbd', 'hba', 'tpsa', 'rotatable_bonds',
+                          'lipinski_violations', 'veber_violations', 'qed']
+TEXT_FILTER_COLUMNS = ['solubility', 'target_type', 'organism', 'toxicity_alert']
+OPERATORS = {
+    '>=': operator.ge, '<=': operator.le, '==': operator.eq, '!=': operator.ne,
+    '>': operator.gt, '<': operator.lt, '=': operator.eq,
+}
+_CONDITION = re.compile(r'^\s*(\w+)\s*(>=|<=|==|!=|>|<|=)\s*(.*?)\s*$')
+
+
+class FilterError(ValueError):
+    """A condition names an unknown column or compares it the wrong way."""
+
+
+def parse_condition(text):
+    """(column, operator symbol, value text) for a condition like 'psa>75'."""
+    match = _CONDITION.match(text)
+    if not match or not match.group(3):
+        raise FilterError(f'Cannot parse condition "{text}"; expected e.g. psa>75 or solubility==Good.')
+    return match.groups()
+
+
+class CatalogFilter:
+    """Filterable columns of the catalog and its derived properties, aligned by row position."""
+
+    def __init__(self, drug_data, derived):
+        self.size = len(drug_data)
+        self.numeric = {}
+        self.text = {}
+        for col in NUMERIC_FILTER_COLUMNS:
+            source = derived if col in derived.columns else drug_data
+            if col in source.columns:
+                self.numeric[col] = as_float(source[col])
+        for col in TEXT_FILTER_COLUMNS:
+            source = derived if col in derived.columns else drug_data
+            if col in source.columns:
+                # Compare against the distinct values once, then broadcast through the codes
+                codes, uniques = pd.factorize(np.asarray(source[col], dtype=object))
+                self.text[col] = (codes, [str(u).lower() for u in uniques])
+        # Stable ascending order per numeric column, NaNs last, for sorted pagination without re-sorting
+        self.order = {col: np.argsort(values, kind='stable') for col, values in self.numeric.items()}
+
+    @property
+    def columns(self):
+        return list(self.numeric) + list(self.text)
+
+    def mask(self, conditions):
+        """Boolean mask of rows satisfying every condition; missing values never match."""
+        mask = np.ones(self.size, dtype=bool)
+        for condition in conditions:
+            col, symbol, value = parse_condition(condition)
+            compare = OPERATORS[symbol]
+            if col in self.numeric:
+                try:
+                    number = float(value)
+                except ValueError:
+                    raise FilterError(f'"{col}" is numeric; cannot compare it with "{value}".') from None
+                values = self.numeric[col]
+                # NaN compares False for every operator except !=, so exclude it explicitly
+                mask &= compare(values, number) & ~np.isnan(values)
+            elif col in self.text:
+                if symbol not in ('==', '=', '!='):
+                    raise FilterError(f'"{col}" is text; only == and != are supported.')
+                codes, uniques = self.text[col]
+                # Trailing False is what missing values (code -1) pick up
+                matches = np.array([u == value.lower() for u in uniques] + [False])
+                mask &= matches[codes] if symbol != '!=' else ~matches[codes] & (codes >= 0)
+            else:
+                raise FilterError(f'Unknown column "{col}". Filterable columns: {", ".join(self.columns)}.')
+        return mask
+
+    def query(self, conditions, sort=None, descending=False, limit=10, offset=0):
+        """(total matches, row positions for the requested page), in catalog or sorted order."""
+        if sort is not None and sort not in self.order:
+            raise FilterError(f'Cannot sort by "{sort}". Sortable columns: {", ".join(self.order)}.')
+        mask = self.mask(conditions)
+        if sort is None:
+            positions = np.flatnonzero(mask)
+        else:
+            order = self.order[sort]
+            if descending:
+                # Reverse the finite part only, so missing values stay at the end
+                finite = int(np.count_nonzero(~np.isnan(self.numeric[sort])))
+                order = np.concatenate([order[:finite][::-1], order[finite:]])
+            positions = order[mask[order]]
+        return len(positions), positions[offset:offset + limit]
@@ -0,0 +1,182 @@
+"""Precomputed Morgan fingerprints for fast similarity search over the drug catalog."""
+import glob
+import hashlib
+import os
+
+import numpy as np
+from rdkit import Chem
+from rdkit.Chem import rdFingerprintGenerator
+
+FP_RADIUS = 2
+FP_SIZE = 2048
+# Bump when the on-disk layout or the way rows are derived from the CSV changes
+CACHE_VERSION = 1
+
+# Popcount of every possible byte, used when np.bitwise_count (NumPy >= 2.0) is unavailable
+_BYTE_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount_rows(bits):
+    """Number of set bits in each row of a packed uint8 fingerprint matrix."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bits).sum(axis=-1, dtype=np.int32)
+    return _BYTE_POPCOUNT[bits].sum(axis=-1, dtype=np.int32)
+
+
+def top_k(scores, k):
+    """Positions of the k highest scores, best first (ties broken by higher position first)."""
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        # Partition to find the k-th best score, then keep ties at the boundary deterministic
+        kth = np.partition(scores, n - k)[n - k]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[::-1][:k - len(above)]
+        candidates = np.concatenate([above, ties])
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((-candidates, -scores[candidates]))
+    return candidates[order]
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    """SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_prefix(csv_path, radius, fp_size):
+    """Cache files live next to the CSV and share this prefix for every checksum."""
+    stem, _ = os.path.splitext(csv_path)
+    return f"{stem}.fp-v{CACHE_VERSION}-r{radius}-{fp_size}"
+
+
+class FingerprintStore:
+    """Packed Morgan fingerprint matrix aligned with the positions of drug_data rows.
+
+    Rows whose SMILES could not be parsed are kept as all-zero fingerprints and
+    flagged in ``valid`` so that positions always line up with the DataFrame.
+    """
+
+    def __init__(self, bits, valid, radius=FP_RADIUS, fp_size=FP_SIZE, counts=None):
+        self.bits = bits
+        self.valid = valid
+        self.radius = radius
+        self.fp_size = fp_size
+        self.counts = popcount_rows(bits) if counts is None else counts
+        self._generator = rdFingerprintGenerator.GetMorganGenerator(radius=radius, fpSize=fp_size)
+
+    def __len__(self):
+        return len(self.bits)
+
+    @classmethod
+    def from_smiles(cls, smiles_list, radius=FP_RADIUS, fp_size=FP_SIZE):
+        """Fingerprint every SMILES once and pack the bits into an (N, fp_size / 8) matrix."""
+        generator = rdFingerprintGenerator.GetMorganGenerator(radius=radius, fpSize=fp_size)
+        bits = np.zeros((len(smiles_list), fp_size // 8), dtype=np.uint8)
+        valid = np.zeros(len(smiles_list), dtype=bool)
+        for pos, smiles in enumerate(smiles_list):
+            if not isinstance(smiles, str) or not smiles:
+                continue
+            mol = Chem.MolFromSmiles(smiles)
+            if mol is None:
+                continue
+            bits[pos] = np.packbits(generator.GetFingerprintAsNumPy(mol))
+            valid[pos] = True
+        return cls(bits, valid, radius=radius, fp_size=fp_size)
+
+    @classmethod
+    def load_or_build(cls, csv_path, smiles_list, radius=FP_RADIUS, fp_size=FP_SIZE):
+        """Memory-map the cached fingerprints for this CSV, rebuilding them when the CSV changes.
+
+        The cache is keyed by the CSV's SHA-256 plus the fingerprint parameters, so workers
+        that start against the same data share the same read-only pages.
+        """
+        prefix = cache_prefix(csv_path, radius, fp_size)
+        try:
+            base = f"{prefix}-{file_checksum(csv_path)[:16]}"
+        except OSError as e:
+            print(f"Fingerprint cache disabled ({e}); building in memory")
+            return cls.from_smiles(smiles_list, radius=radius, fp_size=fp_size)
+
+        try:
+            bits = np.load(f"{base}.bits.npy", mmap_mode='r')
+            valid = np.load(f"{base}.valid.npy", mmap_mode='r')
+            counts = np.load(f"{base}.counts.npy", mmap_mode='r')
+            if len(bits) == len(valid) == len(counts) == len(smiles_list):
+                return cls(bits, valid, radius=radius, fp_size=fp_size, counts=counts)
+        except (OSError, ValueError):
+            pass
+
+        store = cls.from_smiles(smiles_list, radius=radius, fp_size=fp_size)
+        try:
+            store.save(base)
+            for stale in glob.glob(f"{glob.escape(prefix)}-*.npy"):
+                if not stale.startswith(base):
+                    os.remove(stale)
+        except OSError as e:
+            print(f"Could not write fingerprint cache: {e}")
+        return store
+
+    def save(self, base):
+        """Write bits/valid/counts as .npy files, atomically replacing any previous copy."""
+        for name, array in (('bits', self.bits), ('valid', self.valid), ('counts', self.counts)):
+            tmp_path = f"{base}.{name}.{os.getpid()}.tmp.npy"
+            np.save(tmp_path, np.ascontiguousarray(array))
+            os.replace(tmp_path, f"{base}.{name}.npy")
+
+    def fingerprint(self, smiles):
+        """Packed fingerprint for a query SMILES, or None if RDKit cannot parse it."""
+        mol = Chem.MolFromSmiles(smiles)
+        if mol is None:
+            return None
+        return self.fingerprint_mol(mol)
+
+    def fingerprint_mol(self, mol):
+        """Packed fingerprint for an RDKit molecule."""
+        return np.packbits(self._generator.GetFingerprintAsNumPy(mol))
+
+    def tanimoto(self, query_bits, positions=None):
+        """Tanimoto similarity of one packed query against every row (or just positions); invalid rows score -1."""
+        bits, counts, valid = self.bits, self.counts, self.valid
+        if positions is not None:
+            bits, counts, valid = bits[positions], counts[positions], valid[positions]
+        common = popcount_rows(np.bitwise_and(bits, query_bits))
+        union = counts + popcount_rows(query_bits) - common
+        scores = np.divide(common, union, out=np.zeros(len(bits), dtype=np.float64), where=union > 0)
+        scores[~valid] = -1.0
+        return scores
+
+    def pairwise(self, positions):
+        """(n, n) Tanimoto matrix between the given rows; pairs involving an invalid row are NaN."""
+        bits = np.asarray(self.bits[positions])
+        counts = np.asarray(self.counts[positions])
+        common = popcount_rows(np.bitwise_and(bits[:, None, :], bits[None, :, :]))
+        union = counts[:, None] + counts[None, :] - common
+        scores = np.divide(common, union, out=np.zeros(union.shape, dtype=np.float64), where=union > 0)
+        invalid = ~np.asarray(self.valid[positions])
+        scores[invalid, :] = np.nan
+        scores[:, invalid] = np.nan
+        return scores
+
+    def ranked(self, scores, batch=64):
+        """Yield valid positions in descending score order, partitioning only as far as consumed."""
+        k = min(batch, len(scores))
+        seen = top_k(scores, k)
+        for pos in seen:
+            if scores[pos] < 0:
+                return
+            yield int(pos)
+        if k >= len(scores):
+            return
+        rest = np.ones(len(scores), dtype=bool)
+        rest[seen] = False
+        remaining = np.flatnonzero(rest)
+        for pos in remaining[top_k(scores[remaining], len(remaining))]:
+            if scores[pos] < 0:
+                return
+            yield int(pos)
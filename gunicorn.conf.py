@@ -0,0 +1,81 @@
+"""Production serving: gunicorn -c gunicorn.conf.py app:app
+
+The app is loaded once in the master (preload_app) with the read-only
+subsystems warmed: the catalog, fingerprints, search indexes, KG and
+substructure/screening matrices. The workers then fork and share those pages
+copy-on-write instead of each loading its own copy. Subsystems that hold
+threads, process pools or SQLite connections (conformers, insights) are warmed
+in each worker after the fork.
+
+PHARMASAGE_POOL picks the worker shape, so CPU-bound and I/O-bound routes can
+run as separate pools behind a proxy (see README_Flask_App.md):
+
+    all        every route (default): one worker per core, a few threads each
+    chemistry  RDKit/numpy routes: one worker per core, few threads
+    io         /api/insights*, /api/chatbot: few workers, many threads waiting on upstream APIs
+
+Every knob can be overridden with GUNICORN_* environment variables. Per-route
+concurrency inside a worker is set by limits.py, whose limits are kept below
+the thread count (see there). So set threads with GUNICORN_THREADS, not
+--threads: the preloaded app reads them from this file.
+"""
+import gc
+import os
+
+CORES = os.cpu_count() or 1
+POOL = os.getenv('PHARMASAGE_POOL', 'all')
+POOL_SHAPES = {
+    # (workers, threads per worker)
+    'all': (CORES, 4),
+    'chemistry': (CORES, 2),
+    'io': (max(1, CORES // 4), 32),
+}
+if POOL not in POOL_SHAPES:
+    raise ValueError(f"PHARMASAGE_POOL must be one of {', '.join(POOL_SHAPES)}, not {POOL!r}")
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', str(POOL_SHAPES[POOL][0])))
+threads = int(os.getenv('GUNICORN_THREADS', str(POOL_SHAPES[POOL][1])))
+worker_class = 'gthread'
+preload_app = True
+backlog = int(os.getenv('GUNICORN_BACKLOG', '2048'))
+# Streamed insights and large screens outlive the default 30 s
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then so slow leaks (RDKit, caches) cannot grow without bound
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '10000'))
+max_requests_jitter = max_requests // 10
+
+PRELOAD = {
+    'all': 'chemistry,kg,substructure,screening',
+    'chemistry': 'chemistry,substructure,screening',
+    'io': 'kg',
+}
+POST_FORK_WARM = {'all': 'conformers,insights', 'chemistry': 'conformers', 'io': 'insights'}
+
+# Read by app.py at import, i.e. in the master before forking
+os.environ.setdefault('PHARMASAGE_WARM_UP', PRELOAD[POOL])
+# limits.py caps every route group below this, so a full group is answered 429 while others keep a thread
+os.environ['PHARMASAGE_THREADS'] = str(threads)
+# Process pools inside each worker split the cores between workers rather than each claiming all of them
+for name in ('SUBSTRUCTURE_WORKERS', 'EMBED_WORKERS', 'SCREEN_WORKERS', 'DERIVED_WORKERS'):
+    os.environ.setdefault(name, str(max(1, CORES // workers)))
+
+
+def when_ready(server):
+    if server.cfg.threads != threads:
+        raise RuntimeError(f"Route limits were sized for {threads} threads but the server runs "
+                           f"{server.cfg.threads}; set GUNICORN_THREADS instead of --threads")
+    # Move everything loaded so far out of the collector's view: collections in the
+    # workers then never touch (and so never copy) the shared pages
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"PharmaSage {POOL} pool: {workers} workers x {threads} threads")
+
+
+def post_fork(server, worker):
+    from app import SUBSYSTEMS
+    from subsystems import warm_up
+    for name, seconds in warm_up(SUBSYSTEMS, POST_FORK_WARM[POOL]).items():
+        server.log.info(f"Worker {worker.pid} warmed up {name} in {seconds * 1000:.0f} ms")
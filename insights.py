@@ -0,0 +1,406 @@
+"""Literature fetching and LLM summarization behind /api/insights.
+
+Serper and arXiv are queried concurrently over pooled keep-alive sessions, and
+article lists are kept in a TTL cache per normalized drug name. Endpoints are
+read from the environment (SERPER_URL, ARXIV_URL, GROQ_BASE_URL) and the fetchers
+can be replaced outright, so local stub servers can stand in for the real APIs.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import feedparser
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import span
+
+SERPER_URL = os.getenv('SERPER_URL', 'https://google.serper.dev/search')
+ARXIV_URL = os.getenv('ARXIV_URL', 'http://export.arxiv.org/api/query')
+GROQ_BASE_URL = os.getenv('GROQ_BASE_URL') or None
+GROQ_MODEL = 'llama3-70b-8192'
+FETCH_TIMEOUT = float(os.getenv('INSIGHTS_FETCH_TIMEOUT', '15'))
+ARTICLE_CACHE_TTL = float(os.getenv('INSIGHTS_ARTICLE_TTL', '3600'))
+SUMMARY_CACHE_PATH = os.getenv('INSIGHTS_SUMMARY_CACHE_PATH', 'data/summary_cache.sqlite')
+SUMMARY_CACHE_TTL = float(os.getenv('INSIGHTS_SUMMARY_TTL', str(7 * 24 * 3600)))
+SUMMARY_CACHE_MAX_BYTES = int(os.getenv('INSIGHTS_SUMMARY_CACHE_BYTES', str(64 * 1024 * 1024)))
+# Seconds a request waits on an identical fetch or summary already in flight before giving up
+FLIGHT_WAIT_TIMEOUT = float(os.getenv('INSIGHTS_FLIGHT_WAIT_TIMEOUT', '120'))
+
+PROMPT_TEMPLATE = """
+You are a biomedical research assistant. Given the following texts about the molecule **{drug_name}**, generate a detailed and well-formatted scientific summary in paragraph form. Cover:
+
+1. Therapeutic applications and clinical use  
+2. Mechanism of action and biological targets  
+3. Pharmacokinetics and dosing information  
+4. Recent research findings or clinical trials  
+5. Known safety profile or regulatory status
+
+### Research Snippets:
+{combined_text}
+
+Write a clear, professional summary suitable for a drug discovery platform.
+"""
+
+
+def normalize_drug_name(drug_name):
+    """Cache key for a drug name: trimmed, lowercased, single-spaced."""
+    return ' '.join(drug_name.lower().split())
+
+
+def make_session(pool_size=16):
+    """requests session with a keep-alive connection pool shared by all requests."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class TTLCache:
+    """Thread-safe dict whose entries expire ttl seconds after they are set."""
+
+    def __init__(self, ttl, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._data) >= self.max_entries:
+                now = time.monotonic()
+                for stale in [k for k, (expires, _) in self._data.items() if expires < now]:
+                    del self._data[stale]
+                if len(self._data) >= self.max_entries:
+                    self._data.pop(next(iter(self._data)))
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+
+def fetch_serper_articles(drug_name, session, api_key, url=SERPER_URL, timeout=FETCH_TIMEOUT):
+    """PubMed/NCBI search results from Serper as (texts, articles)."""
+    query = f"{drug_name} drug mechanism of action OR clinical trial site:ncbi.nlm.nih.gov OR site:pubmed.ncbi.nlm.nih.gov"
+    headers = {"X-API-KEY": api_key, "Content-Type": "application/json"}
+    payload = {"q": query}
+    try:
+        resp = session.post(url, headers=headers, json=payload, timeout=timeout)
+        if resp.status_code != 200:
+            return [], []
+        results = resp.json().get('organic', [])
+        articles = []
+        texts = []
+        for r in results:
+            title = r.get("title", "")
+            snippet = r.get("snippet", "")
+            link = r.get("link", "")
+            if snippet and link:
+                articles.append({"title": title, "snippet": snippet, "link": link, "source": "PubMed/Serper"})
+                texts.append(snippet)
+        return texts, articles
+    except Exception:
+        return [], []
+
+
+def fetch_arxiv_articles(drug_name, session, url=ARXIV_URL, timeout=FETCH_TIMEOUT):
+    """Top arXiv matches as (texts, articles)."""
+    params = {"search_query": f"all:{drug_name}", "start": 0, "max_results": 5}
+    try:
+        feed = feedparser.parse(session.get(url, params=params, timeout=timeout).text)
+        articles = []
+        texts = []
+        for entry in feed.entries:
+            title = entry.get("title", "")
+            summary = entry.get("summary", "")
+            link = entry.get("link", "")
+            if summary and link:
+                articles.append({"title": title, "snippet": summary, "link": link, "source": "arXiv"})
+                texts.append(summary)
+        return texts, articles
+    except Exception:
+        return [], []
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key so only the first one does the work.
+
+    The leader gets ``(future, True)`` from ``acquire`` and must call ``release``;
+    followers get ``(future, False)`` and ``wait`` on it, for at most ``timeout`` seconds.
+    """
+
+    def __init__(self, timeout=FLIGHT_WAIT_TIMEOUT):
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def release(self, key, result=None, error=None):
+        with self._lock:
+            future = self._calls.pop(key)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def wait(self, future):
+        """The leader's result, raising TimeoutError if it takes longer than the timeout."""
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise TimeoutError(f'Gave up after waiting {self.timeout:g} s for the same request in flight.') from None
+
+    def do(self, key, fn):
+        """Return fn() for the leader, or the leader's result for concurrent callers."""
+        future, leader = self.acquire(key)
+        if not leader:
+            return self.wait(future)
+        try:
+            result = fn()
+        except Exception as e:
+            self.release(key, error=e)
+            raise
+        self.release(key, result=result)
+        return result
+
+
+class SummaryCache:
+    """Persistent summaries keyed by content hash, with TTL expiry and a total-size cap."""
+
+    def __init__(self, path=SUMMARY_CACHE_PATH, ttl=SUMMARY_CACHE_TTL, max_bytes=SUMMARY_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS summaries '
+                         '(key TEXT PRIMARY KEY, summary TEXT NOT NULL, created REAL NOT NULL, size INTEGER NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS summaries_created ON summaries (created)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(drug_name, model, template, texts):
+        """Content address of a summary: drug, model, prompt template and the sorted snippet set."""
+        material = json.dumps([normalize_drug_name(drug_name), model, template, sorted(set(texts))])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        row = self._connect().execute('SELECT summary, created FROM summaries WHERE key = ?', (key,)).fetchone()
+        if row is not None and row[1] + self.ttl < time.time():
+            with self._connect() as conn:
+                conn.execute('DELETE FROM summaries WHERE key = ?', (key,))
+            row = None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return row[0] if row is not None else None
+
+    def set(self, key, summary):
+        size = len(summary.encode('utf-8'))
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO summaries (key, summary, created, size) VALUES (?, ?, ?, ?)',
+                         (key, summary, time.time(), size))
+            conn.execute('DELETE FROM summaries WHERE created < ?', (time.time() - self.ttl,))
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM summaries').fetchone()[0]
+            if total > self.max_bytes:
+                # Evict oldest entries until the cache fits again
+                for old_key, old_size in conn.execute('SELECT key, size FROM summaries ORDER BY created').fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute('DELETE FROM summaries WHERE key = ?', (old_key,))
+                    total -= old_size
+
+
+def sse_event(event, payload):
+    """One Server-Sent Events frame carrying a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def build_prompt(drug_name, texts):
+    combined_text = "\n".join([f"{i+1}. {txt}" for i, txt in enumerate(texts)])
+    return PROMPT_TEMPLATE.format(drug_name=drug_name, combined_text=combined_text)
+
+
+class InsightsService:
+    """Shared session, thread pool, Groq client and article cache for the insights endpoint.
+
+    ``fetchers`` is a list of callables ``fetcher(drug_name) -> (texts, articles)``; by
+    default Serper and arXiv. Results are concatenated in list order.
+    """
+
+    def __init__(self, serper_api_key=None, groq_api_key=None, fetchers=None, groq_base_url=GROQ_BASE_URL,
+                 article_ttl=ARTICLE_CACHE_TTL, summary_cache=None, max_workers=8):
+        self.serper_api_key = serper_api_key if serper_api_key is not None else os.getenv('SERPER_API_KEY')
+        self.groq_api_key = groq_api_key if groq_api_key is not None else os.getenv('GROQ_API_KEY')
+        self.groq_base_url = groq_base_url
+        self.session = make_session()
+        self.fetchers = fetchers if fetchers is not None else [
+            lambda name: fetch_serper_articles(name, self.session, self.serper_api_key),
+            lambda name: fetch_arxiv_articles(name, self.session),
+        ]
+        self.article_cache = TTLCache(article_ttl)
+        self.summary_cache = summary_cache if summary_cache is not None else SummaryCache()
+        self._article_flights = SingleFlight()
+        self._summary_flights = SingleFlight()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='insights')
+        self._groq_client = None
+        self._groq_lock = threading.Lock()
+
+    def missing_keys(self):
+        """Names of required API keys that are not configured."""
+        return [name for name, value in (('SERPER_API_KEY', self.serper_api_key), ('GROQ_API_KEY', self.groq_api_key)) if not value]
+
+    def groq_client(self):
+        """Module-lifetime Groq client, created on first use."""
+        with self._groq_lock:
+            if self._groq_client is None:
+                from groq import Groq
+                self._groq_client = Groq(api_key=self.groq_api_key, base_url=self.groq_base_url)
+            return self._groq_client
+
+    def fetch_articles(self, drug_name):
+        """Run every fetcher concurrently and return (texts, articles), cached per drug name."""
+        key = normalize_drug_name(drug_name)
+        cached = self.article_cache.get(key)
+        if cached is not None:
+            return cached
+        return self._article_flights.do(key, lambda: self._fetch_articles(key, drug_name))
+
+    def _fetch_articles(self, key, drug_name):
+        futures = [self._pool.submit(fetcher, drug_name) for fetcher in self.fetchers]
+        texts = []
+        articles = []
+        with span('insights.fetch'):
+            for future in futures:
+                fetched_texts, fetched_articles = future.result()
+                texts.extend(fetched_texts)
+                articles.extend(fetched_articles)
+        if texts:
+            self.article_cache.set(key, (texts, articles))
+        return texts, articles
+
+    def _complete(self, drug_name, texts, stream=False):
+        return self.groq_client().chat.completions.create(
+            model=GROQ_MODEL,
+            messages=[{"role": "user", "content": build_prompt(drug_name, texts)}],
+            temperature=0.3,
+            stream=stream
+        )
+
+    def summarize(self, drug_name, texts):
+        """Scientific summary of the snippets from the Groq chat model, or an error string.
+
+        Summaries are cached by content hash, and concurrent requests for the same
+        content share a single upstream call.
+        """
+        key = SummaryCache.make_key(drug_name, GROQ_MODEL, PROMPT_TEMPLATE, texts)
+        cached = self.summary_cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            return self._summary_flights.do(key, lambda: self._generate_summary(key, drug_name, texts))
+        except Exception as e:
+            return f"❌ Error generating summary with Groq: {str(e)}"
+
+    def _generate_summary(self, key, drug_name, texts):
+        with span('insights.llm'):
+            response = self._complete(drug_name, texts)
+        summary = response.choices[0].message.content.strip()
+        self._cache_summary(key, summary)
+        return summary
+
+    def _cache_summary(self, key, summary):
+        """Store a non-empty summary; a failed write is logged, since the summary itself is fine."""
+        if not summary:
+            return
+        try:
+            self.summary_cache.set(key, summary)
+        except Exception as e:
+            print(f"Caching summary {key} failed: {e}")
+
+    def summarize_stream(self, drug_name, texts):
+        """Yield the summary in chunks as the streaming chat completion produces them.
+
+        Cached summaries are yielded whole; a request that arrives while the same
+        summary is already being generated waits for it instead of calling the model again.
+        """
+        key = SummaryCache.make_key(drug_name, GROQ_MODEL, PROMPT_TEMPLATE, texts)
+        cached = self.summary_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        future, leader = self._summary_flights.acquire(key)
+        if not leader:
+            try:
+                yield self._summary_flights.wait(future)
+            except Exception as e:
+                yield f"❌ Error generating summary with Groq: {str(e)}"
+            return
+
+        chunks = []
+        try:
+            started = False
+            # Covers the whole generation, including time the client takes to read each chunk
+            with span('insights.llm_stream'):
+                for chunk in self._complete(drug_name, texts, stream=True):
+                    text = chunk.choices[0].delta.content if chunk.choices else None
+                    if not text:
+                        continue
+                    if not started:
+                        text = text.lstrip()
+                        started = bool(text)
+                    if text:
+                        chunks.append(text)
+                        yield text
+        except Exception as e:
+            self._summary_flights.release(key, error=e)
+            yield f"❌ Error generating summary with Groq: {str(e)}"
+            return
+        except GeneratorExit:
+            # Client went away mid-stream; let any waiters retry on their own
+            self._summary_flights.release(key, error=RuntimeError('Summary stream was interrupted.'))
+            raise
+        summary = ''.join(chunks).strip()
+        try:
+            self._cache_summary(key, summary)
+        finally:
+            self._summary_flights.release(key, result=summary)
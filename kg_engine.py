@@ -0,0 +1,139 @@
+"""In-memory knowledge graph over the (head, relation, tail) triples CSV.
+
+Node and relation names are interned to integer IDs, and edges are indexed three
+ways: CSR out-adjacency, CSR in-adjacency and a per-relation edge list. That keeps
+k-hop neighbourhood queries to a few NumPy gathers per hop.
+"""
+import numpy as np
+import pandas as pd
+
+
+def _csr(keys, n):
+    """Edge ids grouped by key, plus the indptr array delimiting each key's slice."""
+    order = np.argsort(keys, kind='stable').astype(np.int32)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n), out=indptr[1:])
+    return indptr, order
+
+
+def _gather(indptr, order, nodes):
+    """All edge ids stored under any of the given keys, in key order."""
+    starts = indptr[nodes]
+    counts = indptr[nodes + 1] - starts
+    total = int(counts.sum())
+    if not total:
+        return np.empty(0, dtype=np.int32)
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+    return order[offsets]
+
+
+class KnowledgeGraph:
+    """Integer-encoded triple store with adjacency indexes."""
+
+    def __init__(self, heads, relations, tails):
+        node_ids, self.node_names = pd.factorize(pd.concat([pd.Series(heads), pd.Series(tails)], ignore_index=True))
+        relation_ids, self.relation_names = pd.factorize(pd.Series(relations))
+        n_edges = len(heads)
+        self.heads = node_ids[:n_edges].astype(np.int32)
+        self.tails = node_ids[n_edges:].astype(np.int32)
+        self.relations = relation_ids.astype(np.int32)
+        n_nodes = len(self.node_names)
+        self.out_indptr, self.out_edges = _csr(self.heads, n_nodes)
+        self.in_indptr, self.in_edges = _csr(self.tails, n_nodes)
+        self.rel_indptr, self.rel_edges = _csr(self.relations, len(self.relation_names))
+        self._node_lookup = {}
+        for node_id, name in enumerate(self.node_names):
+            self._node_lookup.setdefault(str(name).lower(), node_id)
+        self._relation_lookup = {name: rel_id for rel_id, name in enumerate(self.relation_names)}
+
+    @classmethod
+    def from_csv(cls, path):
+        """Load a triples CSV with head, relation and tail columns; missing values are dropped."""
+        df = pd.read_csv(path, usecols=['head', 'relation', 'tail'], dtype=str).dropna()
+        df = df.drop_duplicates()
+        return cls(df['head'].str.strip().to_numpy(), df['relation'].to_numpy(), df['tail'].str.strip().to_numpy())
+
+    @classmethod
+    def empty(cls):
+        return cls(np.array([], dtype=object), np.array([], dtype=object), np.array([], dtype=object))
+
+    def __len__(self):
+        return len(self.heads)
+
+    def find_node(self, name):
+        """Node id for a name (case-insensitive), or None."""
+        return self._node_lookup.get(name.strip().lower())
+
+    def drug_names(self):
+        """Sorted names of every node that appears as a head, i.e. the drugs."""
+        head_ids = np.flatnonzero(np.diff(self.out_indptr) > 0)
+        return sorted(str(name) for name in self.node_names[head_ids])
+
+    def relation_edges(self, relation):
+        """Edge ids carrying the given relation name."""
+        rel_id = self._relation_lookup.get(relation)
+        if rel_id is None:
+            return np.empty(0, dtype=np.int32)
+        return self.rel_edges[self.rel_indptr[rel_id]:self.rel_indptr[rel_id + 1]]
+
+    def neighbourhood(self, name, hops=1, max_nodes=50, relations=None, direction='both'):
+        """k-hop subgraph around a node as vis-network style JSON, or None if the node is unknown.
+
+        Nodes are admitted in breadth-first order (out-edges before in-edges within
+        a hop) until max_nodes is reached; only edges between admitted nodes are kept.
+        """
+        center = self.find_node(name)
+        if center is None:
+            return None
+        allowed = None
+        if relations:
+            allowed = np.zeros(len(self.relation_names), dtype=bool)
+            for relation in relations:
+                rel_id = self._relation_lookup.get(relation)
+                if rel_id is not None:
+                    allowed[rel_id] = True
+
+        included = np.zeros(len(self.node_names), dtype=bool)
+        included[center] = True
+        order = [center]
+        frontier = np.array([center], dtype=np.int32)
+        for _ in range(hops):
+            if not len(frontier) or len(order) >= max_nodes:
+                break
+            candidates = []
+            if direction in ('out', 'both'):
+                edges = _gather(self.out_indptr, self.out_edges, frontier)
+                if allowed is not None:
+                    edges = edges[allowed[self.relations[edges]]]
+                candidates.append(self.tails[edges])
+            if direction in ('in', 'both'):
+                edges = _gather(self.in_indptr, self.in_edges, frontier)
+                if allowed is not None:
+                    edges = edges[allowed[self.relations[edges]]]
+                candidates.append(self.heads[edges])
+            candidates = np.concatenate(candidates) if candidates else np.empty(0, dtype=np.int32)
+            candidates = candidates[~included[candidates]]
+            _, first = np.unique(candidates, return_index=True)
+            new_nodes = candidates[np.sort(first)][:max_nodes - len(order)]
+            included[new_nodes] = True
+            order.extend(int(node) for node in new_nodes)
+            frontier = new_nodes
+
+        nodes = np.array(order, dtype=np.int32)
+        edges = _gather(self.out_indptr, self.out_edges, nodes)
+        edges = edges[included[self.tails[edges]]]
+        if allowed is not None:
+            edges = edges[allowed[self.relations[edges]]]
+        is_drug = np.diff(self.out_indptr)[nodes] > 0
+        return {
+            'center': str(self.node_names[center]),
+            'nodes': [
+                {'id': int(node), 'label': str(self.node_names[node]),
+                 'group': 'center' if node == center else ('drug' if drug else 'attribute')}
+                for node, drug in zip(nodes, is_drug)
+            ],
+            'edges': [
+                {'from': int(self.heads[edge]), 'to': int(self.tails[edge]), 'label': str(self.relation_names[self.relations[edge]])}
+                for edge in np.sort(edges)
+            ],
+        }
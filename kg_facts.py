@@ -0,0 +1,175 @@
+"""Knowledge-graph triples and natural-language facts from the drug catalog.
+
+Vectorized port of the relation_map / nl_templates cells in kg.ipynb: every
+non-null (drug, column) cell becomes one (head, relation, tail) triple, in the
+same row-major order the notebook's loop produced.
+
+Regenerate pharmasage_kg_triples_cleaned.csv and pharmasage_rag_facts.csv with:
+    python kg_facts.py [--csv data/cleaned_clinical_drugs_dataset.csv] [--format parquet]
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+RELATION_MAP = {
+    'logP': 'logP_value',
+    'logD': 'logD_value',
+    'psa': 'psa_value',
+    'IC50': 'binding_affinity_IC50',
+    'pIC50': 'binding_affinity_pIC50',
+    'toxicity_alert': 'has_toxicity',
+    'drug_likeness': 'drug_likeness_score',
+    'max_phase': 'approved_phase',
+    'target': 'targets',
+    'organism': 'in_organism',
+    'target_type': 'target_type',
+    'mechanism_of_action': 'mechanism_of_action',
+    'efo_term': 'treats',
+    'mesh_heading': 'associated_with_mesh'
+}
+
+# Parsed as floats in every chunk so values render the same as a whole-file read
+NUMERIC_COLUMNS = ['logP', 'logD', 'psa', 'IC50', 'pIC50', 'drug_likeness', 'max_phase']
+FACTS_CHUNK_ROWS = int(os.getenv('KG_FACTS_CHUNK_ROWS', '100000'))
+
+NL_TEMPLATES = {
+    'logP_value': "{} has a logP of {}.",
+    'logD_value': "{} has a logD of {}.",
+    'psa_value': "{} has a polar surface area (PSA) of {}.",
+    'binding_affinity_IC50': "{} has an IC50 value of {} μM.",
+    'binding_affinity_pIC50': "{} has a pIC50 value of {}.",
+    'has_toxicity': "{} has a known toxicity alert: {}.",
+    'drug_likeness_score': "{} has a drug-likeness score of {}.",
+    'approved_phase': "{} is approved up to phase {} in clinical trials.",
+    'targets': "{} targets {}.",
+    'in_organism': "{} is studied in the organism {}.",
+    'target_type': "{} interacts with a target of type {}.",
+    'mechanism_of_action': "The mechanism of action for {} is '{}'.",
+    'treats': "{} is used to treat {}.",
+    'associated_with_mesh': "{} is associated with the MeSH heading '{}'."
+}
+
+
+def _as_text(series):
+    """str(value).strip() for every cell, computed once per distinct value."""
+    if series.dtype == np.float64:
+        # Factorize the bit patterns so -0.0 and 0.0 keep their own spellings
+        codes, bits = pd.factorize(series.to_numpy().view(np.int64))
+        uniques = bits.view(np.float64)
+    else:
+        codes, uniques = pd.factorize(series)
+    text = np.asarray(pd.Index(uniques).astype(str).str.strip(), dtype=object)
+    # Missing cells (code -1) pick an arbitrary entry; callers mask them out
+    return text[codes] if len(text) else np.full(len(codes), '', dtype=object)
+
+
+def build_triples(df, relation_map=RELATION_MAP):
+    """DataFrame of (head, relation, tail) for every non-null mapped cell, row by row."""
+    columns = [col for col in relation_map if col in df.columns]
+    df = df[df['drug_name'].notna()]
+    present = df[columns].notna().to_numpy()
+    rows, cols = np.nonzero(present)
+    values = np.empty(present.shape, dtype=object)
+    for j, col in enumerate(columns):
+        values[:, j] = _as_text(df[col])
+    heads = _as_text(df['drug_name'])
+    relations = np.array([relation_map[col] for col in columns], dtype=object)
+    return pd.DataFrame({'head': heads[rows], 'relation': relations[cols], 'tail': values[rows, cols]})
+
+
+def render_sentences(triples, templates=NL_TEMPLATES):
+    """Sentence per triple whose relation has a template (others are dropped), as a Series."""
+    relation_names = list(templates)
+    codes = pd.Categorical(triples['relation'], categories=relation_names).codes
+    keep = codes >= 0
+    codes = codes[keep]
+    # Split each "{} ... {} ..." template once, then assemble all sentences with array concatenation
+    parts = np.array([templates[name].split('{}') for name in relation_names], dtype=object)
+    heads = triples['head'].to_numpy(dtype=object)[keep]
+    tails = triples['tail'].to_numpy(dtype=object)[keep]
+    sentences = parts[codes, 0] + heads + parts[codes, 1] + tails + parts[codes, 2]
+    return pd.Series(sentences, index=triples.index[keep], dtype=object, name='text')
+
+
+def iter_triples(csv_path, chunksize=FACTS_CHUNK_ROWS, relation_map=RELATION_MAP):
+    """Triples for the catalog CSV, one DataFrame per chunk of input rows."""
+    columns = {'drug_name', *relation_map}
+    dtypes = {col: ('float64' if col in NUMERIC_COLUMNS else str) for col in columns}
+    for chunk in pd.read_csv(csv_path, usecols=lambda col: col in columns, dtype=dtypes, chunksize=chunksize):
+        yield build_triples(chunk, relation_map)
+
+
+class ChunkWriter:
+    """Appends DataFrames to one CSV or Parquet file (chosen by extension) without holding them all."""
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self.rows = 0
+        self._parquet = path.endswith('.parquet')
+        self._writer = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, df):
+        if self._parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode='a' if self.rows else 'w', header=not self.rows, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        if not self.rows and self._writer is None:
+            self.write(pd.DataFrame({col: pd.Series(dtype=object) for col in self.columns}))
+        if self._writer is not None:
+            self._writer.close()
+
+
+def write_kg_files(csv_path, triples_path=None, facts_path=None, chunksize=FACTS_CHUNK_ROWS):
+    """Stream triples and/or RAG facts for a catalog CSV to disk; returns (triple count, fact count).
+
+    Memory is bounded by chunksize input rows.
+    """
+    triple_count = fact_count = 0
+    triples_out = ChunkWriter(triples_path, ['head', 'relation', 'tail']) if triples_path else None
+    facts_out = ChunkWriter(facts_path, ['text']) if facts_path else None
+    try:
+        for triples in iter_triples(csv_path, chunksize):
+            triple_count += len(triples)
+            if triples_out:
+                triples_out.write(triples)
+            if facts_out:
+                facts = render_sentences(triples).to_frame()
+                fact_count += len(facts)
+                facts_out.write(facts)
+    finally:
+        if triples_out:
+            triples_out.close()
+        if facts_out:
+            facts_out.close()
+    return triple_count, fact_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate KG triples and RAG facts from the drug catalog')
+    parser.add_argument('--csv', default='data/cleaned_clinical_drugs_dataset.csv')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--triples', default='data/pharmasage_kg_triples_cleaned')
+    parser.add_argument('--facts', default='data/pharmasage_rag_facts')
+    parser.add_argument('--chunksize', type=int, default=FACTS_CHUNK_ROWS)
+    args = parser.parse_args()
+    triples, facts = write_kg_files(args.csv, f"{args.triples}.{args.format}", f"{args.facts}.{args.format}",
+                                    args.chunksize)
+    print(f"Wrote {triples} triples to {args.triples}.{args.format} and {facts} facts to {args.facts}.{args.format}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""Incremental CPU builder for the chatbot's knowledge-graph FAISS index.
+
+    python kg_index_builder.py [--csv data/cleaned_clinical_drugs_dataset.csv] [--workers 2]
+
+Pipeline: catalog CSV -> triples -> sentences -> embeddings -> index. Sentences are
+identified by a 64-bit content hash. On reruns only unseen sentences are embedded
+and appended to the existing index; sentences that disappeared from the dataset
+are dropped by re-indexing the stored vectors, without re-embedding anything.
+Embedding progress is checkpointed every few batches, each checkpoint a shard
+holding only the batches since the previous one, so an interrupted build resumes
+where it stopped.
+"""
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from kg_facts import iter_triples, render_sentences
+from kg_retrieval import (KG_EMBED_MODEL, KG_FAISS_INDEX, KG_FAISS_META, KG_INDEX_TYPE, TextColumn,
+                          build_faiss_index, save_npy, write_metadata)
+
+KG_TRIPLES_PATH = 'data/pharmasage_kg_triples_cleaned.csv'
+EMBED_BATCH_SIZE = int(os.getenv('KG_EMBED_BATCH_SIZE', '256'))
+EMBED_WORKERS = int(os.getenv('KG_EMBED_WORKERS', '2'))
+# Batches embedded between checkpoint writes
+CHECKPOINT_EVERY = int(os.getenv('KG_CHECKPOINT_EVERY', '8'))
+
+
+def sentence_hashes(sentences):
+    """Stable 64-bit content hash per sentence."""
+    return pd.util.hash_array(np.asarray(sentences, dtype=object))
+
+
+def checkpoint_shards(prefix):
+    """{shard number: path} of the checkpoint shards <prefix>.<n>.npz on disk."""
+    shards = {}
+    for path in glob.glob(f"{glob.escape(prefix)}.*.npz"):
+        number = path[len(prefix) + 1:-len('.npz')]
+        if number.isdigit():
+            shards[int(number)] = path
+    return shards
+
+
+def load_checkpoint(prefix):
+    """(hashes, vectors, next shard number) embedded by an interrupted run, or None."""
+    shards = checkpoint_shards(prefix)
+    if not shards:
+        return None
+    hash_parts = []
+    vector_parts = []
+    for number in sorted(shards):
+        with np.load(shards[number]) as shard:
+            hash_parts.append(shard['hashes'])
+            vector_parts.append(shard['vectors'])
+    return np.concatenate(hash_parts), np.concatenate(vector_parts), max(shards) + 1
+
+
+def save_checkpoint(prefix, number, hashes, vectors):
+    """Write one shard with the vectors embedded since the previous one."""
+    tmp = f"{prefix}.{number}.tmp.npz"
+    np.savez(tmp, hashes=hashes, vectors=vectors)
+    os.replace(tmp, f"{prefix}.{number}.npz")
+
+
+def remove_checkpoint(prefix):
+    for path in checkpoint_shards(prefix).values():
+        os.remove(path)
+
+
+def embed_sentences(texts, hashes, encode, batch_size=EMBED_BATCH_SIZE, workers=EMBED_WORKERS,
+                    checkpoint_every=CHECKPOINT_EVERY, checkpoint_path=None, log=print):
+    """float32 embeddings for texts (row i for texts[i]), resuming from and writing checkpoints.
+
+    checkpoint_path is the prefix of the shard files; each window of batches is saved as its own shard.
+    """
+    done_hashes = np.empty(0, dtype=np.uint64)
+    done_vectors = None
+    shard = 0
+    checkpoint = load_checkpoint(checkpoint_path) if checkpoint_path else None
+    if checkpoint is not None:
+        done_hashes, done_vectors, shard = checkpoint
+        log(f"Resuming from checkpoint with {len(done_hashes)} embedded sentences")
+    todo = np.flatnonzero(~np.isin(hashes, done_hashes))
+    batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+    hash_parts = [done_hashes]
+    vector_parts = [] if done_vectors is None else [done_vectors]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(batches), checkpoint_every):
+            window = batches[start:start + checkpoint_every]
+            for batch, vectors in zip(window, pool.map(lambda b: encode([texts[i] for i in b]), window)):
+                hash_parts.append(hashes[batch])
+                vector_parts.append(np.asarray(vectors, dtype=np.float32))
+            embedded = sum(len(b) for b in batches[:start + len(window)])
+            if checkpoint_path:
+                save_checkpoint(checkpoint_path, shard, np.concatenate(hash_parts[-len(window):]),
+                                np.concatenate(vector_parts[-len(window):]))
+                shard += 1
+            log(f"Embedded {embedded}/{len(todo)} sentences ({embedded / (time.perf_counter() - started):.0f}/s)")
+    if not vector_parts:
+        return np.empty((0, 0), dtype=np.float32)
+    all_hashes = np.concatenate(hash_parts)
+    all_vectors = np.concatenate(vector_parts)
+    return all_vectors[pd.Index(all_hashes).get_indexer(hashes)]
+
+
+def load_sentence_encoder(model_name=KG_EMBED_MODEL):
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(model_name, device='cpu')
+    return lambda texts: model.encode(texts, convert_to_numpy=True, batch_size=len(texts))
+
+
+def build(csv_path, index_path=KG_FAISS_INDEX, meta_path=KG_FAISS_META, triples_path=KG_TRIPLES_PATH,
+          kind=KG_INDEX_TYPE, encode=None, rebuild=False, batch_size=EMBED_BATCH_SIZE, workers=EMBED_WORKERS,
+          checkpoint_every=CHECKPOINT_EVERY, log=print):
+    """Bring the index up to date with the catalog; returns (added, removed, total) sentence counts."""
+    import faiss
+    triples = pd.concat(iter_triples(csv_path), ignore_index=True)
+    texts = render_sentences(triples).drop_duplicates().tolist()
+    if not texts:
+        # Nothing to index; leave the existing index and triples file as they are
+        raise ValueError(f"{csv_path} yields no knowledge-graph sentences")
+    if triples_path:
+        # /api/kg reads this file, so it is swapped in whole
+        tmp = f"{triples_path}.{os.getpid()}.tmp"
+        triples.to_csv(tmp, index=False)
+        os.replace(tmp, triples_path)
+    hashes = sentence_hashes(texts)
+    log(f"{len(triples)} triples -> {len(texts)} unique sentences")
+
+    vectors_path = f"{meta_path}.vectors.npy"
+    old_hashes = np.empty(0, dtype=np.uint64)
+    old_vectors = None
+    old_texts = []
+    if not rebuild and os.path.exists(vectors_path) and os.path.exists(f"{meta_path}.hashes.npy"):
+        old_hashes = np.load(f"{meta_path}.hashes.npy")
+        old_vectors = np.load(vectors_path)
+        old_texts = TextColumn(meta_path).tolist()
+
+    keep = np.isin(old_hashes, hashes)
+    new = np.flatnonzero(~np.isin(hashes, old_hashes))
+    removed = len(old_hashes) - int(keep.sum())
+    if not len(new) and not removed and os.path.exists(index_path):
+        log("Index is up to date")
+        return 0, 0, len(old_hashes)
+
+    if encode is None and len(new):
+        encode = load_sentence_encoder()
+    checkpoint_path = f"{meta_path}.checkpoint"
+    new_texts = [texts[i] for i in new]
+    new_vectors = embed_sentences(new_texts, hashes[new], encode, batch_size, workers, checkpoint_every,
+                                  checkpoint_path, log)
+
+    index = None
+    if old_vectors is not None and not removed and os.path.exists(index_path):
+        index = faiss.read_index(index_path)
+        if index.ntotal != len(old_hashes):
+            index = None
+    if index is not None:
+        if len(new_vectors):
+            index.add(new_vectors)
+        vectors = np.concatenate([old_vectors, new_vectors]) if len(new_vectors) else old_vectors
+        log(f"Appended {len(new)} vectors to {index_path}")
+    else:
+        parts = [old_vectors[keep]] if old_vectors is not None and keep.any() else []
+        if len(new_vectors):
+            parts.append(new_vectors)
+        vectors = np.concatenate(parts)
+        index = build_faiss_index(vectors, kind)
+        log(f"Indexed {len(vectors)} vectors into a new {kind} index")
+
+    final_texts = [text for text, kept in zip(old_texts, keep) if kept] + new_texts
+    final_hashes = np.concatenate([old_hashes[keep], hashes[new]])
+    save_npy(vectors_path, vectors)
+    write_metadata(meta_path, final_texts, final_hashes)
+    tmp = f"{index_path}.tmp"
+    faiss.write_index(index, tmp)
+    os.replace(tmp, index_path)
+    remove_checkpoint(checkpoint_path)
+    return len(new), removed, len(final_hashes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or update the knowledge-graph FAISS index')
+    parser.add_argument('--csv', default='data/cleaned_clinical_drugs_dataset.csv')
+    parser.add_argument('--index', default=KG_FAISS_INDEX)
+    parser.add_argument('--meta', default=KG_FAISS_META)
+    parser.add_argument('--triples', default=KG_TRIPLES_PATH, help="where to write the triples CSV ('' to skip)")
+    parser.add_argument('--kind', choices=['hnsw', 'ivf'], default=KG_INDEX_TYPE)
+    parser.add_argument('--batch-size', type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=EMBED_WORKERS)
+    parser.add_argument('--checkpoint-every', type=int, default=CHECKPOINT_EVERY)
+    parser.add_argument('--rebuild', action='store_true', help='ignore the existing index and re-embed everything')
+    args = parser.parse_args()
+    try:
+        added, removed, total = build(args.csv, args.index, args.meta, args.triples, args.kind, rebuild=args.rebuild,
+                                      batch_size=args.batch_size, workers=args.workers,
+                                      checkpoint_every=args.checkpoint_every)
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+    print(f"Added {added}, removed {removed}; {total} sentences indexed in {args.index}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""Vector retrieval over knowledge-graph sentences for /api/chatbot.
+
+The FAISS index (HNSW or IVF) is memory-mapped where FAISS supports it, and the
+sentence metadata is a pair of .npy columns (UTF-8 blob + offsets) instead of a
+pickled list. The embedding model loads on first use, and concurrent queries are
+embedded and searched together in one batch.
+
+Convert the notebook's IndexFlatL2 + pickle artifacts with:
+    python kg_retrieval.py --convert --index kg_faiss_index.faiss --meta kg_faiss_metadata.pkl
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+KG_FAISS_INDEX = os.getenv('KG_FAISS_INDEX', 'data/kg_faiss_index.faiss')
+KG_FAISS_META = os.getenv('KG_FAISS_META', 'data/kg_faiss_metadata')
+KG_EMBED_MODEL = os.getenv('KG_EMBED_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+KG_INDEX_TYPE = os.getenv('KG_INDEX_TYPE', 'hnsw')
+KG_HNSW_M = 32
+KG_HNSW_EF_SEARCH = int(os.getenv('KG_HNSW_EF_SEARCH', '64'))
+KG_IVF_NPROBE = int(os.getenv('KG_IVF_NPROBE', '16'))
+KG_RESULT_CACHE_SIZE = int(os.getenv('KG_RESULT_CACHE_SIZE', '4096'))
+# Queries arriving within this window (seconds) are embedded in one forward pass
+KG_BATCH_WAIT = float(os.getenv('KG_BATCH_WAIT', '0.005'))
+KG_BATCH_MAX = int(os.getenv('KG_BATCH_MAX', '32'))
+KG_QUERY_TIMEOUT = float(os.getenv('KG_QUERY_TIMEOUT', '10'))
+
+
+def save_npy(path, array):
+    """np.save via a temporary file, so readers never see a partially written array."""
+    tmp = f"{path[:-len('.npy')]}.tmp.npy"
+    np.save(tmp, array)
+    os.replace(tmp, path)
+
+
+def write_metadata(base, texts, hashes=None):
+    """Store sentences as <base>.text.npy (UTF-8 bytes) and <base>.offsets.npy (int64, n + 1).
+
+    Content hashes, when given, go to <base>.hashes.npy for incremental rebuilds.
+    """
+    encoded = [text.encode('utf-8') for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    directory = os.path.dirname(base)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    save_npy(f"{base}.text.npy", np.frombuffer(b''.join(encoded), dtype=np.uint8))
+    if hashes is not None:
+        save_npy(f"{base}.hashes.npy", np.asarray(hashes, dtype=np.uint64))
+    save_npy(f"{base}.offsets.npy", offsets)
+
+
+class TextColumn:
+    """Read-only, memory-mapped view of sentences written by write_metadata."""
+
+    def __init__(self, base):
+        self.blob = np.load(f"{base}.text.npy", mmap_mode='r')
+        self.offsets = np.load(f"{base}.offsets.npy", mmap_mode='r')
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+
+    def tolist(self):
+        data = self.blob.tobytes()
+        offsets = self.offsets.tolist()
+        return [data[start:end].decode('utf-8') for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def build_faiss_index(embeddings, kind=KG_INDEX_TYPE):
+    """Approximate L2 index over float32 embeddings: 'hnsw' (no training) or 'ivf' (k-means lists)."""
+    import faiss
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    n, dim = embeddings.shape
+    if kind == 'hnsw':
+        index = faiss.IndexHNSWFlat(dim, KG_HNSW_M)
+    elif kind == 'ivf':
+        nlist = max(1, min(int(4 * np.sqrt(n)), n // 39 or 1))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist)
+        index.train(embeddings)
+    else:
+        raise ValueError(f"Unknown index type: {kind}")
+    index.add(embeddings)
+    return index
+
+
+def read_faiss_index(path):
+    """Load an index memory-mapped when FAISS supports it for the index type, else into RAM."""
+    import faiss
+    try:
+        index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        index = faiss.read_index(path)
+    if hasattr(index, 'hnsw'):
+        index.hnsw.efSearch = KG_HNSW_EF_SEARCH
+    elif hasattr(index, 'nprobe'):
+        index.nprobe = KG_IVF_NPROBE
+    return index
+
+
+def normalize_query(query):
+    return ' '.join(query.split())
+
+
+class KGRetriever:
+    """Top-k knowledge-graph sentences for free-text questions.
+
+    Nothing is loaded until the first search; results are kept in an LRU keyed by
+    (normalized query, k).
+    """
+
+    def __init__(self, index_path=KG_FAISS_INDEX, meta_path=KG_FAISS_META, model_name=KG_EMBED_MODEL,
+                 encoder=None, cache_size=KG_RESULT_CACHE_SIZE, batch_wait=KG_BATCH_WAIT, batch_max=KG_BATCH_MAX):
+        self.index_path = index_path
+        self.meta_path = meta_path
+        self.model_name = model_name
+        self.cache_size = cache_size
+        self.batch_wait = batch_wait
+        self.batch_max = batch_max
+        self.hits = 0
+        self.misses = 0
+        self._encoder = encoder
+        self._index = None
+        self._texts = None
+        self._load_lock = threading.Lock()
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+
+    def available(self):
+        """True if the index and metadata files exist."""
+        return os.path.exists(self.index_path) and os.path.exists(f"{self.meta_path}.offsets.npy")
+
+    def _load(self):
+        with self._load_lock:
+            if self._index is None:
+                self._texts = TextColumn(self.meta_path)
+                self._index = read_faiss_index(self.index_path)
+            if self._encoder is None:
+                from sentence_transformers import SentenceTransformer
+                model = SentenceTransformer(self.model_name, device='cpu')
+                self._encoder = lambda texts: model.encode(texts, convert_to_numpy=True, batch_size=len(texts))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='kg-retrieval', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_max:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._search_batch(batch)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _search_batch(self, batch):
+        queries = list(dict.fromkeys(query for query, _, _ in batch))
+        k = max(top_k for _, top_k, _ in batch)
+        vectors = np.ascontiguousarray(self._encoder(queries), dtype=np.float32)
+        distances, ids = self._index.search(vectors, k)
+        rows = {query: row for row, query in enumerate(queries)}
+        for query, top_k, future in batch:
+            row = rows[query]
+            future.set_result([
+                {'text': self._texts[int(i)], 'distance': float(d)}
+                for i, d in zip(ids[row, :top_k], distances[row, :top_k]) if i >= 0
+            ])
+
+    def search(self, query, k=5, timeout=KG_QUERY_TIMEOUT):
+        """List of {'text', 'distance'} for the k nearest sentences, closest first."""
+        query = normalize_query(query)
+        key = (query, k)
+        with self._lock:
+            results = self._lru.get(key)
+            if results is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return results
+            self.misses += 1
+        self._load()
+        future = Future()
+        self._queue.put((query, k, future))
+        results = future.result(timeout=timeout)
+        with self._lock:
+            self._lru[key] = results
+            while len(self._lru) > self.cache_size:
+                self._lru.popitem(last=False)
+        return results
+
+
+def convert(index_path, meta_path, out_index, out_meta, kind):
+    """Rewrite a flat FAISS index + pickled sentence list as an ANN index + columnar metadata."""
+    import pickle
+    import faiss
+    flat = faiss.read_index(index_path)
+    embeddings = flat.reconstruct_n(0, flat.ntotal)
+    with open(meta_path, 'rb') as f:
+        texts = pickle.load(f)
+    if len(texts) != len(embeddings):
+        raise ValueError(f"{meta_path} has {len(texts)} entries but {index_path} has {len(embeddings)} vectors")
+    faiss.write_index(build_faiss_index(embeddings, kind), out_index)
+    write_metadata(out_meta, texts)
+    return len(texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Knowledge-graph vector retrieval')
+    parser.add_argument('--convert', action='store_true', help='convert a flat index + pickle metadata')
+    parser.add_argument('--index', default='kg_faiss_index.faiss', help='flat index to convert')
+    parser.add_argument('--meta', default='kg_faiss_metadata.pkl', help='pickled metadata to convert')
+    parser.add_argument('--kind', choices=['hnsw', 'ivf'], default=KG_INDEX_TYPE)
+    parser.add_argument('--query', help='print the top matches for a question')
+    parser.add_argument('-k', type=int, default=5)
+    args = parser.parse_args()
+    if args.convert:
+        count = convert(args.index, args.meta, KG_FAISS_INDEX, KG_FAISS_META, args.kind)
+        print(f"Wrote {count} {args.kind} vectors to {KG_FAISS_INDEX} and metadata to {KG_FAISS_META}.*.npy")
+    elif args.query:
+        for hit in KGRetriever().search(args.query, args.k):
+            print(f"{hit['distance']:.4f}  {hit['text']}")
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
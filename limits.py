@@ -0,0 +1,104 @@
+"""Per-route concurrency limits, so a burst on one slow route gets 429s instead of an unbounded queue.
+
+Routes are grouped, and each group has a number of slots per worker process.
+ROUTE_LIMITS can be overridden with PHARMASAGE_ROUTE_LIMITS="insights=64,chemistry=2";
+a limit of 0 removes it. A request waits up to ROUTE_QUEUE_TIMEOUT seconds for a
+slot, then is answered 429 with Retry-After. Streamed responses keep their slot
+until the stream ends. Routes not listed here are not limited.
+
+Backpressure only works when a group's limit is below the worker's thread count.
+A worker never runs more requests than it has threads, so a higher limit is
+never reached: the excess waits in the server's connection queue instead. A
+full group then holds every thread, and other routes wait too. When the server
+states its thread count in PHARMASAGE_THREADS (gunicorn.conf.py does),
+default limits are capped at threads - 1. An override at or above the thread
+count is an error.
+"""
+import os
+import threading
+
+ROUTE_GROUPS = {
+    'pharmasage.internet_rag_summary_api': 'insights',
+    'pharmasage.internet_rag_summary_stream': 'insights',
+    'pharmasage.chatbot_gemini': 'chatbot',
+    'pharmasage.predict_target': 'chemistry',
+    'pharmasage.compare_panel': 'chemistry',
+    'pharmasage.get_molblock': 'conformers',
+    'pharmasage.get_molblocks': 'conformers',
+    'pharmasage.substructure_search': 'substructure',
+    'pharmasage.screen_library': 'screening',
+}
+DEFAULT_LIMITS = {'insights': 32, 'chatbot': 4, 'chemistry': 4, 'conformers': 4, 'substructure': 2, 'screening': 1}
+ROUTE_QUEUE_TIMEOUT = float(os.getenv('PHARMASAGE_ROUTE_QUEUE_TIMEOUT', '0.5'))
+RETRY_AFTER_SECONDS = 1
+
+
+def parse_limits(text):
+    """{'group': slots} from "group=slots,group=slots"."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        group, _, value = item.partition('=')
+        try:
+            limits[group.strip()] = int(value)
+        except ValueError:
+            raise ValueError(f"Bad route limit {item!r}; expected group=slots") from None
+    return limits
+
+
+def route_limits(defaults, overrides, threads=0):
+    """defaults capped below threads, then overrides; threads <= 1 means unknown (e.g. the dev server)."""
+    if threads <= 1:
+        return {**defaults, **overrides}
+    for group, slots in overrides.items():
+        if slots >= threads:
+            raise ValueError(f"Route limit {group}={slots} must be below the {threads} threads per worker, "
+                             f"or {group} requests can never be answered 429")
+    return {**{group: min(slots, threads - 1) for group, slots in defaults.items()}, **overrides}
+
+
+SERVER_THREADS = int(os.getenv('PHARMASAGE_THREADS', '0'))
+ROUTE_LIMITS = route_limits(DEFAULT_LIMITS, parse_limits(os.getenv('PHARMASAGE_ROUTE_LIMITS', '')), SERVER_THREADS)
+
+
+class RouteLimiter:
+    """A semaphore per route group, acquired before the view runs and released at request teardown."""
+
+    def __init__(self, limits=ROUTE_LIMITS, groups=ROUTE_GROUPS, queue_timeout=ROUTE_QUEUE_TIMEOUT):
+        self.groups = groups
+        self.queue_timeout = queue_timeout
+        self.semaphores = {group: threading.BoundedSemaphore(slots) for group, slots in limits.items() if slots > 0}
+        self.rejected = dict.fromkeys(self.semaphores, 0)
+        self._lock = threading.Lock()
+
+    def rejected_samples(self):
+        """((group,), rejected count) for every limited group, for the metrics endpoint."""
+        with self._lock:
+            return [((group,), count) for group, count in self.rejected.items()]
+
+    def init_app(self, app):
+        from flask import g, jsonify, request
+
+        @app.before_request
+        def _acquire_slot():
+            group = self.groups.get(request.endpoint)
+            semaphore = self.semaphores.get(group)
+            if semaphore is None:
+                return None
+            if not semaphore.acquire(timeout=self.queue_timeout):
+                with self._lock:
+                    self.rejected[group] += 1
+                response = jsonify({'error': f'Too many concurrent {group} requests; retry shortly.'})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+                return response
+            g.route_slot = semaphore
+
+        @app.teardown_request
+        def _release_slot(exc):
+            # Runs when the request context is popped: after the body for streamed
+            # (stream_with_context) responses, on errors too
+            semaphore = g.pop('route_slot', None)
+            if semaphore is not None:
+                semaphore.release()
+
+        return app
@@ -0,0 +1,215 @@
+"""Request and hot-path timings, cache counters and opt-in per-request profiling.
+
+Metrics are kept in process and rendered in the Prometheus text exposition
+format on GET /metrics, so no client library is needed. Each worker process
+reports its own numbers; scrape workers individually or put them behind a
+single worker when aggregated views matter.
+
+    pharmasage_request_duration_seconds{endpoint,method,status}  time to response headers
+    pharmasage_span_duration_seconds{span}                        named stages inside handlers
+    pharmasage_cache_requests_total{cache,result}                 hits/misses, read at scrape time
+
+With PHARMASAGE_PROFILING=1, a request carrying ``X-Profile: cprofile`` (or
+``pyinstrument``, when that package is installed) returns its profile instead
+of its normal body.
+"""
+import io
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+METRICS_ENABLED = os.getenv('PHARMASAGE_METRICS', '1') != '0'
+PROFILING_ENABLED = os.getenv('PHARMASAGE_PROFILING', '0') == '1'
+PROFILE_HEADER = 'X-Profile'
+PROFILE_TOP_FUNCTIONS = 40
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if value != float('inf') else '+Inf'
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram per label combination."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), then the running sum
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                bucket = _format_labels(self.labelnames + ('le',), labels + (_format_value(bound),))
+                lines.append(f'{self.name}_bucket{bucket} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(series[-1])}')
+            lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+
+class CollectedCounter:
+    """Counter family whose samples come from ``collect()`` at scrape time, e.g. a cache's hit count."""
+
+    def __init__(self, name, documentation, labelnames, collect):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for labels, value in self.collect():
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+REQUEST_SECONDS = Histogram('pharmasage_request_duration_seconds',
+                            'Time from request start to response headers (streamed bodies excluded).',
+                            ('endpoint', 'method', 'status'))
+SPAN_SECONDS = Histogram('pharmasage_span_duration_seconds', 'Time spent in named stages of request handlers.',
+                         ('span',))
+REGISTRY = [REQUEST_SECONDS, SPAN_SECONDS]
+
+
+def reset():
+    """Forget every recorded request and span timing (e.g. after warm-up traffic)."""
+    REQUEST_SECONDS.clear()
+    SPAN_SECONDS.clear()
+
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+@contextmanager
+def span(name):
+    """Record the time spent in the block under pharmasage_span_duration_seconds{span=name}."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        SPAN_SECONDS.observe(time.perf_counter() - start, name)
+
+
+def timed_iter(name, iterable):
+    """Yield from iterable, recording the time spent producing its items (not consuming them) as one span."""
+    iterator = iter(iterable)
+    total = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                total += time.perf_counter() - start
+            yield item
+    finally:
+        if METRICS_ENABLED:
+            SPAN_SECONDS.observe(total, name)
+
+
+def render():
+    """Every registered metric in the Prometheus text format."""
+    lines = []
+    for metric in REGISTRY:
+        try:
+            lines.extend(metric.render())
+        except Exception as e:
+            print(f"Could not collect {metric.name}: {e}")
+    return '\n'.join(lines) + '\n'
+
+
+def start_profiler(kind):
+    """A started profiler for an X-Profile header value: pyinstrument if asked for and installed, else cProfile."""
+    if kind == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+        except ImportError:
+            pass
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def profile_report(profiler):
+    """(body, mimetype) for a running profiler, stopping it."""
+    if hasattr(profiler, 'output_html'):
+        profiler.stop()
+        return profiler.output_html(), 'text/html'
+    import pstats
+    profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+    return out.getvalue(), 'text/plain'
+
+
+def init_app(app):
+    """Time every request on app and, when enabled, profile the ones that ask for it."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        kind = request.headers.get(PROFILE_HEADER, '').strip().lower()
+        if PROFILING_ENABLED and kind:
+            g.profiler = start_profiler(kind)
+
+    @app.after_request
+    def _record(response):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            body, mimetype = profile_report(profiler)
+            response = app.response_class(body, mimetype=mimetype)
+        start = g.pop('metrics_start', None)
+        if METRICS_ENABLED and start is not None:
+            REQUEST_SECONDS.observe(time.perf_counter() - start, request.endpoint or 'unmatched', request.method,
+                                    response.status_code)
+        return response
+
+    return app
@@ -0,0 +1,277 @@
+"""Precomputed top-k Tanimoto neighbours of every catalog molecule.
+
+One blocked all-pairs pass fills the table. Each pair of row blocks (I <= J)
+is scored once as a matrix product over the unpacked bits, as in screening.py,
+and feeds the running top-k of both I's rows and J's rows. That halves the
+work, and the block pairs run on a thread pool (NumPy releases the GIL).
+Each row keeps its k best other rows as int32 positions, best first (ties:
+higher position first, as in FingerprintStore.ranked), plus float16 scores.
+
+The table is cached next to the CSV and keyed by its SHA-256. Its metadata
+records a digest of the fingerprints it was built from. So when rows are
+appended to the CSV, only the pairs that involve a new row are scored, and
+they are merged into the previous table. Build or update it ahead of deploys with:
+    python neighbours.py --prebuild [--csv data/cleaned_clinical_drugs_dataset.csv]
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from fingerprints import cache_prefix as fingerprint_prefix
+from fingerprints import file_checksum, popcount_rows
+
+# Bump when the on-disk layout or the neighbour order changes
+NEIGHBOUR_VERSION = 1
+NEIGHBOUR_K = int(os.getenv('NEIGHBOUR_K', '16'))
+NEIGHBOUR_BLOCK = int(os.getenv('NEIGHBOUR_BLOCK', '4096'))
+NEIGHBOUR_WORKERS = int(os.getenv('NEIGHBOUR_WORKERS', str(os.cpu_count() or 1)))
+# Build or extend the table when the app loads only if at most this many rows are missing from it;
+# larger catalogs are left to `python neighbours.py --prebuild`
+NEIGHBOUR_AUTO_ROWS = int(os.getenv('NEIGHBOUR_AUTO_ROWS', '5000'))
+
+
+def cache_prefix(csv_path, store, k):
+    return f"{fingerprint_prefix(csv_path, store.radius, store.fp_size)}.nn-v{NEIGHBOUR_VERSION}-k{k}"
+
+
+def fingerprint_digest(store, rows):
+    """SHA-256 over the first rows fingerprints and validity flags, to tell whether a table still applies."""
+    digest = hashlib.sha256()
+    for start in range(0, rows, 65536):
+        stop = min(start + 65536, rows)
+        digest.update(np.ascontiguousarray(store.bits[start:stop]).tobytes())
+        digest.update(np.ascontiguousarray(store.valid[start:stop], dtype=bool).tobytes())
+    return digest.hexdigest()
+
+
+def _keep_best(keys, positions, k):
+    """The k largest keys per row (unordered) with their positions."""
+    if keys.shape[1] <= k:
+        return keys, positions
+    keep = np.argpartition(-keys, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(keys, keep, axis=1), np.take_along_axis(positions, keep, axis=1)
+
+
+def _rescore(store, positions):
+    """Exact Tanimoto of each row against its listed positions (n, k); unlisted slots score -1."""
+    scores = np.full(positions.shape, -1.0)
+    for start in range(0, len(positions), 4096):
+        stop = min(start + 4096, len(positions))
+        listed = positions[start:stop]
+        found = listed >= 0
+        rows = np.asarray(store.bits[start:stop])
+        others = np.asarray(store.bits[np.where(found, listed, 0).ravel()]).reshape(listed.shape + (-1,))
+        common = popcount_rows(np.bitwise_and(rows[:, None, :], others))
+        counts = np.asarray(store.counts[start:stop])[:, None]
+        union = counts + np.asarray(store.counts[np.where(found, listed, 0)]) - common
+        block = np.divide(common, union, out=np.zeros(union.shape), where=union > 0)
+        scores[start:stop] = np.where(found, block, -1.0)
+    return scores
+
+
+class NeighbourTable:
+    """positions (n, k) int32 and scores (n, k) float16 per catalog row, best first; empty slots are -1."""
+
+    def __init__(self, positions, scores):
+        self.positions = positions
+        self.scores = scores
+
+    def __len__(self):
+        return len(self.positions)
+
+    @property
+    def k(self):
+        return self.positions.shape[1]
+
+    @classmethod
+    def build(cls, store, k=NEIGHBOUR_K, previous=None, block=NEIGHBOUR_BLOCK, workers=NEIGHBOUR_WORKERS):
+        """Top-k neighbours of every row in store, extending previous (a table over its first rows) when given."""
+        n = len(store)
+        start = len(previous) if previous is not None else 0
+        valid = np.asarray(store.valid, dtype=bool)
+        counts = np.asarray(store.counts, dtype=np.float64)
+        # Only orders tied scores, as in Screener.nearest: higher position first
+        tie_break = 1e-9 / max(n, 1)
+        best_keys = np.full((n, k), -2.0)
+        best_pos = np.full((n, k), -1, dtype=np.int64)
+        if previous is not None and start:
+            # float16 is too coarse to merge against, so the kept neighbours are re-scored exactly
+            listed = np.asarray(previous.positions, dtype=np.int64)
+            scores = _rescore(store, listed)
+            best_pos[:start] = listed
+            best_keys[:start] = np.where(listed >= 0, scores + np.maximum(listed, 0) * tie_break, -2.0)
+
+        # Old rows were already scored against each other: only pairs with a new row are computed
+        blocks = [(s, min(s + block, start)) for s in range(0, start, block)]
+        blocks += [(s, min(s + block, n)) for s in range(start, n, block)]
+        pairs = [(a, b) for i, a in enumerate(blocks) for b in blocks[i:] if b[0] >= start]
+
+        def score_pair(a, b):
+            rows = np.unpackbits(np.asarray(store.bits[a[0]:a[1]]), axis=1).astype(np.float32)
+            cols = rows if a == b else np.unpackbits(np.asarray(store.bits[b[0]:b[1]]), axis=1).astype(np.float32)
+            common = (rows @ cols.T).astype(np.float64)
+            union = counts[a[0]:a[1], None] + counts[None, b[0]:b[1]] - common
+            scores = np.divide(common, union, out=np.zeros_like(common), where=union > 0)
+            scores[~valid[a[0]:a[1]], :] = -3.0
+            scores[:, ~valid[b[0]:b[1]]] = -3.0
+            if a == b:
+                np.fill_diagonal(scores, -3.0)
+            row_pos, col_pos = np.arange(*a), np.arange(*b)
+            results = [(a, *_keep_best(scores + col_pos * tie_break, np.broadcast_to(col_pos, scores.shape), k))]
+            if a != b:
+                # The same scores, read by column, are the candidates for block b's rows
+                transposed = scores.T
+                results.append((b, *_keep_best(transposed + row_pos * tie_break,
+                                               np.broadcast_to(row_pos, transposed.shape), k)))
+            return results
+
+        def merge(results):
+            for (lo, hi), keys, positions in results:
+                keys, positions = _keep_best(np.concatenate([best_keys[lo:hi], keys], axis=1),
+                                             np.concatenate([best_pos[lo:hi], positions], axis=1), k)
+                best_keys[lo:hi], best_pos[lo:hi] = keys, positions
+
+        workers = max(workers, 1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for a, b in pairs:
+                pending.append(pool.submit(score_pair, a, b))
+                if len(pending) >= 2 * workers:
+                    merge(pending.popleft().result())
+            while pending:
+                merge(pending.popleft().result())
+
+        order = np.argsort(-best_keys, axis=1, kind='stable')
+        best_keys = np.take_along_axis(best_keys, order, axis=1)
+        best_pos = np.take_along_axis(best_pos, order, axis=1)
+        scores = best_keys - np.maximum(best_pos, 0) * tie_break
+        found = scores >= 0
+        return cls(np.where(found, best_pos, -1).astype(np.int32),
+                   np.where(found, scores, -1.0).astype(np.float16))
+
+    @classmethod
+    def load(cls, base, rows=None):
+        """Memory-map a saved table, or None when it is missing or does not have rows rows."""
+        try:
+            positions = np.load(f"{base}.positions.npy", mmap_mode='r')
+            scores = np.load(f"{base}.scores.npy", mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        if positions.shape != scores.shape or (rows is not None and len(positions) != rows):
+            return None
+        return cls(positions, scores)
+
+    @classmethod
+    def find_previous(cls, prefix, store):
+        """The largest saved table (for any version of the CSV) whose rows are a prefix of store's rows."""
+        candidates = []
+        for meta_path in glob.glob(f"{glob.escape(prefix)}-*.json"):
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if 0 < meta.get('rows', 0) <= len(store):
+                candidates.append((meta['rows'], meta.get('fingerprints'), meta_path[:-len('.json')]))
+        for rows, digest, base in sorted(candidates, reverse=True):
+            if digest == fingerprint_digest(store, rows):
+                table = cls.load(base, rows)
+                if table is not None:
+                    return table
+        return None
+
+    @classmethod
+    def load_or_build(cls, csv_path, store, k=NEIGHBOUR_K, auto_rows=NEIGHBOUR_AUTO_ROWS):
+        """The table for this CSV: memory-mapped when current, else extended from an earlier one or built.
+
+        Returns None (callers fall back to a full search) when the cache is unavailable, or when more
+        than auto_rows rows would have to be scored; pass auto_rows=None to always build.
+        """
+        prefix = cache_prefix(csv_path, store, k)
+        try:
+            base = f"{prefix}-{file_checksum(csv_path)[:16]}"
+        except OSError as e:
+            print(f"Neighbour table disabled ({e})")
+            return None
+        table = cls.load(base, len(store))
+        if table is not None:
+            return table
+
+        previous = cls.find_previous(prefix, store)
+        missing = len(store) - (len(previous) if previous is not None else 0)
+        if auto_rows is not None and missing > auto_rows:
+            print(f"Neighbour table is missing {missing} rows; run `python neighbours.py --prebuild` "
+                  f"to answer catalog queries from it")
+            return None
+        table = previous if previous is not None and missing == 0 else cls.build(store, k, previous)
+        try:
+            table.save(base, fingerprint_digest(store, len(store)))
+            for stale in glob.glob(f"{glob.escape(prefix)}-*"):
+                if not stale.startswith(base):
+                    os.remove(stale)
+        except OSError as e:
+            print(f"Could not write neighbour table: {e}")
+            return table
+        # Serve from the memory-mapped copy so forked workers share its pages
+        return cls.load(base, len(store)) or table
+
+    def save(self, base, digest):
+        """Write positions/scores as .npy files plus the metadata used for incremental updates."""
+        for name, array in (('positions', self.positions), ('scores', self.scores)):
+            tmp_path = f"{base}.{name}.{os.getpid()}.tmp.npy"
+            np.save(tmp_path, np.ascontiguousarray(array))
+            os.replace(tmp_path, f"{base}.{name}.npy")
+        tmp_path = f"{base}.{os.getpid()}.tmp.json"
+        with open(tmp_path, 'w') as f:
+            json.dump({'rows': len(self), 'k': self.k, 'fingerprints': digest}, f)
+        os.replace(tmp_path, f"{base}.json")
+
+    def ranked(self, pos, store, search=None):
+        """Yield (position, Tanimoto) for catalog row pos, best first, as search.ranked() would for its fingerprint.
+
+        Scores are recomputed exactly from store for the listed rows. When the list is full it
+        may not hold every row worth reading, so a caller that reads past it continues into
+        search's full ranking (rows already listed, and pos itself, are skipped).
+        """
+        listed = np.asarray(self.positions[pos], dtype=np.int64)
+        listed = listed[listed >= 0]
+        query = np.asarray(store.bits[pos])
+        scores = store.tanimoto(query, listed) if len(listed) else []
+        yield from zip(listed.tolist(), (float(s) for s in scores))
+        if len(listed) < self.k or search is None:
+            return
+        seen = set(listed.tolist())
+        seen.add(pos)
+        for other, sim in search.ranked(query):
+            if other not in seen:
+                yield other, sim
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or update the neighbour table for the drug catalog')
+    parser.add_argument('--prebuild', action='store_true', help='compute the top-k neighbours of every row')
+    parser.add_argument('--csv', default='data/cleaned_clinical_drugs_dataset.csv')
+    parser.add_argument('--k', type=int, default=NEIGHBOUR_K)
+    args = parser.parse_args()
+    if not args.prebuild:
+        parser.print_help()
+        return
+    from catalog import load_catalog
+    from fingerprints import FingerprintStore
+    df = load_catalog(args.csv)
+    store = FingerprintStore.load_or_build(args.csv, df['SMILES'].tolist())
+    start = time.perf_counter()
+    table = NeighbourTable.load_or_build(args.csv, store, k=args.k, auto_rows=None)
+    if table is not None:
+        print(f"Neighbour table: {len(table)} rows x {table.k} neighbours in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""N-way drug comparison: property matrix, pairwise similarity and rankings in one NumPy pass."""
+import numpy as np
+import pandas as pd
+
+from derived import as_float, solubility_class
+
+PANEL_PROPERTIES = ['logP', 'logD', 'psa', 'drug_likeness', 'max_phase', 'pIC50']
+MAX_PANEL_SIZE = 50
+
+
+def compare_panel(drug_data, fingerprint_store, positions):
+    """Comparison of the catalog rows at positions, in that order.
+
+    Returns the numeric property matrix (one row per drug, NaN where missing), each
+    drug's solubility class, the pairwise Tanimoto matrix, and per-property ranks
+    (1 = highest value, ties share the best rank, missing values unranked).
+    """
+    positions = np.asarray(positions, dtype=np.intp)
+    rows = drug_data.iloc[positions]
+    matrix = np.column_stack([as_float(rows[prop]) if prop in rows else np.full(len(rows), np.nan)
+                              for prop in PANEL_PROPERTIES])
+    ranks = pd.DataFrame(matrix, columns=PANEL_PROPERTIES).rank(method='min', ascending=False)
+    return {
+        'drugs': rows[['drug_name', 'drug_id', 'SMILES']].to_dict('records'),
+        'properties': PANEL_PROPERTIES,
+        'matrix': matrix,
+        'solubility': solubility_class(rows['logP'], rows['logD'], rows['psa']).tolist(),
+        'similarity': fingerprint_store.pairwise(positions),
+        'rankings': {prop: [None if np.isnan(rank) else int(rank) for rank in ranks[prop].to_numpy()]
+                     for prop in PANEL_PROPERTIES},
+    }
@@ -0,0 +1,111 @@
+"""Pre-serialized JSON responses with strong ETags and precompressed bodies.
+
+Responses that depend only on the loaded catalog (the drug list, each drug's
+record) are serialized once into a Payload when the catalog loads. send_payload
+then answers If-None-Match revalidations with 304 and serves the best
+precompressed encoding the client accepts, without touching pandas or JSON.
+"""
+import gzip
+import hashlib
+import json
+import math
+import os
+
+from flask import Response, request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+PAYLOAD_MAX_AGE = int(os.getenv('PAYLOAD_MAX_AGE', '300'))
+# Smaller bodies are sent as-is: compressing a few hundred bytes saves less than it costs
+MIN_COMPRESS_BYTES = int(os.getenv('PAYLOAD_MIN_COMPRESS_BYTES', '1024'))
+# Precomputed encodings, in order of preference; empty disables precompression
+PAYLOAD_ENCODINGS = [e.strip() for e in os.getenv('PAYLOAD_ENCODINGS', 'br,gzip').split(',') if e.strip()]
+
+
+def jsonable(value):
+    """value with NumPy scalars/arrays as Python types and NaN, inf and pandas NA as None."""
+    if isinstance(value, dict):
+        return {str(k): jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonable(v) for v in value]
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if value is None or isinstance(value, (str, int)):
+        return value
+    if type(value).__name__ in ('NAType', 'NaTType'):
+        return None
+    if hasattr(value, 'tolist'):
+        # NumPy scalar or array
+        return jsonable(value.tolist())
+    return str(value)
+
+
+def dumps(obj):
+    """Compact UTF-8 JSON bytes for obj; NaN and inf become null rather than invalid JSON."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # pandas NA or another type orjson does not know; clean it up below
+    return json.dumps(jsonable(obj), ensure_ascii=False, separators=(',', ':'), allow_nan=False).encode('utf-8')
+
+
+def extend_object(body, fields):
+    """Serialized JSON object body with the keys of dict fields appended, without re-parsing it."""
+    if not fields:
+        return body
+    return body[:-1] + b',' + dumps(fields)[1:]
+
+
+def _compress(body, encoding):
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=9, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(body, quality=11)
+    return None
+
+
+class Payload:
+    """One serialized JSON body, its strong ETag, and any precompressed variants."""
+
+    __slots__ = ('body', 'etag', 'encoded')
+
+    def __init__(self, body, compress=True):
+        self.body = body
+        self.etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.encoded = {}
+        if compress and len(body) >= MIN_COMPRESS_BYTES:
+            for encoding in PAYLOAD_ENCODINGS:
+                data = _compress(body, encoding)
+                if data is not None and len(data) < len(body):
+                    self.encoded[encoding] = data
+
+    @classmethod
+    def of(cls, obj, compress=True):
+        return cls(dumps(obj), compress)
+
+
+def send_payload(payload, max_age=PAYLOAD_MAX_AGE):
+    """Response for payload, honouring If-None-Match and Accept-Encoding."""
+    encoding = next((e for e in PAYLOAD_ENCODINGS if e in payload.encoded and request.accept_encodings[e]), None)
+    # Each encoding is its own representation, so it gets its own strong validator
+    etag = payload.etag if encoding is None else f"{payload.etag}-{encoding}"
+    headers = {'Cache-Control': f'public, max-age={max_age}'}
+    if payload.encoded:
+        headers['Vary'] = 'Accept-Encoding'
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304, headers=headers)
+    else:
+        response = Response(payload.body if encoding is None else payload.encoded[encoding],
+                            mimetype='application/json', headers=headers)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    return response
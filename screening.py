@@ -0,0 +1,312 @@
+"""Batch target prediction for a library of query molecules (virtual screening).
+
+Queries are fingerprinted in blocks, and each block's Tanimoto similarity to the
+whole catalog is computed as a blocked matrix product. The common on-bit counts
+popcount(q AND d) are Q @ D.T over the unpacked bits, which BLAS evaluates far
+faster than per-pair popcounts. A running top-k per query is merged across
+catalog blocks. The neighbours' targets are then tallied for every query in one
+vectorized pass, ranked by vote count and best similarity as predict_target does.
+Query blocks run on a thread pool (NumPy releases the GIL). Results stream out
+in input order as each block finishes.
+
+    python screening.py queries.smi|queries.sdf|queries.csv [--format csv] [--out results.csv]
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from rdkit import Chem, rdBase
+
+from fingerprints import popcount_rows
+
+SCREEN_TOP_K = int(os.getenv('SCREEN_TOP_K', '5'))
+SCREEN_TARGETS = 3
+SCREEN_QUERY_BLOCK = int(os.getenv('SCREEN_QUERY_BLOCK', '256'))
+SCREEN_DB_BLOCK = int(os.getenv('SCREEN_DB_BLOCK', '8192'))
+SCREEN_WORKERS = int(os.getenv('SCREEN_WORKERS', str(os.cpu_count() or 1)))
+SCREEN_MAX_QUERIES = int(os.getenv('SCREEN_MAX_QUERIES', '100000'))
+TARGET_KEY = ['target', 'target_type', 'organism', 'mechanism_of_action']
+CSV_FIELDS = ['id', 'smiles', 'error', 'top_target', 'target_type', 'organism', 'mechanism_of_action', 'votes',
+              'confidence', 'nearest_drug', 'nearest_similarity']
+
+
+def read_queries(data, filename=''):
+    """Yield (id, SMILES) from SDF, CSV (a SMILES column plus optional id/name) or 'SMILES [id]' lines."""
+    name = filename.lower()
+    if name.endswith(('.sdf', '.sd', '.mol')):
+        with rdBase.BlockLogs():
+            for i, mol in enumerate(Chem.ForwardSDMolSupplier(io.BytesIO(data))):
+                if mol is None:
+                    yield str(i + 1), ''
+                else:
+                    yield (mol.GetProp('_Name') if mol.HasProp('_Name') else '') or str(i + 1), Chem.MolToSmiles(mol)
+        return
+    text = data.decode('utf-8-sig') if isinstance(data, bytes) else data
+    if name.endswith('.csv'):
+        reader = csv.DictReader(io.StringIO(text))
+        fields = {field.lower(): field for field in reader.fieldnames or []}
+        smiles_field = fields.get('smiles')
+        if smiles_field is None:
+            raise ValueError('CSV input needs a SMILES column.')
+        id_field = next((fields[f] for f in ('id', 'name', 'drug_name') if f in fields), None)
+        for i, row in enumerate(reader):
+            yield (row[id_field] if id_field else '') or str(i + 1), (row[smiles_field] or '').strip()
+        return
+    count = 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        count += 1
+        parts = line.split(None, 1)
+        yield (parts[1] if len(parts) > 1 else str(count)), parts[0]
+
+
+class Screener:
+    """Catalog fingerprints plus the per-row target labels the votes are tallied over.
+
+    As in predict_target, each drug name votes once and targets are keyed by
+    (target, target_type, organism, mechanism_of_action). A query's own catalog
+    entries are not its neighbours. They are matched by canonical SMILES, so any
+    spelling of a catalog molecule excludes it. predict_target only skips rows whose
+    SMILES string is identical, so for a non-canonical spelling it can list the
+    molecule itself (similarity 1.0) where the screen does not.
+    """
+
+    def __init__(self, store, drug_data, canonical=None, top_k=SCREEN_TOP_K):
+        self.store = store
+        self.top_k = top_k
+        self.names = drug_data['drug_name'].astype(object).to_numpy()
+        self.drug_ids = drug_data['drug_id'].astype(object).to_numpy()
+        self.name_codes = pd.factorize(drug_data['drug_name'])[0]
+        keys = drug_data[TARGET_KEY].astype(object).fillna('')
+        self.target_codes = keys.groupby(TARGET_KEY, sort=False).ngroup().to_numpy()
+        self.target_codes[keys['target'].isin(['', 'N/A']).to_numpy()] = -1
+        self.targets = keys.drop_duplicates().to_dict('records')
+        self.by_canonical = {}
+        for pos, smiles in enumerate(canonical or []):
+            if smiles:
+                self.by_canonical.setdefault(smiles, []).append(pos)
+        self.db_valid = np.asarray(store.valid, dtype=bool)
+        self.db_counts = np.asarray(store.counts, dtype=np.float64)
+
+    def fingerprint_block(self, queries):
+        """Packed fingerprints, a validity mask and canonical SMILES for [(id, SMILES)]."""
+        bits = np.zeros((len(queries), self.store.fp_size // 8), dtype=np.uint8)
+        valid = np.zeros(len(queries), dtype=bool)
+        canonical = [None] * len(queries)
+        with rdBase.BlockLogs():
+            for i, (_, smiles) in enumerate(queries):
+                mol = Chem.MolFromSmiles(smiles) if smiles else None
+                if mol is not None:
+                    bits[i] = self.store.fingerprint_mol(mol)
+                    valid[i] = True
+                    canonical[i] = Chem.MolToSmiles(mol)
+        return bits, valid, canonical
+
+    def nearest(self, query_bits, exclude=None, k=None):
+        """(scores, positions), each (queries, k), best first; slots without a valid row score below 0 at position -1.
+
+        exclude is a pair of (query row, catalog position) arrays that must not be returned.
+        """
+        k = min(k or self.top_k, len(self.store))
+        b = len(query_bits)
+        best_keys = np.full((b, k), -2.0)
+        best_pos = np.full((b, k), -1, dtype=np.int64)
+        if k == 0:
+            return best_keys, best_pos
+        ex_rows, ex_pos = exclude if exclude is not None else (np.empty(0, dtype=np.intp),) * 2
+        # Distinct Tanimoto values of 2048-bit fingerprints differ by more than 1e-7, so this offset
+        # only orders tied scores: higher position first, as in FingerprintStore.ranked
+        tie_break = 1e-9 / len(self.store)
+        # popcount(q AND d) for every pair is the dot product of the 0/1 bit vectors
+        query = np.unpackbits(query_bits, axis=1).astype(np.float32)
+        query_counts = popcount_rows(query_bits).astype(np.float64)
+        for start in range(0, len(self.store), SCREEN_DB_BLOCK):
+            stop = min(start + SCREEN_DB_BLOCK, len(self.store))
+            block = np.unpackbits(np.asarray(self.store.bits[start:stop]), axis=1).astype(np.float32)
+            common = (query @ block.T).astype(np.float64)
+            union = query_counts[:, None] + self.db_counts[None, start:stop] - common
+            scores = np.divide(common, union, out=np.zeros_like(common), where=union > 0)
+            scores[:, ~self.db_valid[start:stop]] = -1.0
+            inside = (ex_pos >= start) & (ex_pos < stop)
+            scores[ex_rows[inside], ex_pos[inside] - start] = -1.0
+            scores += np.arange(start, stop) * tie_break
+            # Merge this block into the running top-k
+            keys = np.concatenate([best_keys, scores], axis=1)
+            positions = np.concatenate([best_pos, np.broadcast_to(np.arange(start, stop), (b, stop - start))], axis=1)
+            keep = np.argpartition(-keys, k - 1, axis=1)[:, :k]
+            best_keys = np.take_along_axis(keys, keep, axis=1)
+            best_pos = np.take_along_axis(positions, keep, axis=1)
+        order = np.argsort(-best_keys, axis=1)
+        best_keys, best_pos = np.take_along_axis(best_keys, order, axis=1), np.take_along_axis(best_pos, order, axis=1)
+        scores = best_keys - np.maximum(best_pos, 0) * tie_break
+        return scores, np.where(scores >= 0, best_pos, -1)
+
+    def first_per_name(self, scores, positions):
+        """Mask keeping each query's top_k hits after dropping repeats of a drug name already listed."""
+        found = positions >= 0
+        names = np.where(found, self.name_codes[np.where(found, positions, 0)], -1)
+        k = names.shape[1]
+        earlier = np.tri(k, k, -1, dtype=bool).T  # earlier[i, j]: column i comes before column j
+        repeat = ((names[:, :, None] == names[:, None, :]) & found[:, :, None] & earlier).any(axis=1)
+        keep = found & ~repeat
+        return keep & (np.cumsum(keep, axis=1) <= self.top_k)
+
+    def vote(self, scores, positions, keep):
+        """Per query, up to SCREEN_TARGETS (target code, votes, best similarity), most votes first."""
+        codes = np.where(keep, self.target_codes[np.where(keep, positions, 0)], -1)
+        voted = codes >= 0
+        query_rows = np.broadcast_to(np.arange(len(scores))[:, None], scores.shape)[voted]
+        columns = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)[voted]
+        codes, sims = codes[voted], scores[voted]
+        # One group per (query, target): its size is the vote count, its first element the best and
+        # earliest-ranked neighbour, which breaks ties in listing order as predict_target's stable sort does
+        order = np.lexsort((columns, -sims, codes, query_rows))
+        keys = query_rows[order].astype(np.int64) * max(len(self.targets), 1) + codes[order]
+        _, first, votes = np.unique(keys, return_index=True, return_counts=True)
+        first = order[first]
+        group_query, group_code, group_sim, group_column = query_rows[first], codes[first], sims[first], columns[first]
+        per_query = [[] for _ in range(len(scores))]
+        for g in np.lexsort((group_column, -group_sim, -votes, group_query)):
+            picks = per_query[group_query[g]]
+            if len(picks) < SCREEN_TARGETS:
+                picks.append((int(group_code[g]), int(votes[g]), float(group_sim[g])))
+        return per_query
+
+    def screen_block(self, queries):
+        """One result dict per (id, SMILES) query, in order."""
+        bits, valid, canonical = self.fingerprint_block(queries)
+        results = [None] * len(queries)
+        rows = np.flatnonzero(valid)
+        if len(rows):
+            own = [self.by_canonical.get(canonical[row], []) for row in rows]
+            exclude = (np.repeat(np.arange(len(rows)), [len(p) for p in own]),
+                       np.fromiter((pos for p in own for pos in p), dtype=np.intp))
+            # Over-fetch so that dropping repeated drug names still leaves top_k neighbours
+            scores, positions = self.nearest(bits[rows], exclude, k=2 * self.top_k)
+            keep = self.first_per_name(scores, positions)
+            votes = self.vote(scores, positions, keep)
+            for i, row in enumerate(rows):
+                targets = [{**self.targets[code], 'votes': count, 'confidence': round(sim, 4)}
+                           for code, count, sim in votes[i]]
+                if not targets and own[i] and self.target_codes[own[i][0]] >= 0:
+                    # No neighbour has a target: report the query's own catalog entry
+                    targets = [{**self.targets[self.target_codes[own[i][0]]], 'votes': 0, 'confidence': 1.0}]
+                results[row] = {
+                    'id': queries[row][0],
+                    'smiles': queries[row][1],
+                    'predicted_targets': targets,
+                    'neighbours': [{'drug_name': self.names[pos], 'drug_id': self.drug_ids[pos],
+                                    'similarity': round(float(score), 4)}
+                                   for pos, score in zip(positions[i][keep[i]], scores[i][keep[i]])],
+                }
+        for row in np.flatnonzero(~valid):
+            results[row] = {'id': queries[row][0], 'smiles': queries[row][1], 'error': 'Invalid SMILES.'}
+        return results
+
+    def screen(self, queries, workers=SCREEN_WORKERS, max_queries=SCREEN_MAX_QUERIES):
+        """Yield one list of results per block of queries, in input order, as blocks complete."""
+        def blocks():
+            block = []
+            for count, query in enumerate(queries, 1):
+                if count > max_queries:
+                    if block:
+                        yield block
+                    raise ValueError(f'At most {max_queries} queries per screen.')
+                block.append(query)
+                if len(block) == SCREEN_QUERY_BLOCK:
+                    yield block
+                    block = []
+            if block:
+                yield block
+
+        workers = max(workers, 1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            try:
+                for block in blocks():
+                    pending.append(pool.submit(self.screen_block, block))
+                    if len(pending) >= 2 * workers:
+                        yield pending.popleft().result()
+            except ValueError:
+                # Blocks read before the bad input are still delivered, then the error
+                while pending:
+                    yield pending.popleft().result()
+                raise
+            while pending:
+                yield pending.popleft().result()
+
+
+def csv_row(result):
+    """Flatten a screening result to CSV_FIELDS: its best target and nearest catalog drug."""
+    target = (result.get('predicted_targets') or [{}])[0]
+    nearest = (result.get('neighbours') or [{}])[0]
+    return {
+        'id': result['id'], 'smiles': result['smiles'], 'error': result.get('error', ''),
+        'top_target': target.get('target', ''), 'target_type': target.get('target_type', ''),
+        'organism': target.get('organism', ''), 'mechanism_of_action': target.get('mechanism_of_action', ''),
+        'votes': target.get('votes', ''),
+        'confidence': target.get('confidence', ''), 'nearest_drug': nearest.get('drug_name', ''),
+        'nearest_similarity': nearest.get('similarity', ''),
+    }
+
+
+def iter_ndjson(blocks):
+    for block in blocks:
+        yield ''.join(json.dumps(result, default=str) + '\n' for result in block)
+
+
+def iter_csv(blocks):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    for block in blocks:
+        writer.writerows(csv_row(result) for result in block)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Predict targets for a library of query molecules')
+    parser.add_argument('queries', help='.smi/.txt (SMILES [id] per line), .csv (SMILES column) or .sdf')
+    parser.add_argument('--csv', default='data/cleaned_clinical_drugs_dataset.csv', help='drug catalog')
+    parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+    parser.add_argument('--out', help='output file (default: stdout)')
+    parser.add_argument('--top-k', type=int, default=SCREEN_TOP_K)
+    parser.add_argument('--workers', type=int, default=SCREEN_WORKERS)
+    args = parser.parse_args()
+
+    from catalog import load_catalog
+    from derived import derived_columns
+    from fingerprints import FingerprintStore
+    drug_data = load_catalog(args.csv)
+    store = FingerprintStore.load_or_build(args.csv, drug_data['SMILES'].tolist())
+    canonical = derived_columns(args.csv, drug_data)['canonical_smiles'].tolist()
+    screener = Screener(store, drug_data, canonical, top_k=args.top_k)
+    with open(args.queries, 'rb') as f:
+        queries = read_queries(f.read(), args.queries)
+    blocks = screener.screen(queries, workers=args.workers, max_queries=sys.maxsize)
+    chunks = iter_csv(blocks) if args.format == 'csv' else iter_ndjson(blocks)
+    out = open(args.out, 'w', newline='') if args.out else sys.stdout
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+            out.flush()
+    finally:
+        if args.out:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Ranked substring search: sorted-array prefix lookup plus a trigram inverted index."""
+import bisect
+
+import numpy as np
+
+MATCH_TYPES = ('exact', 'prefix', 'infix', 'fuzzy')
+FUZZY_THRESHOLD = 0.3
+
+
+def trigrams(text, pad=True):
+    """Character trigrams of text; padding lets short strings and word edges match."""
+    if pad:
+        text = f"  {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """Search over one string column, returning row positions ranked exact > prefix > infix > fuzzy.
+
+    Duplicate keys collapse onto the first row that carries them, matching the old
+    ``.iloc[0]`` behaviour of the full-column scans.
+    """
+
+    def __init__(self, values, lowercase=True, fuzzy=True):
+        self.lowercase = lowercase
+        self.fuzzy = fuzzy
+        self._keys = []
+        self._positions = []
+        key_ids = {}
+        for pos, value in enumerate(values):
+            if not isinstance(value, str) or not value:
+                continue
+            key = self._normalize(value)
+            if key not in key_ids:
+                key_ids[key] = len(self._keys)
+                self._keys.append(key)
+                self._positions.append(pos)
+        self._key_ids = key_ids
+        self._sorted_keys = sorted(self._keys)
+        self._sorted_ids = [key_ids[key] for key in self._sorted_keys]
+
+        postings = {}
+        gram_counts = np.zeros(len(self._keys), dtype=np.int32)
+        for key_id, key in enumerate(self._keys):
+            grams = trigrams(key)
+            gram_counts[key_id] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(key_id)
+        self._postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self._gram_counts = gram_counts
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _normalize(self, text):
+        text = text.strip()
+        return text.lower() if self.lowercase else text
+
+    def _prefix_ids(self, query):
+        start = bisect.bisect_left(self._sorted_keys, query)
+        ids = []
+        for i in range(start, len(self._sorted_keys)):
+            if not self._sorted_keys[i].startswith(query):
+                break
+            ids.append(self._sorted_ids[i])
+        return ids
+
+    def _infix_ids(self, query):
+        grams = trigrams(query, pad=False)
+        if not grams:
+            return []
+        lists = sorted((self._postings.get(gram) for gram in grams), key=lambda ids: -1 if ids is None else len(ids))
+        if lists[0] is None:
+            return []
+        candidates = lists[0]
+        for ids in lists[1:]:
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+            if not len(candidates):
+                return []
+        keys = self._keys
+        matches = [int(key_id) for key_id in candidates if query in keys[key_id]]
+        matches.sort(key=lambda key_id: (keys[key_id].find(query), len(keys[key_id]), keys[key_id]))
+        return matches
+
+    def _fuzzy_ids(self, query):
+        grams = [self._postings[gram] for gram in trigrams(query) if gram in self._postings]
+        if not grams:
+            return []
+        key_ids, shared = np.unique(np.concatenate(grams), return_counts=True)
+        dice = 2.0 * shared / (len(trigrams(query)) + self._gram_counts[key_ids])
+        keep = dice >= FUZZY_THRESHOLD
+        key_ids, dice = key_ids[keep], dice[keep]
+        order = np.lexsort((key_ids, -dice))
+        return [(int(key_ids[i]), float(dice[i])) for i in order]
+
+    def search(self, query, limit=10, offset=0, fuzzy=None):
+        """Return (total, hits) where hits is a page of (row position, match type, score).
+
+        Fuzzy matches are only computed when the stricter tiers cannot fill the page,
+        so ``total`` counts fuzzy hits only in that case.
+        """
+        query = self._normalize(query)
+        if not query:
+            return 0, []
+        if fuzzy is None:
+            fuzzy = self.fuzzy
+
+        ranked = []
+        seen = set()
+
+        def add(key_ids, match, score=1.0):
+            for key_id in key_ids:
+                if key_id not in seen:
+                    seen.add(key_id)
+                    ranked.append((key_id, match, score))
+
+        exact_id = self._key_ids.get(query)
+        if exact_id is not None:
+            add([exact_id], 'exact')
+        add(self._prefix_ids(query), 'prefix')
+        if len(query) >= 3:
+            add(self._infix_ids(query), 'infix')
+        if fuzzy and len(query) >= 3 and len(ranked) < offset + limit:
+            for key_id, score in self._fuzzy_ids(query):
+                add([key_id], 'fuzzy', score)
+
+        page = ranked[offset:offset + limit]
+        return len(ranked), [(self._positions[key_id], match, score) for key_id, match, score in page]
+
+    def best(self, query):
+        """Row position of the best exact/prefix/infix match, or None."""
+        _, hits = self.search(query, limit=1, fuzzy=False)
+        return hits[0][0] if hits else None
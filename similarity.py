@@ -0,0 +1,140 @@
+"""Nearest-neighbour search over the Morgan fingerprint store: exact or approximate.
+
+SIMILARITY_MODE picks the backend:
+    exact  Tanimoto against every row (the default; fine up to a few hundred thousand rows)
+    hnsw   FAISS IndexBinaryHNSW over the packed fingerprints
+    ivf    FAISS IndexBinaryIVF (k-means lists over Hamming space)
+
+The approximate backends fetch ANN_CANDIDATES rows by Hamming distance, then
+re-rank them by exact Tanimoto. A caller that reads past the candidate set
+continues into the exact ranking, so results are never truncated. Indexes are
+cached next to the CSV, keyed by its SHA-256 like the fingerprint cache.
+"""
+import glob
+import os
+
+import numpy as np
+
+from fingerprints import cache_prefix, file_checksum
+
+SIMILARITY_MODE = os.getenv('SIMILARITY_MODE', 'exact')
+ANN_CANDIDATES = int(os.getenv('ANN_CANDIDATES', '256'))
+ANN_HNSW_M = 32
+ANN_HNSW_EF_SEARCH = int(os.getenv('ANN_HNSW_EF_SEARCH', '128'))
+ANN_IVF_NPROBE = int(os.getenv('ANN_IVF_NPROBE', '16'))
+ANN_IVF_TRAIN_PER_LIST = 64
+ANN_CACHE_VERSION = 1
+
+
+def configure(index):
+    """Apply the search-time accuracy/speed settings to a loaded FAISS binary index."""
+    if hasattr(index, 'hnsw'):
+        index.hnsw.efSearch = ANN_HNSW_EF_SEARCH
+    elif hasattr(index, 'nprobe'):
+        index.nprobe = ANN_IVF_NPROBE
+
+
+class ExactSearch:
+    """Tanimoto against every fingerprint in the store."""
+
+    mode = 'exact'
+
+    def __init__(self, store):
+        self.store = store
+
+    def ranked(self, query_bits):
+        """Yield (position, Tanimoto) for valid rows, best first (ties: higher position first)."""
+        scores = self.store.tanimoto(query_bits)
+        for pos in self.store.ranked(scores):
+            yield pos, float(scores[pos])
+
+
+class BinaryANNSearch(ExactSearch):
+    """FAISS binary index for candidate generation, exact Tanimoto for the final order."""
+
+    def __init__(self, store, index, mode, candidates=ANN_CANDIDATES):
+        super().__init__(store)
+        self.index = index
+        self.mode = mode
+        self.candidates = candidates
+        configure(index)
+
+    @classmethod
+    def build(cls, store, mode, candidates=ANN_CANDIDATES):
+        import faiss
+        bits = np.ascontiguousarray(store.bits)
+        n, dim = len(bits), store.fp_size
+        if mode == 'hnsw':
+            index = faiss.IndexBinaryHNSW(dim, ANN_HNSW_M)
+        elif mode == 'ivf':
+            nlist = max(1, min(int(np.sqrt(n)), n // 39 or 1))
+            index = faiss.IndexBinaryIVF(faiss.IndexBinaryFlat(dim), dim, nlist)
+            # Binary k-means is slow; a sample is plenty for coarse lists on large libraries
+            train_rows = ANN_IVF_TRAIN_PER_LIST * nlist
+            sample = bits if n <= train_rows else bits[np.random.default_rng(0).choice(n, train_rows, replace=False)]
+            index.train(sample)
+        else:
+            raise ValueError(f"Unknown similarity mode: {mode}")
+        # Every row is added (invalid ones as zeros) so FAISS ids are catalog positions
+        index.add(bits)
+        return cls(store, index, mode, candidates)
+
+    @classmethod
+    def load_or_build(cls, csv_path, store, mode, candidates=ANN_CANDIDATES):
+        """Read the cached index for this CSV and mode, building and caching it when stale."""
+        import faiss
+        prefix = f"{cache_prefix(csv_path, store.radius, store.fp_size)}.ann-v{ANN_CACHE_VERSION}-{mode}"
+        try:
+            path = f"{prefix}-{file_checksum(csv_path)[:16]}.faiss"
+        except OSError as e:
+            print(f"ANN index cache disabled ({e}); building in memory")
+            return cls.build(store, mode, candidates)
+        if os.path.exists(path):
+            try:
+                index = faiss.read_index_binary(path)
+                if index.ntotal == len(store):
+                    return cls(store, index, mode, candidates)
+            except RuntimeError as e:
+                print(f"Rebuilding unreadable ANN index {path} ({e})")
+        searcher = cls.build(store, mode, candidates)
+        try:
+            tmp = f"{path}.{os.getpid()}.tmp"
+            faiss.write_index_binary(searcher.index, tmp)
+            os.replace(tmp, path)
+            for stale in glob.glob(f"{glob.escape(prefix)}-*.faiss"):
+                if stale != path:
+                    os.remove(stale)
+        except (OSError, RuntimeError) as e:
+            print(f"Could not write ANN index: {e}")
+        return searcher
+
+    def candidate_positions(self, query_bits, k):
+        """Up to k valid positions nearest to the query in Hamming distance."""
+        _, ids = self.index.search(np.ascontiguousarray(query_bits, dtype=np.uint8).reshape(1, -1), k)
+        ids = ids[0]
+        ids = ids[ids >= 0]
+        return ids[np.asarray(self.store.valid[ids], dtype=bool)]
+
+    def ranked(self, query_bits):
+        candidates = self.candidate_positions(query_bits, min(self.candidates, len(self.store)))
+        scores = self.store.tanimoto(query_bits, candidates)
+        seen = set()
+        for i in np.lexsort((-candidates, -scores)):
+            pos = int(candidates[i])
+            seen.add(pos)
+            yield pos, float(scores[i])
+        # Asked for more than the candidate set holds: continue with the exact ranking
+        for pos, score in super().ranked(query_bits):
+            if pos not in seen:
+                yield pos, score
+
+
+def load_similarity_search(csv_path, store, mode=SIMILARITY_MODE):
+    """Searcher for the configured mode, falling back to exact search when FAISS is unavailable."""
+    if mode == 'exact' or not len(store):
+        return ExactSearch(store)
+    try:
+        return BinaryANNSearch.load_or_build(csv_path, store, mode)
+    except ImportError as e:
+        print(f"ANN similarity disabled ({e}); using exact search")
+        return ExactSearch(store)
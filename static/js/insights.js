@@ -43,6 +43,11 @@ document.addEventListener('DOMContentLoaded', function() {
             insightsArticles.innerHTML = '';
             insightsSpinner.style.display = 'block';
 
+            if (window.EventSource) {
+                streamInsights(drugName, insightsSummary, insightsArticles, insightsSpinner, insightsError);
+                return;
+            }
+
             fetch('/api/insights', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
@@ -70,6 +75,47 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 });
 
+// Stream insights over Server-Sent Events: articles render as soon as they are fetched,
+// then the summary fills in as the model generates it
+function streamInsights(drugName, insightsSummary, insightsArticles, insightsSpinner, insightsError) {
+    const source = new EventSource(`/api/insights/stream?drug_name=${encodeURIComponent(drugName)}`);
+    let summaryText = '';
+    let received = false;
+
+    source.addEventListener('articles', function(e) {
+        received = true;
+        const data = JSON.parse(e.data);
+        insightsSpinner.style.display = 'none';
+        insightsArticles.innerHTML = renderInsightsArticles(data.articles);
+    });
+    source.addEventListener('summary', function(e) {
+        const data = JSON.parse(e.data);
+        summaryText += data.text;
+        insightsSummary.innerHTML = formatInsightsSummary(summaryText);
+    });
+    source.addEventListener('failure', function(e) {
+        received = true;
+        source.close();
+        insightsSpinner.style.display = 'none';
+        insightsError.textContent = JSON.parse(e.data).error;
+        insightsError.style.display = 'block';
+    });
+    source.addEventListener('done', function() {
+        source.close();
+        if (!summaryText) {
+            insightsSummary.innerHTML = formatInsightsSummary('');
+        }
+    });
+    source.onerror = function() {
+        source.close();
+        insightsSpinner.style.display = 'none';
+        if (!received) {
+            insightsError.textContent = 'Error fetching insights.';
+            insightsError.style.display = 'block';
+        }
+    };
+}
+
 // Helper to format summary in a beautiful card
 function formatInsightsSummary(summary) {
     if (!summary) return '<div class="text-danger">No summary available.</div>';
@@ -105,6 +105,7 @@ async function renderTargetPredictorResults(data) {
     if (data.similar_drugs && data.similar_drugs.length) {
         simVisDiv.innerHTML += `<div class="row" id="sim-mol-row"></div>`;
         const rowDiv = document.getElementById('sim-mol-row');
+        const molTargets = [];
         for (let i = 0; i < data.similar_drugs.length; i++) {
             const d = data.similar_drugs[i];
             const molDivId = `sim-mol-${i}`;
@@ -113,31 +114,9 @@ async function renderTargetPredictorResults(data) {
             // Card layout: image, then name, then info
             col.innerHTML = `<div class="card h-100"><div class="card-body d-flex flex-column align-items-center justify-content-between"><div id="${molDivId}" style="height:180px; width:100%; margin-bottom:10px;"></div><div class="mt-2 mb-2 text-center"><strong>${d.drug_name || ''}</strong></div><div class="w-100"><small>Target: ${d.target || 'N/A'}<br>Mechanism: ${d.mechanism_of_action || 'N/A'}<br>Shared: ${d.shared_property || ''}<br><em>${d.justification || ''}</em></small></div></div></div>`;
             rowDiv.appendChild(col);
-            // Use same logic as Visualizer: fetch MOL block and use renderMolecule
+            // MOL blocks for all cards are fetched together below
             if (d.SMILES) {
-                try {
-                    // Fetch MOL block from backend
-                    fetch('/api/molblock', {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify({ smiles: d.SMILES })
-                    })
-                    .then(res => res.json())
-                    .then(molData => {
-                        if (molData.molblock && window.renderMolecule && window.$3Dmol) {
-                            // Create a new viewer for each card
-                            const viewer = window.$3Dmol.createViewer(molDivId, {backgroundColor: 'white'});
-                            window.renderMolecule(viewer, molData.molblock, d.drug_name || '');
-                        } else {
-                            document.getElementById(molDivId).innerText = d.SMILES || '';
-                        }
-                    })
-                    .catch(() => {
-                        document.getElementById(molDivId).innerText = d.SMILES || '';
-                    });
-                } catch (e) {
-                    document.getElementById(molDivId).innerText = d.SMILES || '';
-                }
+                molTargets.push({ molDivId, drug: d });
             } else {
                 document.getElementById(molDivId).innerText = d.SMILES || '';
             }
@@ -147,6 +126,27 @@ async function renderTargetPredictorResults(data) {
                 predictTarget();
             };
         }
+        // Use same logic as Visualizer, but with one batch request for every similar molecule
+        if (molTargets.length) {
+            fetchMolblocks(molTargets.map(t => t.drug.SMILES))
+                .then(molblocks => {
+                    molTargets.forEach((t, i) => {
+                        const molData = molblocks[i] || {};
+                        if (molData.molblock && window.renderMolecule && window.$3Dmol) {
+                            // Create a new viewer for each card
+                            const viewer = window.$3Dmol.createViewer(t.molDivId, {backgroundColor: 'white'});
+                            window.renderMolecule(viewer, molData.molblock, t.drug.drug_name || '');
+                        } else {
+                            document.getElementById(t.molDivId).innerText = t.drug.SMILES || '';
+                        }
+                    });
+                })
+                .catch(() => {
+                    molTargets.forEach(t => {
+                        document.getElementById(t.molDivId).innerText = t.drug.SMILES || '';
+                    });
+                });
+        }
     } else {
         simVisDiv.innerHTML += '<div class="alert alert-warning">No similar molecules found.</div>';
     }
@@ -73,17 +73,18 @@ async function loadMolecule() {
     showLoading(true);
     
     try {
-        let response;
+        let drugData;
         if (drugList.includes(drugName)) {
             // Use exact match endpoint
-            response = await fetch(`/api/drug/${encodeURIComponent(drugName)}`);
+            const response = await fetch(`/api/drug/${encodeURIComponent(drugName)}`);
+            drugData = await response.json();
         } else {
-            // Use search endpoint
-            response = await fetch(`/api/search_drug?query=${encodeURIComponent(drugName)}`);
+            // Use search endpoint and take the best-ranked hit
+            const response = await fetch(`/api/search_drug?query=${encodeURIComponent(drugName)}&limit=1`);
+            const searchData = await response.json();
+            drugData = searchData.results && searchData.results.length ? searchData.results[0] : searchData;
         }
         
-        const drugData = await response.json();
-        
         if (drugData.error || !drugData.drug_name) {
             showError(drugData.error || 'Drug not found. Please check the name or SMILES.');
             showLoading(false);
@@ -145,19 +146,8 @@ async function compareDrugs() {
             showLoading(false);
             return;
         }
-        // Fetch molblocks for both drugs using their SMILES from compare_drugs
-        const [mol1, mol2] = await Promise.all([
-            fetch('/api/molblock', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ smiles: data.drug1.SMILES })
-            }).then(res => res.json()),
-            fetch('/api/molblock', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ smiles: data.drug2.SMILES })
-            }).then(res => res.json())
-        ]);
+        // Fetch molblocks for both drugs in one batch using their SMILES from compare_drugs
+        const [mol1, mol2] = await fetchMolblocks([data.drug1.SMILES, data.drug2.SMILES]);
         if (mol1.error || mol2.error || !mol1.molblock || !mol2.molblock) {
             showError(mol1.error || mol2.error || 'Could not generate 3D structure for one or both drugs.');
             showLoading(false);
@@ -191,6 +181,20 @@ async function compareDrugs() {
     }
 }
 
+// Fetch MOL blocks for several SMILES in a single round-trip; results keep the input order
+async function fetchMolblocks(smilesList) {
+    const response = await fetch('/api/molblocks', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ smiles: smilesList })
+    });
+    const data = await response.json();
+    if (!response.ok) {
+        throw new Error(data.error || 'Could not generate 3D structures.');
+    }
+    return data.molblocks;
+}
+
 // Render molecule in 3D viewer (now takes MOL block)
 function renderMolecule(viewer, molblock, drugName) {
     viewer.clear();
@@ -417,6 +421,22 @@ function showError(message) {
     }, 5000);
 }
 
+// Fill the search box's datalist with ranked matches from the search index
+async function updateSearchSuggestions(query) {
+    try {
+        const response = await fetch(`/api/search_drug?query=${encodeURIComponent(query)}&limit=10`);
+        if (!response.ok) return;
+        const data = await response.json();
+        const datalist = document.getElementById('drug-search-suggestions');
+        datalist.innerHTML = '';
+        (data.results || []).forEach(drug => {
+            if (drug.drug_name) datalist.appendChild(new Option(drug.drug_name, drug.drug_name));
+        });
+    } catch (error) {
+        // Suggestions are best-effort
+    }
+}
+
 // Add event listeners for search functionality
 document.addEventListener('DOMContentLoaded', function() {
     const drugSearch = document.getElementById('drug-search');
@@ -428,6 +448,15 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
     
+    // Suggest matching drugs while typing
+    let suggestTimer = null;
+    drugSearch.addEventListener('input', function() {
+        clearTimeout(suggestTimer);
+        const query = this.value.trim();
+        if (query.length < 2) return;
+        suggestTimer = setTimeout(() => updateSearchSuggestions(query), 150);
+    });
+    
     // Auto-search on dropdown change
     document.getElementById('drug-select').addEventListener('change', function() {
         if (this.value) {
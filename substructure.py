@@ -0,0 +1,211 @@
+"""Substructure search over the drug catalog with a pattern-fingerprint pre-screen.
+
+Every catalog molecule's RDKit PatternFingerprint is kept as a packed uint8 matrix
+(cached next to the CSV like the Morgan fingerprints). A molecule can only contain
+the query if its pattern bits are a superset of the query's, so that test discards
+most rows with a few vectorized byte operations. HasSubstructMatch then runs on the
+survivors only, in chunks, across a process pool for large candidate sets, and
+stops when the page is full or the per-query time budget runs out.
+"""
+import glob
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+import numpy as np
+from rdkit import Chem, DataStructs, rdBase
+
+from fingerprints import file_checksum
+
+PATTERN_FP_SIZE = 2048
+# Bump when the on-disk layout or the fingerprint parameters change
+PATTERN_CACHE_VERSION = 1
+# Seconds a query may spend verifying candidates (clients may ask for up to SUBSTRUCTURE_MAX_BUDGET)
+SUBSTRUCTURE_TIME_BUDGET = float(os.getenv('SUBSTRUCTURE_TIME_BUDGET', '2.0'))
+SUBSTRUCTURE_MAX_BUDGET = float(os.getenv('SUBSTRUCTURE_MAX_BUDGET', '10.0'))
+# Candidates verified per task; smaller candidate sets are matched in-process
+SUBSTRUCTURE_CHUNK = int(os.getenv('SUBSTRUCTURE_CHUNK', '500'))
+SUBSTRUCTURE_WORKERS = int(os.getenv('SUBSTRUCTURE_WORKERS', str(os.cpu_count() or 1)))
+
+_match_pool = None
+_match_pool_lock = threading.Lock()
+
+
+def parse_query(text, query_format='smarts'):
+    """RDKit query molecule, or None if it does not parse.
+
+    SMARTS keeps its full query semantics (H counts, ring membership, ...) and falls
+    back to SMILES; 'smiles' reads the query as a molecule, so aromaticity is
+    perceived and Kekulé input matches aromatic catalog rings.
+    """
+    with rdBase.BlockLogs():
+        mol = Chem.MolFromSmarts(text) if query_format == 'smarts' else None
+        if mol is None:
+            mol = Chem.MolFromSmiles(text)
+    return mol
+
+
+def pattern_fingerprint(mol, fp_size=PATTERN_FP_SIZE):
+    """Packed PatternFingerprint bits of a molecule or query molecule."""
+    bits = np.zeros(0, dtype=np.uint8)
+    DataStructs.ConvertToNumpyArray(Chem.PatternFingerprint(mol, fpSize=fp_size), bits)
+    return np.packbits(bits)
+
+
+def match_chunk(query, query_format, smiles_list, positions):
+    """Positions whose SMILES contain the query substructure (runs in pool workers)."""
+    pattern = parse_query(query, query_format)
+    matches = []
+    with rdBase.BlockLogs():
+        for pos, smiles in zip(positions, smiles_list):
+            mol = Chem.MolFromSmiles(smiles)
+            if mol is not None and mol.HasSubstructMatch(pattern):
+                matches.append(pos)
+    return matches
+
+
+def match_pool():
+    """Shared process pool for substructure verification, started on first use."""
+    global _match_pool
+    with _match_pool_lock:
+        if _match_pool is None:
+            _match_pool = ProcessPoolExecutor(max_workers=SUBSTRUCTURE_WORKERS,
+                                              mp_context=multiprocessing.get_context('spawn'))
+        return _match_pool
+
+
+def cache_prefix(csv_path, fp_size):
+    stem, _ = os.path.splitext(csv_path)
+    return f"{stem}.pfp-v{PATTERN_CACHE_VERSION}-{fp_size}"
+
+
+class SubstructureIndex:
+    """Packed pattern fingerprints aligned with the positions of drug_data rows."""
+
+    def __init__(self, smiles, bits, valid, fp_size=PATTERN_FP_SIZE):
+        self.smiles = smiles
+        self.bits = bits
+        self.valid = valid
+        self.fp_size = fp_size
+
+    def __len__(self):
+        return len(self.bits)
+
+    @classmethod
+    def from_smiles(cls, smiles_list, fp_size=PATTERN_FP_SIZE):
+        bits = np.zeros((len(smiles_list), fp_size // 8), dtype=np.uint8)
+        valid = np.zeros(len(smiles_list), dtype=bool)
+        with rdBase.BlockLogs():
+            for pos, smiles in enumerate(smiles_list):
+                mol = Chem.MolFromSmiles(smiles) if isinstance(smiles, str) and smiles else None
+                if mol is None:
+                    continue
+                bits[pos] = pattern_fingerprint(mol, fp_size)
+                valid[pos] = True
+        return cls(smiles_list, bits, valid, fp_size)
+
+    @classmethod
+    def load_or_build(cls, csv_path, smiles_list, fp_size=PATTERN_FP_SIZE):
+        """Memory-map the cached pattern fingerprints for this CSV, rebuilding them when it changes."""
+        prefix = cache_prefix(csv_path, fp_size)
+        try:
+            base = f"{prefix}-{file_checksum(csv_path)[:16]}"
+        except OSError as e:
+            print(f"Pattern fingerprint cache disabled ({e}); building in memory")
+            return cls.from_smiles(smiles_list, fp_size)
+        try:
+            bits = np.load(f"{base}.bits.npy", mmap_mode='r')
+            valid = np.load(f"{base}.valid.npy", mmap_mode='r')
+            if len(bits) == len(valid) == len(smiles_list):
+                return cls(smiles_list, bits, valid, fp_size)
+        except (OSError, ValueError):
+            pass
+
+        index = cls.from_smiles(smiles_list, fp_size)
+        try:
+            for name, array in (('bits', index.bits), ('valid', index.valid)):
+                tmp_path = f"{base}.{name}.{os.getpid()}.tmp.npy"
+                np.save(tmp_path, array)
+                os.replace(tmp_path, f"{base}.{name}.npy")
+            for stale in glob.glob(f"{glob.escape(prefix)}-*.npy"):
+                if not stale.startswith(base):
+                    os.remove(stale)
+        except OSError as e:
+            print(f"Could not write pattern fingerprint cache: {e}")
+        return index
+
+    def screen(self, query_bits):
+        """Positions whose pattern bits include every bit of the query, in catalog order."""
+        on = np.flatnonzero(query_bits)
+        if not len(on):
+            return np.flatnonzero(self.valid)
+        # Only the bytes where the query has bits can rule a row out
+        wanted = query_bits[on]
+        keep = np.all((self.bits[:, on] & wanted) == wanted, axis=1) & self.valid
+        return np.flatnonzero(keep)
+
+    def search(self, query, query_format='smarts', limit=20, offset=0, budget=SUBSTRUCTURE_TIME_BUDGET,
+               workers=SUBSTRUCTURE_WORKERS):
+        """Catalog positions containing the query, in catalog order, one page at a time.
+
+        Returns a dict with the page of ``positions`` plus screening statistics;
+        ``complete`` is False when the scan stopped at the time budget or once the
+        page was full, in which case ``total`` is None.
+        """
+        pattern = parse_query(query, query_format)
+        if pattern is None:
+            raise ValueError(f'Invalid {query_format.upper()}: {query}')
+        deadline = time.monotonic() + budget
+        start = time.perf_counter()
+        candidates = self.screen(pattern_fingerprint(pattern, self.fp_size))
+        screen_ms = (time.perf_counter() - start) * 1000
+
+        wanted = offset + limit
+        chunks = deque(candidates[i:i + SUBSTRUCTURE_CHUNK].tolist()
+                       for i in range(0, len(candidates), SUBSTRUCTURE_CHUNK))
+        matches = []
+        verified = 0
+        timed_out = False
+        if workers > 1 and len(chunks) > 1:
+            # Keep a bounded window of chunks in flight and consume them in catalog order
+            pool = match_pool()
+            pending = deque()
+            while chunks or pending:
+                while chunks and len(pending) < 2 * workers:
+                    chunk = chunks.popleft()
+                    pending.append((chunk, pool.submit(match_chunk, query, query_format,
+                                                        [self.smiles[pos] for pos in chunk], chunk)))
+                chunk, future = pending.popleft()
+                try:
+                    matches.extend(future.result(timeout=max(deadline - time.monotonic(), 0)))
+                    verified += len(chunk)
+                except FutureTimeout:
+                    timed_out = True
+                if timed_out or len(matches) >= wanted:
+                    for _, future in pending:
+                        future.cancel()
+                    break
+        else:
+            while chunks and len(matches) < wanted:
+                if time.monotonic() > deadline:
+                    timed_out = True
+                    break
+                chunk = chunks.popleft()
+                matches.extend(match_chunk(query, query_format, [self.smiles[pos] for pos in chunk], chunk))
+                verified += len(chunk)
+
+        complete = verified == len(candidates)
+        return {
+            'positions': matches[offset:wanted],
+            'total': len(matches) if complete else None,
+            'complete': complete,
+            'timed_out': timed_out,
+            'screened': int(np.count_nonzero(self.valid)),
+            'candidates': len(candidates),
+            'verified': verified,
+            'screen_ms': screen_ms,
+            'elapsed_ms': (time.perf_counter() - start) * 1000,
+        }
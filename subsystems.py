@@ -0,0 +1,46 @@
+"""Deferred initialization for the app's heavy subsystems.
+
+Each Subsystem wraps a factory that imports its dependencies (RDKit, pandas,
+groq, FAISS, ...) and loads its data. Nothing runs until the first request that
+needs it, or until warm_up() is called, so importing the app stays cheap.
+"""
+import threading
+import time
+
+
+class Subsystem:
+    """A value built by ``factory`` on first use, exactly once per process."""
+
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self.init_seconds = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.init_seconds is not None
+
+    def get(self):
+        if self.init_seconds is None:
+            with self._lock:
+                if self.init_seconds is None:
+                    start = time.perf_counter()
+                    self._value = self.factory()
+                    self.init_seconds = time.perf_counter() - start
+        return self._value
+
+
+def warm_up(subsystems, names=None):
+    """Initialize the named subsystems (all when names is None or 'all'); returns {name: seconds}."""
+    if names is None or names == 'all':
+        names = list(subsystems)
+    elif isinstance(names, str):
+        names = [name.strip() for name in names.split(',') if name.strip()]
+    timings = {}
+    for name in names:
+        subsystem = subsystems[name]
+        subsystem.get()
+        timings[name] = subsystem.init_seconds
+    return timings